@@ -1,6 +1,9 @@
 import os
 import sys
+import time
+import shutil
 import logging
+import resource
 import argparse
 import ROOT as r
 import numpy as np
@@ -9,6 +12,7 @@ import xgboost as xgb
 import matplotlib as plt
 from array    import array
 from optparse import OptionParser
+import ecalVetoColumns
 r.gSystem.Load('libFramework.so')
 
 mpl_logger = logging.getLogger('matplotlib')
@@ -34,19 +38,98 @@ def addBranch(tree, ldmx_class, branch_name):
     return branch
 
 class sampleContainer:
-    def __init__(self,filename,maxEvts,trainFrac,isSig):
+    def __init__(self,filename,maxEvts,trainFrac,isSig,seed=0,columnar=False):
 
         print("Initializing Container!")
-        self.tree = r.TChain("LDMX_Events")
-        self.tree.Add(filename)
         self.maxEvts = maxEvts
         self.trainFrac = trainFrac
         self.isSig   = isSig
-        self.ecalVeto = addBranch(self.tree, 'EcalVetoResult', 'EcalVeto_{}'.format('SegmipBDTReco'))
+        self.seed    = seed
+        self.vetoBranch = 'EcalVeto_{}'.format('SegmipBDTReco')
+        self.triggerBranch = 'TriggerSums20Layers_{}'.format('signal') if self.isSig else None
+
+        # With columnar, events are read a chunk at a time through uproot (see ecalVetoColumns.py)
+        self.columnar = columnar
+        if self.columnar:
+            self.files = ecalVetoColumns.inputFiles(filename)
+            return
+
+        self.tree = r.TChain("LDMX_Events")
+        self.tree.Add(filename)
+        self.ecalVeto = addBranch(self.tree, 'EcalVetoResult', self.vetoBranch)
         if self.isSig:
-            self.trigger = addBranch(self.tree, 'TriggerResult', 'TriggerSums20Layers_{}'.format('signal'))
+            self.trigger = addBranch(self.tree, 'TriggerResult', self.triggerBranch)
+
+    def eventFeatures(self):
+
+        # BDT input variables of the current event, in the order the BDT takes them
+        result = self.ecalVeto
+
+        evt = [
+                # Base variables
+                result.getNReadoutHits(),
+                result.getSummedDet(),
+                result.getSummedTightIso(),
+                result.getMaxCellDep(),
+                result.getShowerRMS(),
+                result.getXStd(),
+                result.getYStd(),
+                result.getAvgLayerHit(),
+                result.getStdLayerHit(),
+                result.getDeepestLayerHit(),
+                result.getEcalBackEnergy(),
+                # MIP Tracking variables
+                result.getNStraightTracks(),
+                result.getFirstNearPhLayer(),
+                result.getNNearPhHits(),
+                result.getPhotonTerritoryHits(),
+                result.getEPSep(),
+                result.getEPDot(),
+                # Longitudinal segment variables
+                result.getEnergySeg()[0],
+                result.getXMeanSeg()[0],
+                result.getYMeanSeg()[0],
+                result.getLayerMeanSeg()[0],
+                result.getEnergySeg()[1],
+                result.getYMeanSeg()[2],
+                # Electron RoC variables
+                result.getEleContEnergy()[0][0],
+                result.getEleContEnergy()[1][0],
+                result.getEleContYMean()[0][0],
+                result.getEleContEnergy()[0][1],
+                result.getEleContEnergy()[1][1],
+                result.getEleContYMean()[0][1],
+                # Photon RoC variables
+                result.getPhContNHits()[0][0],
+                result.getPhContYMean()[0][0],
+                result.getPhContNHits()[0][1],
+                # Outside RoC variables
+                result.getOutContEnergy()[0][0],
+                result.getOutContEnergy()[1][0],
+                result.getOutContEnergy()[2][0],
+                result.getOutContNHits()[0][0],
+                result.getOutContXMean()[0][0],
+                result.getOutContYMean()[0][0],
+                result.getOutContYMean()[1][0],
+                result.getOutContYStd()[0][0],
+                result.getOutContEnergy()[0][1],
+                result.getOutContEnergy()[1][1],
+                result.getOutContEnergy()[2][1],
+                result.getOutContLayerMean()[0][1],
+                result.getOutContLayerStd()[0][1],
+                result.getOutContEnergy()[0][2],
+                result.getOutContLayerMean()[0][2],      
+        ]
+
+        return evt
 
     def root2PyEvents(self):
+        if self.columnar:
+            chunks = list(self.eventChunks(100000))
+            self.events = np.concatenate(chunks) if chunks else np.zeros((0, ecalVetoColumns.n_features))
+            self.shuffleEvents()
+            return
+
         self.events =  []
         for event_count in range(self.tree.GetEntries()):
             
@@ -59,66 +142,13 @@ class sampleContainer:
             if self.isSig:
                 if not self.trigger.passed(): continue
             
-            result = self.ecalVeto
-
-            evt = [
-                    # Base variables
-                    result.getNReadoutHits(),
-                    result.getSummedDet(),
-                    result.getSummedTightIso(),
-                    result.getMaxCellDep(),
-                    result.getShowerRMS(),
-                    result.getXStd(),
-                    result.getYStd(),
-                    result.getAvgLayerHit(),
-                    result.getStdLayerHit(),
-                    result.getDeepestLayerHit(),
-                    result.getEcalBackEnergy(),
-                    # MIP Tracking variables
-                    result.getNStraightTracks(),
-                    result.getFirstNearPhLayer(),
-                    result.getNNearPhHits(),
-                    result.getPhotonTerritoryHits(),
-                    result.getEPSep(),
-                    result.getEPDot(),
-                    # Longitudinal segment variables
-                    result.getEnergySeg()[0],
-                    result.getXMeanSeg()[0],
-                    result.getYMeanSeg()[0],
-                    result.getLayerMeanSeg()[0],
-                    result.getEnergySeg()[1],
-                    result.getYMeanSeg()[2],
-                    # Electron RoC variables
-                    result.getEleContEnergy()[0][0],
-                    result.getEleContEnergy()[1][0],
-                    result.getEleContYMean()[0][0],
-                    result.getEleContEnergy()[0][1],
-                    result.getEleContEnergy()[1][1],
-                    result.getEleContYMean()[0][1],
-                    # Photon RoC variables
-                    result.getPhContNHits()[0][0],
-                    result.getPhContYMean()[0][0],
-                    result.getPhContNHits()[0][1],
-                    # Outside RoC variables
-                    result.getOutContEnergy()[0][0],
-                    result.getOutContEnergy()[1][0],
-                    result.getOutContEnergy()[2][0],
-                    result.getOutContNHits()[0][0],
-                    result.getOutContXMean()[0][0],
-                    result.getOutContYMean()[0][0],
-                    result.getOutContYMean()[1][0],
-                    result.getOutContYStd()[0][0],
-                    result.getOutContEnergy()[0][1],
-                    result.getOutContEnergy()[1][1],
-                    result.getOutContEnergy()[2][1],
-                    result.getOutContLayerMean()[0][1],
-                    result.getOutContLayerStd()[0][1],
-                    result.getOutContEnergy()[0][2],
-                    result.getOutContLayerMean()[0][2],      
-            ]
+            evt = self.eventFeatures()
 
             self.events.append(evt)
 
+        self.shuffleEvents()
+
+    def shuffleEvents(self):
         new_idx=np.random.permutation(np.arange(np.shape(self.events)[0]))
         self.events = np.array(self.events)
         np.take(self.events, new_idx, axis=0, out=self.events)
@@ -131,6 +161,42 @@ class sampleContainer:
         self.train_y = np.zeros(len(self.train_x)) + (self.isSig == True)
         self.test_y = np.zeros(len(self.test_x)) + (self.isSig == True)
 
+    def eventChunks(self, chunkSize):
+
+        # The same events as root2PyEvents (in file order), chunkSize at a time
+
+        if self.columnar:
+            for chunk in ecalVetoColumns.featureChunks(self.files, self.vetoBranch, self.triggerBranch,
+                                                       self.maxEvts, chunkSize):
+                yield chunk
+            return
+
+        chunk = []
+        nEvents = 0
+        for event_count in range(self.tree.GetEntries()):
+            if nEvents >= self.maxEvts:
+                break
+
+            # load event
+            self.tree.GetEntry(event_count)
+
+            if self.isSig:
+                if not self.trigger.passed(): continue
+
+            chunk.append(self.eventFeatures())
+            nEvents += 1
+            if len(chunk) == chunkSize:
+                yield np.array(chunk)
+                chunk = []
+        if len(chunk) > 0:
+            yield np.array(chunk)
+
+    def isTrain(self, i, n):
+
+        # Which of the n events of chunk i are for training (trainFrac of them at random),
+        # the same every time the chunks are gone through
+        return np.random.RandomState([self.seed, int(self.isSig), i]).rand(n) < float(self.trainFrac)
+
 class mergedContainer:
     def __init__(self, sigContainer,bkgContainer):
         self.train_x = np.vstack((sigContainer.train_x,bkgContainer.train_x))
@@ -145,6 +211,60 @@ class mergedContainer:
         self.dtrain = xgb.DMatrix(self.train_x,self.train_y)
         self.dtest  = xgb.DMatrix(self.test_x,self.test_y)
 
+class chunkIter(xgb.DataIter):
+
+    # Hands xgboost the training (part='train') or test events of the containers a chunk at
+    # a time, reading them again from the trees on every pass xgboost makes
+
+    def __init__(self, containers, part, chunkSize, cache_prefix=None):
+        self.containers = containers
+        self.part = part
+        self.chunkSize = chunkSize
+        self.chunks = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def generate(self):
+        for container in self.containers:
+            for i, chunk in enumerate(container.eventChunks(self.chunkSize)):
+                train = container.isTrain(i, len(chunk))
+                if self.part == 'train':
+                    x = chunk[train]
+                    x[np.isnan(x)] = 0.000
+                else:
+                    x = chunk[~train]
+                if len(x) == 0: continue
+                yield x, np.zeros(len(x)) + (container.isSig == True)
+
+    def reset(self):
+        self.chunks = None
+
+    def next(self, input_data):
+        if self.chunks == None:
+            self.chunks = self.generate()
+        try:
+            x, y = next(self.chunks)
+        except StopIteration:
+            return 0
+        input_data(data=x, label=y)
+        return 1
+
+class streamedContainer:
+
+    # dtrain and dtest like mergedContainer, without ever holding all events in memory:
+    # mode 'quantile' keeps only their histogram bin indices (QuantileDMatrix),
+    # mode 'external' writes them in pages to cacheDir (external memory DMatrix)
+
+    def __init__(self, sigContainer, bkgContainer, mode, chunkSize, cacheDir):
+        containers = [sigContainer, bkgContainer]
+        if mode == 'quantile':
+            self.dtrain = xgb.QuantileDMatrix(chunkIter(containers, 'train', chunkSize))
+            self.dtest  = xgb.QuantileDMatrix(chunkIter(containers, 'test', chunkSize), ref=self.dtrain)
+        elif mode == 'external':
+            self.dtrain = xgb.DMatrix(chunkIter(containers, 'train', chunkSize, cacheDir + '/train'))
+            self.dtest  = xgb.DMatrix(chunkIter(containers, 'test', chunkSize, cacheDir + '/test'))
+        else:
+            sys.exit('Unknown --stream mode {}'.format(mode))
+
 if __name__ == "__main__":
     
     # Parse
@@ -158,6 +278,12 @@ if __name__ == "__main__":
     parser.add_option('-b', dest='bkg_file', default='./bdt_0/bkg_train.root', help='name of background file')
     parser.add_option('-s', dest='sig_file', default='./bdt_0/sig_train.root', help='name of signal file')
     parser.add_option('-o', dest='out_name',  default='bdt_test', help='Output Pickle Name')
+    parser.add_option('--stream', dest='stream',  default='', help='Read the events a chunk at a time'\
+            ' instead of all at once: quantile (QuantileDMatrix) or external (DMatrix cached on disk).'\
+            ' Uses the hist tree method and a random train/test split per chunk')
+    parser.add_option('--columnar', dest='columnar', action='store_true', default=False, help='Read the'\
+            ' EcalVetoResult and trigger branches a chunk at a time with uproot instead of event by event with PyROOT')
+    parser.add_option('--chunk_size', dest='chunk_size',type="int",  default=100000, help='Events per chunk with --stream')
     (options, args) = parser.parse_args()
 
     # Seed numpy's randomness
@@ -183,20 +309,33 @@ if __name__ == "__main__":
     print( 'You set max tree depth = {}'.format(options.depth)    )
     print( 'You set eta = {}'.format(options.eta)                 )
 
+    start = time.time()
+
     # Make Signal Container
     print( 'Loading sig_file = {}'.format(options.sig_file) )
-    sigContainer = sampleContainer(options.sig_file,options.max_evt,options.train_frac,True)
-    sigContainer.root2PyEvents()
-    sigContainer.constructTrainAndTest()
+    sigContainer = sampleContainer(options.sig_file,options.max_evt,options.train_frac,True,options.seed,options.columnar)
+    if not options.stream:
+        sigContainer.root2PyEvents()
+        sigContainer.constructTrainAndTest()
 
     # Make Background Container
     print( 'Loading bkg_file = {}'.format(options.bkg_file) )
-    bkgContainer = sampleContainer(options.bkg_file,options.max_evt,options.train_frac,False)
-    bkgContainer.root2PyEvents()
-    bkgContainer.constructTrainAndTest()
+    bkgContainer = sampleContainer(options.bkg_file,options.max_evt,options.train_frac,False,options.seed,options.columnar)
+    if not options.stream:
+        bkgContainer.root2PyEvents()
+        bkgContainer.constructTrainAndTest()
+
+    # Merge (or stream into xgboost)
+    cache_dir = options.out_name+'_'+str(bdt_num)+'/cache'
+    if options.stream:
+        # xgboost doesn't make the directory its external memory pages go in
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        eventContainer = streamedContainer(sigContainer,bkgContainer,options.stream,options.chunk_size,cache_dir)
+    else:
+        eventContainer = mergedContainer(sigContainer,bkgContainer)
 
-    # Merge
-    eventContainer = mergedContainer(sigContainer,bkgContainer)
+    load_time = time.time() - start
 
     params = {
                'objective': 'binary:logistic',
@@ -214,9 +353,21 @@ if __name__ == "__main__":
                # 'early_stopping_rounds' : 10
     }
 
+    if options.stream:
+        params['tree_method'] = 'hist'
+
     # Train the BDT model
+    start = time.time()
     evallist = [(eventContainer.dtrain,'train'), (eventContainer.dtest,'eval')]
     gbm = xgb.train(params, eventContainer.dtrain, num_boost_round = options.tree_number, evals = evallist, early_stopping_rounds = 10)
+    train_time = time.time() - start
+
+    # Time and memory used, to see how they scale with the number of events (see bdtScaling.py)
+    print( 'Loaded {} training and {} test events in {:.1f} s, trained in {:.1f} s, peak memory {:.0f} MB'.format(
+        eventContainer.dtrain.num_row(), eventContainer.dtest.num_row(), load_time, train_time,
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024.) )
+    if os.path.exists(cache_dir):
+        shutil.rmtree(cache_dir)
     
     # Store BDT
     output = open(options.out_name+'_'+str(bdt_num)+'/' + \
@@ -0,0 +1,44 @@
+"""
+check_columns.py
+
+Checks that the columnar reading of the BDT inputs (ecalVetoColumns.py, bdtMaker.py --columnar)
+gives the same feature matrix as the PyROOT getters, event for event, and how much faster it is.
+Exits with a nonzero status if any value differs (nan counts as equal to nan).
+
+Example:
+    ldmx python3 check_columns.py -i sig.root --sig --max_evt 20000
+"""
+
+import sys
+import time
+import argparse
+import numpy as np
+from bdtMaker import sampleContainer
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-i', dest='infile', required=True, help='input file (or an explicit list as a pattern)')
+parser.add_argument('--sig', action='store_true', default=False, help='apply the signal trigger, as for signal')
+parser.add_argument('--max_evt', type=int, default=10000)
+parser.add_argument('--chunk_size', type=int, default=10000)
+args = parser.parse_args()
+
+matrices = {}
+for columnar in (False, True):
+    container = sampleContainer(args.infile, args.max_evt, 1., args.sig, columnar=columnar)
+    start = time.time()
+    chunks = list(container.eventChunks(args.chunk_size))
+    matrices[columnar] = np.concatenate(chunks)
+    print('{:>8}:  {} events in {:.2f} s'.format('columnar' if columnar else 'PyROOT',
+          len(matrices[columnar]), time.time() - start))
+
+pyroot, columns = matrices[False], matrices[True]
+if pyroot.shape != columns.shape:
+    sys.exit('Different shapes: {} (PyROOT) and {} (columnar)'.format(pyroot.shape, columns.shape))
+
+same = (pyroot == columns) | (np.isnan(pyroot) & np.isnan(columns))
+bad = np.argwhere(~same)
+for event, feature in bad[:10]:
+    print('MISMATCH in event {}, feature {}:  {} vs {}'.format(event, feature, pyroot[event, feature], columns[event, feature]))
+print('Compared {} events x {} features:  {} mismatches'.format(pyroot.shape[0], pyroot.shape[1], len(bad)))
+
+sys.exit(0 if len(bad) == 0 else 1)
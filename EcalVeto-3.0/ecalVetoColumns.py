@@ -0,0 +1,144 @@
+import sys
+import glob
+import numpy as np
+
+# Columnar reading of the BDT inputs:  uproot reads the EcalVetoResult (and signal trigger)
+# members of a whole chunk of events at once, and the features come out as one
+# (events, 47) array, in the order of bdtMaker.py's sampleContainer.eventFeatures (which is
+# the order the BDT, and the ONNX model pickle_to_onnx.py makes of it, takes them in)
+
+# Each feature as (member, indices):  the EcalVetoResult data member eventFeatures' getter
+# returns, and where the value sits in it if it's a vector (of vectors)
+features = [
+        # Base variables
+        ('nReadoutHits_',        ()),     # getNReadoutHits()
+        ('summedDet_',           ()),     # getSummedDet()
+        ('summedTightIso_',      ()),     # getSummedTightIso()
+        ('maxCellDep_',          ()),     # getMaxCellDep()
+        ('showerRMS_',           ()),     # getShowerRMS()
+        ('xStd_',                ()),     # getXStd()
+        ('yStd_',                ()),     # getYStd()
+        ('avgLayerHit_',         ()),     # getAvgLayerHit()
+        ('stdLayerHit_',         ()),     # getStdLayerHit()
+        ('deepestLayerHit_',     ()),     # getDeepestLayerHit()
+        ('ecalBackEnergy_',      ()),     # getEcalBackEnergy()
+        # MIP Tracking variables
+        ('nStraightTracks_',     ()),     # getNStraightTracks()
+        ('firstNearPhLayer_',    ()),     # getFirstNearPhLayer()
+        ('nNearPhHits_',         ()),     # getNNearPhHits()
+        ('photonTerritoryHits_', ()),     # getPhotonTerritoryHits()
+        ('epSep_',               ()),     # getEPSep()
+        ('epDot_',               ()),     # getEPDot()
+        # Longitudinal segment variables
+        ('energySeg_',           (0,)),   # getEnergySeg()[0]
+        ('xMeanSeg_',            (0,)),   # getXMeanSeg()[0]
+        ('yMeanSeg_',            (0,)),   # getYMeanSeg()[0]
+        ('layerMeanSeg_',        (0,)),   # getLayerMeanSeg()[0]
+        ('energySeg_',           (1,)),   # getEnergySeg()[1]
+        ('yMeanSeg_',            (2,)),   # getYMeanSeg()[2]
+        # Electron RoC variables
+        ('eContEnergy_',         (0, 0)), # getEleContEnergy()[0][0]
+        ('eContEnergy_',         (1, 0)), # getEleContEnergy()[1][0]
+        ('eContYMean_',          (0, 0)), # getEleContYMean()[0][0]
+        ('eContEnergy_',         (0, 1)), # getEleContEnergy()[0][1]
+        ('eContEnergy_',         (1, 1)), # getEleContEnergy()[1][1]
+        ('eContYMean_',          (0, 1)), # getEleContYMean()[0][1]
+        # Photon RoC variables
+        ('gContNHits_',          (0, 0)), # getPhContNHits()[0][0]
+        ('gContYMean_',          (0, 0)), # getPhContYMean()[0][0]
+        ('gContNHits_',          (0, 1)), # getPhContNHits()[0][1]
+        # Outside RoC variables
+        ('oContEnergy_',         (0, 0)), # getOutContEnergy()[0][0]
+        ('oContEnergy_',         (1, 0)), # getOutContEnergy()[1][0]
+        ('oContEnergy_',         (2, 0)), # getOutContEnergy()[2][0]
+        ('oContNHits_',          (0, 0)), # getOutContNHits()[0][0]
+        ('oContXMean_',          (0, 0)), # getOutContXMean()[0][0]
+        ('oContYMean_',          (0, 0)), # getOutContYMean()[0][0]
+        ('oContYMean_',          (1, 0)), # getOutContYMean()[1][0]
+        ('oContYStd_',           (0, 0)), # getOutContYStd()[0][0]
+        ('oContEnergy_',         (0, 1)), # getOutContEnergy()[0][1]
+        ('oContEnergy_',         (1, 1)), # getOutContEnergy()[1][1]
+        ('oContEnergy_',         (2, 1)), # getOutContEnergy()[2][1]
+        ('oContLayerMean_',      (0, 1)), # getOutContLayerMean()[0][1]
+        ('oContLayerStd_',       (0, 1)), # getOutContLayerStd()[0][1]
+        ('oContEnergy_',         (0, 2)), # getOutContEnergy()[0][2]
+        ('oContLayerMean_',      (0, 2)), # getOutContLayerMean()[0][2]
+        ]
+
+n_features = len(features)
+
+# Files a TChain.Add pattern stands for.  TChain doesn't promise an order for wildcards; these
+# are sorted, so compare with the PyROOT reading on a single file or an explicit list
+def inputFiles(pattern):
+    files = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+    if len(files) == 0:
+        sys.exit('No files match {}'.format(pattern))
+    return files
+
+# uproot path of a member of a single-object branch (split as branch/member_ or branch/branch.member_)
+def memberPath(tree, branch_name, member):
+    keys = set(tree.keys())
+    for path in ('{0}/{1}'.format(branch_name, member), '{0}/{0}.{1}'.format(branch_name, member)):
+        if path in keys:
+            return path
+    sys.exit('{} has no member {} in {}'.format(branch_name, member, tree.file.file_path))
+
+# Feature matrix of a chunk ({member: awkward array}); values missing from an event's
+# vectors (which the getters can't give either) come out as nan
+def chunkFeatures(arrays):
+
+    import awkward as ak
+
+    columns = []
+    for member, indices in features:
+        column = arrays[member]
+        for index in indices:
+            column = ak.pad_none(column, index + 1, axis=1)[:, index]
+        column = ak.to_numpy(ak.fill_none(column, np.nan))
+        columns.append(column.astype(np.float64))
+
+    return np.column_stack(columns)
+
+# Features of the events of files (passing the trigger, if triggerBranch is given), at most
+# maxEvts of them, chunkSize events at a time:  the chunks are the same as filling them one
+# event at a time in file order
+def featureChunks(files, vetoBranch, triggerBranch=None, maxEvts=-1, chunkSize=100000,
+                  treeName='LDMX_Events'):
+
+    import uproot
+
+    members = sorted(set(member for member, indices in features))
+
+    pending = []
+    nPending = nEvents = 0
+    for rfilename in files:
+        with uproot.open(rfilename) as rfile:
+            tree = rfile[treeName]
+            paths = dict((member, memberPath(tree, vetoBranch, member)) for member in members)
+            if triggerBranch != None:
+                paths['pass_'] = memberPath(tree, triggerBranch, 'pass_')
+
+            for arrays in tree.iterate(list(paths.values()), step_size=chunkSize):
+                if maxEvts >= 0 and nEvents >= maxEvts:
+                    break
+
+                chunk = chunkFeatures(dict((member, arrays[paths[member]]) for member in members))
+                if triggerBranch != None:
+                    chunk = chunk[np.asarray(arrays[paths['pass_']], dtype=bool)]
+                if maxEvts >= 0:
+                    chunk = chunk[:maxEvts - nEvents]
+                nEvents += len(chunk)
+
+                pending.append(chunk)
+                nPending += len(chunk)
+                while nPending >= chunkSize:
+                    pending = [np.concatenate(pending)]
+                    yield pending[0][:chunkSize]
+                    pending = [pending[0][chunkSize:]]
+                    nPending -= chunkSize
+
+        if maxEvts >= 0 and nEvents >= maxEvts:
+            break
+
+    if nPending > 0:
+        yield np.concatenate(pending)
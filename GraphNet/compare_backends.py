@@ -0,0 +1,165 @@
+from __future__ import print_function
+
+"""
+compare_backends.py
+
+Purpose:  Check that the 'uproot' ECalHitsDataset backend reproduces the 'root' (PyROOT) backend, and measure
+what it buys us in startup time and per-worker memory.
+
+- Parity:  Build both datasets over the same files and compare the coordinates/features/labels (and obs branches)
+  of every event.  Any difference is printed; the script exits with a nonzero status if one is found.
+  With --compare vectorized, compares the vectorized hit decoding/region assignment against the original per-hit
+  loops instead (both using --backend).
+- Startup:  Time `import dataset` + ECalHitsDataset() for each backend in a fresh interpreter, so ROOT's import
+  cost is included for the root backend.
+- Throughput:  In the same fresh interpreter, time --num-batches shuffled batches through a DataLoader with
+  --num-workers workers, as in training:  root with shuffle=True, uproot with shuffle=True, and uproot with
+  ChunkShuffleSampler (what train.py uses).  A plain shuffle only thrashes the uproot chunk cache once a sample
+  has more than --max-cached-chunks * --chunk-size events, so use a big sample (or small chunks) to see it.
+- Memory:  After those batches, report the resident memory (RSS) of each worker process.  Requires psutil.
+
+Example:
+    python compare_backends.py --sig '/path/to/v13_1.0_trigger_*.root' --bkg '/path/to/v13_pn_trigger_*.root' --num-events 2000
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--sig', type=str, default='',
+                    help='glob for skimmed signal files (label 1000)')
+parser.add_argument('--bkg', type=str, default='',
+                    help='glob for skimmed background files')
+parser.add_argument('--num-events', type=int, default=1000,
+                    help='max number of events per category to use')
+parser.add_argument('--num-regions', type=int, default=1)
+parser.add_argument('--detector-version', type=str, default='v13')
+parser.add_argument('--obs-branches', type=str, default='discValue_,recoilX_,recoilY_,TargetSPRecoilE_pt',
+                    help='comma-separated obs branches to compare as well')
+parser.add_argument('--num-workers', type=int, default=4,
+                    help='number of DataLoader workers for the memory measurement')
+parser.add_argument('--batch-size', type=int, default=128)
+parser.add_argument('--num-batches', type=int, default=20,
+                    help='number of shuffled batches to time and load before measuring worker memory')
+parser.add_argument('--chunk-size', type=int, default=10000, help='uproot backend chunk size')
+parser.add_argument('--max-cached-chunks', type=int, default=32, help='uproot backend chunks kept per worker')
+parser.add_argument('--compare', type=str, default='backend', choices=['backend', 'vectorized'],
+                    help='what to check for parity:  root vs uproot backends, or per-hit loops vs vectorized')
+parser.add_argument('--backend', type=str, default='uproot', choices=['root', 'uproot'],
+                    help='backend used for --compare vectorized')
+parser.add_argument('--skip-parity', action='store_true', default=False)
+parser.add_argument('--skip-measure', action='store_true', default=False,
+                    help='skip the startup time and worker memory measurements')
+# Internal:  used to run the measurements for one backend in a clean subprocess
+parser.add_argument('--measure-only', type=str, default='', choices=['', 'root', 'uproot'],
+                    help=argparse.SUPPRESS)
+parser.add_argument('--sampler', type=str, default='shuffle', choices=['shuffle', 'chunk'],
+                    help=argparse.SUPPRESS)
+args = parser.parse_args()
+
+obs_branches = [b for b in args.obs_branches.split(',') if b]
+siglist = {1000: (args.sig, args.num_events)} if args.sig else {}
+bkglist = {0: (args.bkg, args.num_events)} if args.bkg else {}
+
+
+def make_dataset(backend, obs=obs_branches, vectorized=True):
+    from dataset import ECalHitsDataset
+    return ECalHitsDataset(siglist=siglist, bkglist=bkglist, load_range=(0, 1), obs_branches=obs,
+                           detector_version=args.detector_version, nRegions=args.num_regions, backend=backend,
+                           chunk_size=args.chunk_size, max_cached_chunks=args.max_cached_chunks, vectorized=vectorized)
+
+
+def check_parity():
+    if args.compare == 'vectorized':
+        print('====== Parity:  per-hit loops vs vectorized ({} backend) ======'.format(args.backend))
+        root_data = make_dataset(args.backend, vectorized=False)
+        up_data = make_dataset(args.backend, vectorized=True)
+    else:
+        print('====== Parity:  root vs uproot ======')
+        root_data = make_dataset('root')
+        up_data = make_dataset('uproot')
+    assert(len(root_data) == len(up_data))
+    n_bad = 0
+    max_diff = 0.
+    for i in range(len(root_data)):
+        r_coords, r_feats, r_label = root_data[i]
+        u_coords, u_feats, u_label = up_data[i]
+        diff = max(np.max(np.abs(r_coords - u_coords), initial=0), np.max(np.abs(r_feats - u_feats), initial=0))
+        max_diff = max(max_diff, diff)
+        if diff != 0 or r_label != u_label:
+            n_bad += 1
+            if n_bad <= 10:
+                print('MISMATCH in event {} ({}):  max abs diff {}, labels {} vs {}'.format(i, root_data.event_list[i], diff, r_label, u_label))
+    r_obs = root_data.obs_dict
+    u_obs = up_data.obs_dict
+    for branch in obs_branches:
+        if not all(np.array_equal(a, b) for a, b in zip(r_obs[branch], u_obs[branch])):
+            n_bad += 1
+            print('MISMATCH in obs branch {}'.format(branch))
+    print('Compared {} events:  {} mismatches, max abs feature diff {}'.format(len(root_data), n_bad, max_diff))
+    return n_bad == 0
+
+
+def measure(backend, sampler):
+    # Runs in a fresh interpreter, so nothing (in particular ROOT) has been imported by a previous measurement
+    start = time.time()
+    data = make_dataset(backend, obs=[])
+    startup = time.time() - start
+
+    import psutil
+    from torch.utils.data import DataLoader
+    from dataset import collate_wrapper, ChunkShuffleSampler
+    # Shuffled like the training loader in train.py
+    train_sampler = ChunkShuffleSampler(data) if sampler == 'chunk' else None
+    loader = DataLoader(data, num_workers=args.num_workers, batch_size=args.batch_size,
+                        collate_fn=collate_wrapper, shuffle=train_sampler is None, sampler=train_sampler,
+                        drop_last=False)
+    num_batches = min(args.num_batches, len(loader))
+    start = time.time()
+    it = iter(loader)
+    num_events = 0
+    for _ in range(num_batches):
+        num_events += len(next(it).label)
+    throughput = num_events / (time.time() - start)
+    main_rss = psutil.Process().memory_info().rss / 1024.**2
+    worker_rss = [w.memory_info().rss / 1024.**2 for w in psutil.Process().children(recursive=True)]
+    print('RESULT {} {:.2f} {:.1f} {:.0f} {}'.format(backend, startup, throughput, main_rss,
+                                                     ','.join('%.0f' % m for m in worker_rss)))
+
+
+def run_measurements():
+    print('====== Startup (import + init), shuffled throughput and RSS per DataLoader worker '
+          '({} workers, {} batches) ======'.format(args.num_workers, args.num_batches))
+    for backend, sampler in [('root', 'shuffle'), ('uproot', 'shuffle'), ('uproot', 'chunk')]:
+        cmd = [sys.executable, __file__, '--measure-only', backend, '--sampler', sampler, '--sig', args.sig,
+               '--bkg', args.bkg, '--num-events', str(args.num_events), '--detector-version', args.detector_version,
+               '--num-regions', str(args.num_regions), '--num-workers', str(args.num_workers),
+               '--batch-size', str(args.batch_size), '--num-batches', str(args.num_batches),
+               '--chunk-size', str(args.chunk_size), '--max-cached-chunks', str(args.max_cached_chunks)]
+        out = subprocess.run(cmd, stdout=subprocess.PIPE, universal_newlines=True).stdout
+        result = [l.split() for l in out.splitlines() if l.startswith('RESULT')]
+        name = '{} ({})'.format(backend, sampler)
+        if not result:
+            print('{:>16}:  measurement failed'.format(name))
+            continue
+        _, _, startup, throughput, main_rss, worker_rss = (result[0] + [''])[:6]
+        worker_rss = [float(m) for m in worker_rss.split(',') if m]
+        print('{:>16}:  startup {} s, {} events/s, main {} MB, workers {} MB (mean {:.0f} MB)'.format(
+              name, startup, throughput, main_rss, worker_rss, np.mean(worker_rss) if worker_rss else 0))
+
+
+if args.measure_only:
+    measure(args.measure_only, args.sampler)
+    sys.exit(0)
+
+ok = True
+if not args.skip_parity:
+    ok = check_parity()
+if not args.skip_measure:
+    run_measurements()
+
+sys.exit(0 if ok else 1)
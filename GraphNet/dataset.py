@@ -3,14 +3,15 @@ from __future__ import print_function
 import numpy as np
 import torch
 import torch.nn.functional as F
-from torch.utils.data import Dataset
+from torch.utils.data import Dataset, Sampler
 import glob
 import tqdm
 import uproot
 import awkward
 import concurrent.futures
-# NEW:
-import ROOT as r
+import collections
+# NOTE:  PyROOT is no longer imported here.  It's only needed by the 'root' backend (see _import_root() below);
+# importing it at module level costs seconds of startup and hundreds of MB of RSS in every DataLoader worker.
 
 # Note:  I suggest downloading+importing the psutil module if you need to monitor RAM/GPU usage.
 
@@ -44,6 +45,16 @@ radius_recoil_68_theta_20_end = [4.0754238481177705, 4.193693485630508, 5.142094
 
 radius_68 = [radius_beam_68,radius_recoil_68_p_0_500_theta_0_10, radius_recoil_68_p_500_1500_theta_0_10,radius_recoil_68_theta_10_20,radius_recoil_68_theta_20_end]
 
+# Scoring plane leaves needed to compute the projected electron/photon trajectories.
+# Stored as '<var>_' (ecal SP) and '<var>_tsp_' (target SP) in the skimmed_events tree.
+SP_VARS = ['pdgID', 'x', 'y', 'z', 'px', 'py', 'pz']
+
+
+def _import_root():
+    # Deferred import of PyROOT; only the 'root' backend should ever call this.
+    import ROOT
+    return ROOT
+
 
 
 def _concat(arrays, axis=0):
@@ -58,9 +69,21 @@ def _concat(arrays, axis=0):
 
 class ECalHitsDataset(Dataset):
 
-    def __init__(self, siglist, bkglist, load_range=(0, 1), obs_branches=[], coord_ref=None, detector_version='v13', nRegions=1, regSizes=None):
+    def __init__(self, siglist, bkglist, load_range=(0, 1), obs_branches=[], coord_ref=None, detector_version='v13', nRegions=1, regSizes=None,
+                 backend='root', chunk_size=10000, max_cached_chunks=32, vectorized=True):
         super(ECalHitsDataset, self).__init__()
         print("Initializing EcalHitsDataset")
+        # backend:  'root' reads each event with PyROOT GetEntry/GetLeaf (original approach).
+        #           'uproot' reads skimmed_events in chunks of chunk_size entries with uproot and never imports ROOT.
+        #           The most recent max_cached_chunks chunks are kept in memory (per DataLoader worker).
+        assert(backend in ['root', 'uproot'])
+        self.backend = backend
+        self.chunk_size = chunk_size
+        self.max_cached_chunks = max_cached_chunks
+        self._chunk_cache = collections.OrderedDict()  # (filename, chunk_start) -> {branch: np array}
+        # vectorized:  decode hits and assign them to regions with array operations instead of per-hit python loops.
+        #              Gives identical tensors; False keeps the original loops (useful as a reference).
+        self.vectorized = vectorized
         # load cell map (for calculating xyz+layer from hit IDs)
         self._load_cellMap(version=detector_version)
         self.detector_version = detector_version
@@ -80,6 +103,17 @@ class ECalHitsDataset(Dataset):
         # Just store a list of the event numbers
         self.loaded_events = []
 
+        # Every branch _read_event() and _load_sp_data() read per event; used by the uproot backend to load only
+        # what's needed.  NOTE:  Not self._branches, since v13 skims have no id_rec_ (hits are read from *pos_rec_)
+        if detector_version == 'v12':
+            hit_branches = [self._id_branch, self._energy_branch]
+        else:
+            hit_branches = [self._pos_branch.format(v) for v in ['x', 'y', 'z']] + [self._energy_branch]
+        self._read_branches = []
+        for br in hit_branches + [v+'_' for v in SP_VARS] + [v+'_tsp_' for v in SP_VARS] + self.obs_branches:
+            if br not in self._read_branches:
+                self._read_branches.append(br)
+
         self.coord_ref = coord_ref
         assert(detector_version != 'v9')  # v9 compatibility would be nontrivial to add, and is probably unnecessary
 
@@ -112,9 +146,7 @@ class ECalHitsDataset(Dataset):
             for fp in glob.glob(filepath):
                 # For each file, check the number of events, then add to event_list accordingly
                 if num_loaded_events == max_events:  break
-                tfile = r.TFile(fp)
-                ttree = tfile.Get('skimmed_events')
-                f_events = ttree.GetEntries()  # Num events in file
+                f_events = self._num_entries(fp)  # Num events in file
                 # load_range specifies fraction of file to load from.
                 start, stop = [int(x * f_events) for x in load_range]
 
@@ -156,11 +188,16 @@ class ECalHitsDataset(Dataset):
 
         self.obs_data = {k:[] for k in self.obs_branches}
 
-        tfile = r.TFile(filename)  # NOTE:  This is the bottleneck!  (Slow, limits performance)
-        # ...could theoretically speed up by maintaining a list of all TFiles in use
-        self.ttree = tfile.Get('skimmed_events')
-        # Prepare to load data from event [file_index]:
-        self.ttree.GetEntry(file_index)
+        if self.backend == 'uproot':
+            # Event data comes from a cached chunk of the file; no file handle is kept open, so this is fork-safe
+            self._event = self._load_event_uproot(filename, file_index)
+        else:
+            r = _import_root()
+            tfile = r.TFile(filename)  # NOTE:  This is the bottleneck!  (Slow, limits performance)
+            # ...could theoretically speed up by maintaining a list of all TFiles in use
+            self.ttree = tfile.Get('skimmed_events')
+            # Prepare to load data from event [file_index]:
+            self.ttree.GetEntry(file_index)
         # load_sp_data():  Need to get info from TargetScoringPlanes to compute projected electron/photon
         # trajectories -> decide what region each event goes into
         self._load_sp_data()
@@ -183,22 +220,49 @@ class ECalHitsDataset(Dataset):
         return coordinates, features, label
 
 
+    def _num_entries(self, filename):
+        # Number of events in a skimmed file
+        if self.backend == 'uproot':
+            with uproot.open(filename) as f:
+                return f['skimmed_events'].num_entries
+        r = _import_root()
+        tfile = r.TFile(filename)
+        return tfile.Get('skimmed_events').GetEntries()
+
+    def _load_event_uproot(self, filename, file_index):
+        # Return {branch: value(s)} for one event, reading the file in chunks of self.chunk_size entries.
+        # Chunks are cached (least recently used is dropped first) so sequential access only touches disk once per chunk.
+        chunk_start = file_index - file_index % self.chunk_size
+        key = (filename, chunk_start)
+        if key in self._chunk_cache:
+            self._chunk_cache.move_to_end(key)
+        else:
+            with uproot.open(filename) as f:
+                # library='np':  jagged branches become object arrays of np arrays, which are much cheaper to
+                # index one event at a time than awkward arrays
+                self._chunk_cache[key] = f['skimmed_events'].arrays(self._read_branches, entry_start=chunk_start,
+                                                                    entry_stop=chunk_start + self.chunk_size, library='np')
+            if len(self._chunk_cache) > self.max_cached_chunks:
+                self._chunk_cache.popitem(last=False)
+        chunk = self._chunk_cache[key]
+        return {br: chunk[br][file_index - chunk_start] for br in self._read_branches}
+
+    def _get_values(self, branch, dtype='float64'):
+        # Return all values of a leaf for the current event as a 1D np array (length 1 for scalar branches).
+        # ROOT's GetValue() always returns a double, so cast through float64 first to match exactly.
+        if self.backend == 'uproot':
+            return np.atleast_1d(np.asarray(self._event[branch], dtype='float64')).astype(dtype)
+        leaf = self.ttree.GetLeaf(branch)
+        return np.array([leaf.GetValue(i) for i in range(leaf.GetLen())], dtype='float64').astype(dtype)
+
     # _load_sp_data():  calculate the projected/predicted electron/photon trajectories from SPHits data
     def _load_sp_data(self):
-        pdgID_leaf = self.ttree.GetLeaf('pdgID_')
-        z_leaf     = self.ttree.GetLeaf('z_')
-        pz_leaf    = self.ttree.GetLeaf('pz_')
-        pdgID_ = [int(pdgID_leaf.GetValue(i)) for i in range(pdgID_leaf.GetLen())]
-        z_     = [z_leaf.GetValue(i)          for i in range(z_leaf.GetLen())    ]
-        pz_    = [pz_leaf.GetValue(i)         for i in range(pz_leaf.GetLen())   ]
-        pdgID_leaf_tsp = self.ttree.GetLeaf('pdgID_tsp_')
-        z_leaf_tsp     = self.ttree.GetLeaf('z_tsp_')
-        pz_leaf_tsp    = self.ttree.GetLeaf('pz_tsp_')
-        #print(pdgID_leaf, pdgID_leaf_tsp)
-        #print(pdgID_leaf_tsp.GetLen())
-        pdgID_tsp_ = [int(pdgID_leaf_tsp.GetValue(i)) for i in range(pdgID_leaf_tsp.GetLen())]
-        z_tsp_     = [z_leaf_tsp.GetValue(i)          for i in range(z_leaf_tsp.GetLen())    ]
-        pz_tsp_    = [pz_leaf_tsp.GetValue(i)         for i in range(pz_leaf_tsp.GetLen())   ]
+        pdgID_ = [int(v) for v in self._get_values('pdgID_')]
+        z_     = list(self._get_values('z_'))
+        pz_    = list(self._get_values('pz_'))
+        pdgID_tsp_ = [int(v) for v in self._get_values('pdgID_tsp_')]
+        z_tsp_     = list(self._get_values('z_tsp_'))
+        pz_tsp_    = list(self._get_values('pz_tsp_'))
         #el_ = 0  # SP index of recoil electron
         #pmax = 0  # Max pz
         #max_index = 0
@@ -209,7 +273,7 @@ class ECalHitsDataset(Dataset):
         # first, find the recoil electron at the target (for computing photon momentum):
         r_tsp = 0
         pmax_tsp = 0
-        for j in range(pdgID_leaf_tsp.GetLen()):
+        for j in range(len(pdgID_tsp_)):
             if pdgID_tsp_[j] == 11 and z_tsp_[j] > 4.4 and z_tsp_[j] < 4.6 and pz_tsp_[j] > pmax_tsp:
                 r_tsp = j
                 pmax_tsp = pz_tsp_[j]
@@ -217,14 +281,15 @@ class ECalHitsDataset(Dataset):
         # Find the recoil electron at the ecal SP:
         r_ecal = 0
         pmax_ecal = 0
-        for j in range(pdgID_leaf.GetLen()):
+        for j in range(len(pdgID_)):
             if pdgID_[j] == 11 and z_[j] > 240 and z_[j] < 241 and pz_[j] > pmax_ecal:
                 pmax_ecal = pz_[j]
                 r_ecal = j
         has_e = pmax_ecal != 0  # Check whether event has a SP electron
         
-        etraj_ecal = {v+'_':  self.ttree.GetLeaf(v+'_').GetValue(r_ecal)     for v in ['x', 'y', 'z', 'px', 'py', 'pz']}
-        etraj_tsp  = {v+'_':  self.ttree.GetLeaf(v+'_tsp_').GetValue(r_ecal) for v in ['x', 'y', 'z', 'px', 'py', 'pz']}
+        # NOTE:  etraj_tsp is indexed with r_ecal (not r_tsp); kept as-is so existing models see identical inputs
+        etraj_ecal = {v+'_':  self._get_value_at(v+'_',     r_ecal) for v in ['x', 'y', 'z', 'px', 'py', 'pz']}
+        etraj_tsp  = {v+'_':  self._get_value_at(v+'_tsp_', r_ecal) for v in ['x', 'y', 'z', 'px', 'py', 'pz']}
         #etraj_x_sp  = self.ttree.GetLeaf('x_').GetValue(el_)
         #etraj_y_sp  = self.ttree.GetLeaf('y_').GetValue(el_)
         #etraj_z_sp  = self.ttree.GetLeaf('z_').GetValue(el_)
@@ -258,15 +323,82 @@ class ECalHitsDataset(Dataset):
 
 
 
+    def _get_value_at(self, branch, index):
+        # Single leaf value for the current event.  Out-of-range indices (e.g. an event w/ no SP hits) give 0
+        if self.backend == 'uproot':
+            values = np.atleast_1d(self._event[branch])
+            return float(values[index]) if index < len(values) else 0.0
+        leaf = self.ttree.GetLeaf(branch)
+        return leaf.GetValue(index) if index < leaf.GetLen() else 0.0
+
+    def _fill_regions(self, x, y, z, layer_id, energy, x_, y_, z_, layer_id_, log_energy_):
+        # Array version of the per-hit region loop in _read_event().  Fills the [nRegions, MAX_NUM_ECAL_HITS]
+        # feature arrays in place.  Everything is done in float64 like the scalar loop so the results are identical.
+        x = np.asarray(x, dtype='float64')
+        y = np.asarray(y, dtype='float64')
+        z = np.asarray(z, dtype='float64')
+        layer_id = np.asarray(layer_id, dtype='int')
+        nHits = len(layer_id)
+
+        # Projected electron (row 0) and photon (row 1) trajectory xy at the z of every hit:
+        if self.etraj_sp[2] != -999:  # If fiducial
+            delta_z = z - self.etraj_sp[2]
+            traj_x = np.stack((self.etraj_sp[0] + self.enorm_sp[0]*delta_z, self.ptraj_sp[0] + self.pnorm_sp[0]*delta_z))
+            traj_y = np.stack((self.etraj_sp[1] + self.enorm_sp[1]*delta_z, self.ptraj_sp[1] + self.pnorm_sp[1]*delta_z))
+            recoilangle = self.enorm_sp[2] / np.sqrt(self.enorm_sp[0]**2 + self.enorm_sp[1]**2 + self.enorm_sp[2]**2)
+            recoil_p = np.sqrt(self.enorm_sp[0]**2 + self.enorm_sp[1]**2 + self.enorm_sp[2]**2)
+        else:
+            traj_x = np.stack((np.full(nHits, self.etraj_sp[0], dtype='float64'), np.full(nHits, self.ptraj_sp[0], dtype='float64')))
+            traj_y = np.stack((np.full(nHits, self.etraj_sp[1], dtype='float64'), np.full(nHits, self.ptraj_sp[1], dtype='float64')))
+            recoilangle = -999
+            recoil_p    = -999
+        # Select the class of containment radii based on trajectory angle/energy (same for every hit):
+        if recoilangle < 10 and recoil_p < 500:
+            ir = 1
+        elif recoilangle < 10 and recoil_p >= 500:
+            ir = 2
+        elif recoilangle <= 20:
+            ir = 3
+        else:
+            ir = 4
+        radius = 2.0 * np.asarray(radius_68[ir])[layer_id]
+        # Broadcast distance from every hit to both trajectories -> [2, nHits]
+        inside = np.sqrt((traj_x - x)**2 + (traj_y - y)**2) < radius
+        insideElectronRadius, insidePhotonRadius = inside[0], inside[1]
+        # If an SP electron hit is missing, place all hits in the event into the PHOTON region
+        if self.enorm_sp[2] == -999:
+            insideElectronRadius = np.zeros(nHits, dtype=bool)
+            insidePhotonRadius   = np.ones(nHits, dtype=bool)
+
+        if self.nRegions == 1:
+            in_region = [np.ones(nHits, dtype=bool)]
+        elif self.nRegions == 2:
+            in_region = [insideElectronRadius, ~insideElectronRadius]
+        elif self.nRegions == 3:
+            in_region = [insideElectronRadius, insidePhotonRadius, ~insideElectronRadius & ~insidePhotonRadius]
+        else:
+            in_region = [np.zeros(nHits, dtype=bool)] * self.nRegions
+
+        energy = np.asarray(energy, dtype='float32')
+        positive = energy > 0
+        log_energy = np.full(nHits, -1, dtype='float32')  # Note:  E<1 is very uncommon, so -1 is okay to round to.
+        log_energy[positive] = np.log(energy[positive])
+        for r in range(self.nRegions):
+            # Hits keep their original index j in every region (zero-padded elsewhere), as in the loop
+            j = np.nonzero(in_region[r])[0]
+            x_[r][j] = x[j] - traj_x[0][j]  # Store relative to xy distance from trajectory
+            y_[r][j] = y[j] - traj_y[0][j]
+            z_[r][j] = z[j]
+            layer_id_[r][j] = layer_id[j]
+            log_energy_[r][j] = log_energy[j]
+
     def _read_event(self):
         # Read data from event and fill var_dict and obs_dict:
         # obs_dict contains obs_branches info (branches specified in train.py); saved for plotting
         # var_dict contains info necessary for PN:  x, y, z, layer, log(E); more if other regions included
         if self.detector_version == 'v12':
-            eid_leaf    = self.ttree.GetLeaf(self._id_branch)
-            energy_leaf = self.ttree.GetLeaf(self._energy_branch)
-            eid    = np.array([eid_leaf.GetValue(i)    for i in range(eid_leaf.GetLen())   ], dtype='int')  #table[self._id_branch]
-            energy = np.array([energy_leaf.GetValue(i) for i in range(energy_leaf.GetLen())], dtype='float32')  #table[self._energy_branch]
+            eid    = self._get_values(self._id_branch, dtype='int')  #table[self._id_branch]
+            energy = self._get_values(self._energy_branch, dtype='float32')  #table[self._energy_branch]
             #print("TEMP: energy len 1=", len(energy))
             pos = (energy > 0)
             eid = eid[pos]  # Gets rid of all (AND ONLY) hits with 0 energy
@@ -274,10 +406,8 @@ class ECalHitsDataset(Dataset):
 
             (x, y, z), layer_id = self._parse_cid(eid)  # layer_id > 0, so can use layer_id-1 to index e/ptraj_ref
         else:
-            xyz_leaves = [self.ttree.GetLeaf(self._pos_branch.format(v)) for v in ['x', 'y', 'z']]
-            (x, y, z) = [np.array([lf.GetValue(i) for i in range(lf.GetLen())], dtype='float32') for lf in xyz_leaves]
-            energy_leaf = self.ttree.GetLeaf(self._energy_branch)
-            energy = np.array([energy_leaf.GetValue(i) for i in range(energy_leaf.GetLen())], dtype='float32')
+            (x, y, z) = [self._get_values(self._pos_branch.format(v), dtype='float32') for v in ['x', 'y', 'z']]
+            energy = self._get_values(self._energy_branch, dtype='float32')
             layer_id = self._getlayer(z)
 
 
@@ -292,83 +422,87 @@ class ECalHitsDataset(Dataset):
         log_energy_ = np.zeros((self.nRegions, MAX_NUM_ECAL_HITS), dtype='float32')
         layer_id_   = np.zeros((self.nRegions, MAX_NUM_ECAL_HITS), dtype='float32')
 
-        regionIndices = [0, 0, 0]  # Indices of last hit added to feature arrays
-
-        for j in range(len(layer_id)):  #eid_leaf.GetLen()):  # For every hit...
-
-            # Calculate xy coord of point on projected trajectory in same layer
-            delta_z = z[j] - self.etraj_sp[2]
-            if self.etraj_sp[2] != -999:  # If fiducial
-                etraj_point = (self.etraj_sp[0] + self.enorm_sp[0]*delta_z, self.etraj_sp[1] + self.enorm_sp[1]*delta_z)
-                ptraj_point = (self.ptraj_sp[0] + self.pnorm_sp[0]*delta_z, self.ptraj_sp[1] + self.pnorm_sp[1]*delta_z)
-                # Additionally, calculate recoil angle (angle of pnorm_sp):
-                recoilangle = self.enorm_sp[2] / np.sqrt(self.enorm_sp[0]**2 + self.enorm_sp[1]**2 + self.enorm_sp[2]**2)
-                recoil_p = np.sqrt(self.enorm_sp[0]**2 + self.enorm_sp[1]**2 + self.enorm_sp[2]**2) 
-            else:
-                etraj_point = self.etraj_sp  # (-999, -999, -999)
-                ptraj_point = self.ptraj_sp
-
-                recoilangle = -999
-                recoil_p    = -999
-            ir = -1
-            #if recoilangle==-1 or recoil_p==-1:  ir = 1  # Not used for now
-            # Select the class of containment radii based on trajectory angle/energy:
-            if recoilangle < 10 and recoil_p < 500:
-                ir = 1
-            elif recoilangle < 10 and recoil_p >= 500:
-                ir = 2
-            elif recoilangle <= 20:
-                ir = 3
-            else:
-                ir = 4
-            # Determine what regions the hit falls into:
-            insideElectronRadius = np.sqrt((etraj_point[0] - x[j])**2 + \
-                    (etraj_point[1] - y[j])**2) < 2.0 * radius_68[ir][layer_id[j]]
-            insidePhotonRadius   = np.sqrt((ptraj_point[0] - x[j])**2 + \
-                    (ptraj_point[1] - y[j])**2) < 2.0 * radius_68[ir][layer_id[j]]
-            # If an SP electron hit is missing, place all hits in the event into the ~~"other"~~ PHOTON region
-            # 3-region:
-            if self.enorm_sp[2] == -999:
-                insideElectronRadius = False
-                insidePhotonRadius   = True
-            
-            regions = []  # Regions hit falls inside
-            if self.nRegions == 1:
-                regions.append(0)
-            elif self.nRegions == 2:
-                if insideElectronRadius:
-                    regions.append(0)
+        if self.vectorized:
+            self._fill_regions(x, y, z, layer_id, energy, x_, y_, z_, layer_id_, log_energy_)
+        else:
+            # Original per-hit loop; kept as the reference for the vectorized version
+            regionIndices = [0, 0, 0]  # Indices of last hit added to feature arrays
+
+            for j in range(len(layer_id)):  #eid_leaf.GetLen()):  # For every hit...
+
+                # Calculate xy coord of point on projected trajectory in same layer
+                delta_z = z[j] - self.etraj_sp[2]
+                if self.etraj_sp[2] != -999:  # If fiducial
+                    etraj_point = (self.etraj_sp[0] + self.enorm_sp[0]*delta_z, self.etraj_sp[1] + self.enorm_sp[1]*delta_z)
+                    ptraj_point = (self.ptraj_sp[0] + self.pnorm_sp[0]*delta_z, self.ptraj_sp[1] + self.pnorm_sp[1]*delta_z)
+                    # Additionally, calculate recoil angle (angle of pnorm_sp):
+                    recoilangle = self.enorm_sp[2] / np.sqrt(self.enorm_sp[0]**2 + self.enorm_sp[1]**2 + self.enorm_sp[2]**2)
+                    recoil_p = np.sqrt(self.enorm_sp[0]**2 + self.enorm_sp[1]**2 + self.enorm_sp[2]**2) 
+                else:
+                    etraj_point = self.etraj_sp  # (-999, -999, -999)
+                    ptraj_point = self.ptraj_sp
+
+                    recoilangle = -999
+                    recoil_p    = -999
+                ir = -1
+                #if recoilangle==-1 or recoil_p==-1:  ir = 1  # Not used for now
+                # Select the class of containment radii based on trajectory angle/energy:
+                if recoilangle < 10 and recoil_p < 500:
+                    ir = 1
+                elif recoilangle < 10 and recoil_p >= 500:
+                    ir = 2
+                elif recoilangle <= 20:
+                    ir = 3
                 else:
-                    regions.append(1)
-            elif self.nRegions == 3:
-                if insideElectronRadius:
+                    ir = 4
+                # Determine what regions the hit falls into:
+                insideElectronRadius = np.sqrt((etraj_point[0] - x[j])**2 + \
+                        (etraj_point[1] - y[j])**2) < 2.0 * radius_68[ir][layer_id[j]]
+                insidePhotonRadius   = np.sqrt((ptraj_point[0] - x[j])**2 + \
+                        (ptraj_point[1] - y[j])**2) < 2.0 * radius_68[ir][layer_id[j]]
+                # If an SP electron hit is missing, place all hits in the event into the ~~"other"~~ PHOTON region
+                # 3-region:
+                if self.enorm_sp[2] == -999:
+                    insideElectronRadius = False
+                    insidePhotonRadius   = True
+            
+                regions = []  # Regions hit falls inside
+                if self.nRegions == 1:
                     regions.append(0)
-                if insidePhotonRadius:
-                    regions.append(1)
-                if not insideElectronRadius and not insidePhotonRadius:
-                    regions.append(2)
-            # Add to each region (need multiple in case inside electron and photon in 3-region)
+                elif self.nRegions == 2:
+                    if insideElectronRadius:
+                        regions.append(0)
+                    else:
+                        regions.append(1)
+                elif self.nRegions == 3:
+                    if insideElectronRadius:
+                        regions.append(0)
+                    if insidePhotonRadius:
+                        regions.append(1)
+                    if not insideElectronRadius and not insidePhotonRadius:
+                        regions.append(2)
+                # Add to each region (need multiple in case inside electron and photon in 3-region)
 
             
-            for r in range(self.nRegions):
-                if r in regions:
-                    x_[r][j] = x[j] - etraj_point[0]  # Store relative to xy distance from trajectory
-                    y_[r][j] = y[j] - etraj_point[1]
-                    z_[r][j] = z[j]  # - self._layerZs[0]  # Used to be defined relative to the ecal face; changed to absolute bc of Huilin's old results
-                    layer_id_[r][j] = layer_id[j]
-                    log_energy_[r][j] = np.log(energy[j]) if energy[j] > 0 else -1  # Note:  E<1 is very uncommon, so -1 is okay to round to.
-            """
-            for r in range(self.nRegions):
-                # Note location of previous hit added to array.  Add after it.
-                if r in regions:  # if hit belongs in region r:
-                    k = regionIndices[r]
-                    x_[r][k] = x[j] - etraj_point[0]  # Store relative to xy distance from trajectory
-                    y_[r][k] = y[j] - etraj_point[1]
-                    z_[r][k] = z[j]  # - self._layerZs[0]  # Used to be defined relative to the ecal face; changed to absolute bc of Huilin's old results
-                    layer_id_[r][k] = layer_id[j]
-                    log_energy_[r][k] = np.log(energy[j]) if energy[j] > 0 else -1  # Note:  E<1 is very uncommon, so -1 is okay to round to.
-                    regionIndices[r] += 1
-            """
+                for r in range(self.nRegions):
+                    if r in regions:
+                        x_[r][j] = x[j] - etraj_point[0]  # Store relative to xy distance from trajectory
+                        y_[r][j] = y[j] - etraj_point[1]
+                        z_[r][j] = z[j]  # - self._layerZs[0]  # Used to be defined relative to the ecal face; changed to absolute bc of Huilin's old results
+                        layer_id_[r][j] = layer_id[j]
+                        log_energy_[r][j] = np.log(energy[j]) if energy[j] > 0 else -1  # Note:  E<1 is very uncommon, so -1 is okay to round to.
+                """
+                for r in range(self.nRegions):
+                    # Note location of previous hit added to array.  Add after it.
+                    if r in regions:  # if hit belongs in region r:
+                        k = regionIndices[r]
+                        x_[r][k] = x[j] - etraj_point[0]  # Store relative to xy distance from trajectory
+                        y_[r][k] = y[j] - etraj_point[1]
+                        z_[r][k] = z[j]  # - self._layerZs[0]  # Used to be defined relative to the ecal face; changed to absolute bc of Huilin's old results
+                        layer_id_[r][k] = layer_id[j]
+                        log_energy_[r][k] = np.log(energy[j]) if energy[j] > 0 else -1  # Note:  E<1 is very uncommon, so -1 is okay to round to.
+                        regionIndices[r] += 1
+                """
         # NOTE:  TESTING
         #print("current x_1: (should be 0-padded) "+str(x_[0]))
 
@@ -382,9 +516,7 @@ class ECalHitsDataset(Dataset):
         # Lastly, create and fill obs_dict w/ branches specified in train.py:
         o_dict = {}
         for branch in self.obs_branches:
-            o_leaf = self.ttree.GetLeaf(branch)
-            o_arr = np.array([o_leaf.GetValue(i) for i in range(o_leaf.GetLen())], dtype='float32')
-            o_dict[branch] = o_arr
+            o_dict[branch] = self._get_values(branch, dtype='float32')
 
         return var_dict, o_dict
 
@@ -410,12 +542,28 @@ class ECalHitsDataset(Dataset):
         if version=='v13':
             zd = np.loadtxt('data/%s/layer.txt' % version)
             self._layerZs = {round(zd[i]):i for i in range(len(zd))}
+            # Sorted rounded layer z's and their layer numbers, for searchsorted lookup in _getlayer()
+            self._layerZ_keys = np.array(sorted(self._layerZs.keys()), dtype='float64')
+            self._layerZ_layers = np.array([self._layerZs[k] for k in sorted(self._layerZs.keys())], dtype='int')
+        if version=='v12':
+            # Dense mcid -> (x, y) lookup arrays in place of the _cellMap dict (NaN for ids not in the map)
+            mcids = np.array([int(i) for i in self._cellMap.keys()], dtype='int')
+            self._cellX = np.full(mcids.max() + 1, np.nan)
+            self._cellY = np.full(mcids.max() + 1, np.nan)
+            self._cellX[mcids] = [xy[0] for xy in self._cellMap.values()]
+            self._cellY[mcids] = [xy[1] for xy in self._cellMap.values()]
         print("Loaded geometry info")
 
     def _getlayer(self, zarr):
         # Pass in multidim array of z positions, return array of layer numbers
         #print(self._layerZs)
         #print(zarr[:10])
+        if self.vectorized:
+            zr = np.round(np.asarray(zarr, dtype='float64'))
+            idx = np.clip(np.searchsorted(self._layerZ_keys, zr), 0, len(self._layerZ_keys) - 1)
+            if not np.all(self._layerZ_keys[idx] == zr):
+                raise KeyError("z position(s) not matching any layer: {}".format(zr[self._layerZ_keys[idx] != zr]))
+            return self._layerZ_layers[idx]
         def roundreturn(val):
             return self._layerZs[round(val)]
         return list(map(roundreturn, zarr))  #self._layerZs.__getitem__, zarr))
@@ -432,11 +580,44 @@ class ECalHitsDataset(Dataset):
         #    print("FOUND ONE-HIT EVENT...{}".format(mcid))
         #if len(mcid) == 0:
         #    print("FOUND ZERO-HIT EVENT, this shouldn't happen...{}".format(mcid))
+        if self.vectorized:
+            if np.any(mcid >= len(self._cellX)) or np.any(np.isnan(self._cellX[mcid[mcid < len(self._cellX)]])):
+                raise KeyError("cell id(s) not found in cellMap")
+            return (self._cellX[mcid], self._cellY[mcid], self._layerZs[layer]), layer
         x, y = zip(*map(self._cellMap.__getitem__, mcid))
         z = list(map(self._layerZs.__getitem__, layer))
         return (x, y, z), layer
 
 
+class ChunkShuffleSampler(Sampler):
+    # Shuffled event order for the uproot backend that doesn't thrash its chunk cache.
+    # A plain shuffle=True draws every event from a random chunk, so once a sample has more than
+    # max_cached_chunks*chunk_size events nearly every event reads a whole chunk from disk.  Instead, the chunks
+    # (file, chunk_start) are shuffled and taken chunks_per_group at a time, and the events of each group are
+    # shuffled together.  Each DataLoader worker then only needs the chunks of the group(s) its batches are in.
+    # chunks_per_group defaults to half of max_cached_chunks, leaving room for a batch spanning two groups.
+    # Groups mix chunks of many files, so batches still mix sig/bkg (more so for larger chunks_per_group).
+
+    def __init__(self, dataset, chunks_per_group=None, generator=None):
+        self.num_events = len(dataset)
+        self.chunks_per_group = chunks_per_group if chunks_per_group else max(1, dataset.max_cached_chunks // 2)
+        self.generator = generator  # None -> torch's global RNG, like shuffle=True
+        chunks = collections.OrderedDict()  # (filename, chunk_start) -> dataset indices
+        for i, (label, filename, file_index) in enumerate(dataset.event_list):
+            chunks.setdefault((filename, file_index - file_index % dataset.chunk_size), []).append(i)
+        self.chunks = [np.array(indices) for indices in chunks.values()]
+
+    def __len__(self):
+        return self.num_events
+
+    def __iter__(self):
+        order = torch.randperm(len(self.chunks), generator=self.generator).tolist()
+        for g in range(0, len(order), self.chunks_per_group):
+            events = np.concatenate([self.chunks[c] for c in order[g:g + self.chunks_per_group]])
+            for k in torch.randperm(len(events), generator=self.generator).tolist():
+                yield int(events[k])
+
+
 class _SimpleCustomBatch:
 
     def __init__(self, data, min_nodes=None):
@@ -1,8 +1,5 @@
 from __future__ import print_function
 
-print("Importing ROOT")
-import ROOT as r
-print("ROOT imported")
 
 import resource
 #resource.setrlimit(resource.RLIMIT_NOFILE, (1048576, 1048576))
@@ -36,8 +33,14 @@ parser.add_argument('--num-workers', type=int, default=2)
 parser.add_argument('--batch-size', type=int, default=1024)
 parser.add_argument('--device', type=str, default='cuda:0')
 parser.add_argument('--num-regions', type=int, default=1)
+parser.add_argument('--backend', type=str, default='root', choices=['root', 'uproot'])
 args = parser.parse_args()
 
+if args.backend == 'root':
+    print("Importing ROOT")
+    import ROOT as r
+    print("ROOT imported")
+
 obs_branches = []
 
 if args.save_extra:
@@ -171,7 +174,8 @@ def run_one_file(filepath, extra_label=0):
         siglist = {extra_label:(filepath, -1)}
 
     test_frac = (0, 1) if args.test_sig or args.test_bkg else (0, 0.2)
-    test_data = ECalHitsDataset(siglist=siglist, bkglist=bkglist, load_range=test_frac, obs_branches=obs_branches, nRegions=args.num_regions)
+    test_data = ECalHitsDataset(siglist=siglist, bkglist=bkglist, load_range=test_frac, obs_branches=obs_branches, nRegions=args.num_regions,
+                                backend=args.backend)
                                 #, veto_branches=veto_branches, coord_ref=args.coord_ref)
     test_loader = DataLoader(test_data, num_workers=args.num_workers, batch_size=args.batch_size,
                             collate_fn=collate_fn, shuffle=False, drop_last=False, pin_memory=True)
@@ -12,9 +12,8 @@ import awkward
 import glob
 import os
 import re
-print("Importing ROOT")
-import ROOT as r
-print("Imported root.  Starting...")
+import resource
+import time
 from multiprocessing import Pool
 
 """
@@ -32,7 +31,8 @@ Outline:
    - Drop all events that fail the preselection condition.
    - Compute the pT of each event from the TargetScoringPlaneHit information (needed for pT bias plots, and not
      present in ROOT files), and keep track of it alongside the other arrays/branches loaded for the file.
-   - Use ROOT to create new output files and to fill them with the contents of the loaded arrays.
+   - Create new output files and fill them with the contents of the loaded arrays, either with ROOT (event by event)
+     or with uproot (whole jagged arrays at once); see OUTPUT_MODE.
 
 """
 
@@ -71,6 +71,35 @@ MAX_NUM_ECAL_HITS = 50 #60  #110  #Now MUCH lower!  >99% of 1 MeV sig should pas
 MAX_ISO_ENERGY = 500  # NOTE:  650 passes 99.99% sig, ~13% bkg for 3.0.0!  Lowering...
 # Results:  >0.994 vs 0.055
 
+# Compute TargetSPRecoilE_pt and the hit counts with awkward array operations over all events at once.
+# Set to False to use the original per-event loops instead (identical output, much slower).
+VECTORIZED = True
+
+# How to write the output files:
+# 'root':    fill a PyROOT TTree event by event (original approach)
+# 'uproot':  write the jagged arrays directly w/ uproot, WRITE_CHUNK_SIZE events at a time; doesn't import ROOT.
+#            Same branch names/types, so ECalHitsDataset reads either.
+OUTPUT_MODE = 'root'
+WRITE_CHUNK_SIZE = 50000
+
+# Streaming mode:  read and preselect the input STREAM_CHUNK_SIZE events at a time and append the survivors to the
+# output as we go, instead of loading every branch of a whole file first.  Always writes with uproot.
+# MEMORY_BUDGET_MB caps per-worker memory (0 = no cap):  chunks are sized so their arrays take at most
+# MEMORY_BUDGET_MB/CHUNK_MEMORY_FACTOR (the rest is headroom for the preselected copies + output arrays), and
+# are halved (down to MIN_CHUNK_SIZE) if the worker's RSS still goes over the budget.
+STREAMING = False
+STREAM_CHUNK_SIZE = 100000
+MEMORY_BUDGET_MB = 2000
+CHUNK_MEMORY_FACTOR = 4
+MIN_CHUNK_SIZE = 1000
+
+# Scheduling:  all files (every mass) go to one pool of NUM_PROCESSES workers, largest first.
+# SCHEDULE_BY is 'size' (on-disk file size, cheap) or 'entries' (number of events; opens every file once).
+# Per-file timings are written to output_dir/TASK_SUMMARY_LOG.
+NUM_PROCESSES = 20
+SCHEDULE_BY = 'size'
+TASK_SUMMARY_LOG = 'task_summary.log'
+
 # Branches to save:
 # Quantities labeled with 'scalars' have a single value per event.  Quantities labeled with 'vectors' have
 # one value for every hit (e.g. number of ecal hits vs x position of each hit).
@@ -108,80 +137,32 @@ def blname(branch, leaf):
         return '{}/{}.{}'.format(branch, branch, leaf)
 
 
-def processFile(input_vars):
-    # input_vars is a list:
-    # [file_to_read, signal_mass, nth_file_in_mass_group]
-    filename = input_vars[0]  # Apparently this is the easiest approach to multiple args...
-    mass = input_vars[1]
-    filenum = input_vars[2]
-
-    print("Processing file {}".format(filename))
-    if mass == 0:
-        outfile_name = "v13_pn_trigger_{}.root".format(filenum)
-    else:
-        outfile_name = "v13_{}_trigger_{}.root".format(mass, filenum)
-    outfile_path = os.sep.join([output_dir, outfile_name])
-
-    # NOTE:  Added this to ...
-    if os.path.exists(outfile_path):
-        print("FILE {} ALREADY EXISTS.  SKIPPING...".format(outfile_name))
-        return 0, 0
-
-    # Fix branch names:  uproot refers to EcalVeto branches with a / ('EcalVeto_v12/nReadoutHits_', etc), while
-    # all other branches are referred to with a . ('EcalRecHits_v12.energy_', etc).  This is because ldmx-sw
-    # writes EcalVeto information to the ROOT files in a somewhat unusual way; this may change in future updates
-    # to ldmx-sw.
-    branchList = []
-    for branchname, leafdict in data_to_save.items():
-        for leaf in leafdict['scalars'] + leafdict['vectors']:
-            # EcalVeto needs slightly different syntax:   . -> /
-            if branchname == "EcalVeto_v3_v13":
-                branchList.append(branchname + '/' + leaf)
-            else:
-                branchList.append(branchname + '/' + branchname + '.' + leaf)
-
-    print("Branches to load:")
-    print(branchList)
-
-    # Open the file and read all necessary data from it:
-    t = uproot.open(filename)['LDMX_Events']
-    print("OPENED FiLE")
-    # (This part is just for printing the # of pre-preselection events:)
-    #tmp = t.arrays(['EcalRecHits_v12/id_'])
-    #nTotalEvents = len(tmp)
-    #print("Before preselection:  found {} events".format(nTotalEvents))
-
-    # t.arrays() returns a dict-like object:
-    #    raw_data['EcalVeto_v12/nReadoutHits_'] == awkward array containing the value of 
-    #    nReadoutHits_ for each event, and so on.
-    raw_data = t.arrays(branchList) #, preselection)  #, aliases=alias_dict)
-    print("Check raw_data:")
-    print(raw_data[blname('EcalScoringPlaneHits_v3_v13','pdgID_')])
-
-
-    nTotalEvents = len(raw_data[blname('EcalRecHits_v3_v13', 'xpos_')])
-    print("Before preselection:  found {} events".format(nTotalEvents))
-
-    # Perform the preselection:  Drop all events with more than MAX_NUM_ECAL_HITS in the ecal, 
-    # and all events with an isolated energy that exceeds MAXX_ISO_ENERGY
-    el = (raw_data[blname('EcalVeto_v3_v13', 'nReadoutHits_')] < MAX_NUM_ECAL_HITS) * (raw_data[blname('EcalVeto_v3_v13', 'summedTightIso_')] < MAX_ISO_ENERGY)
-    preselected_data = {}
-    for branch in branchList:
-        preselected_data[branch] = raw_data[branch][el]
-    nEvents = len(preselected_data[blname('EcalVeto_v3_v13', 'summedTightIso_')])
-    print("After preselection:  found {} events".format(nEvents))
-
-    # Next, we have to compute TargetSPRecoilE_pt here instead of in train.py.  (This involves TargetScoringPlane
-    # information that ParticleNet doesn't need, and that would take a long time to load with the lazy-loading
-    # approach.)
-    # For each event, find the recoil electron (maximal recoil pz):
-    pdgID_ = t[blname('TargetScoringPlaneHits_v3_v13', 'pdgID_')].array()[el]
-    z_     = t[blname('TargetScoringPlaneHits_v3_v13', 'z_')].array()[el]
-    px_    = t[blname('TargetScoringPlaneHits_v3_v13', 'px_')].array()[el]
-    py_    = t[blname('TargetScoringPlaneHits_v3_v13', 'py_')].array()[el]
-    pz_    = t[blname('TargetScoringPlaneHits_v3_v13', 'pz_')].array()[el]
+def recoilPt(data):
+    # pT of the recoil electron at the target scoring plane, for every event at once:
+    # the max-pz electron on the SP just downstream of the target (0.176 < z < 0.178).
+    # Non-electrons are masked to pz=0 so argmax picks the first maximal electron, or hit 0 if there is none,
+    # exactly like the per-event loop in recoilPt_loop().
+    pdgID_ = data[blname('TargetScoringPlaneHits_v3_v13', 'pdgID_')]
+    z_     = data[blname('TargetScoringPlaneHits_v3_v13', 'z_')]
+    px_    = data[blname('TargetScoringPlaneHits_v3_v13', 'px_')]
+    py_    = data[blname('TargetScoringPlaneHits_v3_v13', 'py_')]
+    pz_    = data[blname('TargetScoringPlaneHits_v3_v13', 'pz_')]
+    is_recoil = (pdgID_ == 11) & (z_ > 0.176) & (z_ < 0.178) & (pz_ > 0)
+    recoil_index = awkward.argmax(awkward.where(is_recoil, pz_, 0), axis=1, keepdims=True)
+    pt = np.sqrt(px_[recoil_index]**2 + py_[recoil_index]**2)
+    # Events with no TSP hits at all give 0
+    return awkward.to_numpy(awkward.fill_none(awkward.firsts(pt), 0))
+
+
+def recoilPt_loop(data):
+    # Original per-event implementation of recoilPt(); kept as a reference
+    pdgID_ = data[blname('TargetScoringPlaneHits_v3_v13', 'pdgID_')]
+    z_     = data[blname('TargetScoringPlaneHits_v3_v13', 'z_')]
+    px_    = data[blname('TargetScoringPlaneHits_v3_v13', 'px_')]
+    py_    = data[blname('TargetScoringPlaneHits_v3_v13', 'py_')]
+    pz_    = data[blname('TargetScoringPlaneHits_v3_v13', 'pz_')]
     tspRecoil = []
-    for i in range(nEvents):
+    for i in range(len(pdgID_)):
         max_pz = 0
         recoil_index = 0  # Store the index of the recoil electron
         for j in range(len(pdgID_[i])):
@@ -191,29 +172,42 @@ def processFile(input_vars):
                 recoil_index = j
         # Calculate the recoil SP
         tspRecoil.append(np.sqrt(px_[i][recoil_index]**2 + py_[i][recoil_index]**2))
-    # Put it in the preselected_data and treat it as an ordinary branch from here on out
-    preselected_data['TargetSPRecoilE_pt'] = np.array(tspRecoil)
+    return np.array(tspRecoil)
 
-    # Additionally, add new branches storing the length for vector data (number of SP hits, number of ecal hits):
+
+def hitCounts(data):
+    # Number of ecal SP hits, target SP hits and ecal rec hits w/ E>0 (there are some E=0 hits out there) per event.
+    # NOTE:  max num hits may exceed MAX_NUM...this is okay.
+    nSPHits  = awkward.num(data[blname('EcalScoringPlaneHits_v3_v13','x_')], axis=1)
+    nTSPHits = awkward.num(data[blname('TargetScoringPlaneHits_v3_v13','x_')], axis=1)
+    nRecHits = awkward.sum(data[blname('EcalRecHits_v3_v13','energy_')] > 0, axis=1)
+    return tuple(awkward.to_numpy(n).astype('float64') for n in (nSPHits, nTSPHits, nRecHits))
+
+
+def hitCounts_loop(data):
+    # Original per-event implementation of hitCounts(); kept as a reference
+    x_data = data[blname('EcalScoringPlaneHits_v3_v13','x_')]
+    xsp_data = data[blname('TargetScoringPlaneHits_v3_v13','x_')]
+    E_data = data[blname('EcalRecHits_v3_v13','energy_')]
+    nEvents = len(x_data)
     nSPHits = np.zeros(nEvents) #[]
     nTSPHits = np.zeros(nEvents)
     nRecHits = np.zeros(nEvents) #[]
-    x_data = preselected_data[blname('EcalScoringPlaneHits_v3_v13','x_')]
-    xsp_data = preselected_data[blname('TargetScoringPlaneHits_v3_v13','x_')]
-    E_data = preselected_data[blname('EcalRecHits_v3_v13','energy_')]
-
     for i in range(nEvents):
-        # NOTE:  max num hits may exceed MAX_NUM...this is okay.
         nSPHits[i] = len(x_data[i])  #nSPHits.append(len(x_data[i]))
         nTSPHits[i] = len(xsp_data[i])
         nRecHits[i] = sum(E_data[i] > 0)  #nRecHits.append(sum(E_data[i] > 0))  #len(E_data[i])) # NOTE:  Must be number of hits with E>0, since there's some E=0 hits out there...
         if len(E_data[i]) == 0:
             # ****** print("0 len! nrh was {}, i={}".format(sum(E_data[i] > 0), i))
             nRecHits[i] = 0
-    preselected_data['nSPHits']  = np.array(nSPHits)
-    preselected_data['nTSPHits'] = np.array(nTSPHits)
-    preselected_data['nRecHits'] = np.array(nRecHits)
+    return nSPHits, nTSPHits, nRecHits
+
 
+def writeFileROOT(outfile_path, branchList, preselected_data):
+    # Original output mode:  fill a PyROOT TTree one event at a time through fixed-size holder arrays
+    import ROOT as r
+    branchList = list(branchList)
+    nEvents = len(preselected_data['nRecHits'])
 
     # Prepare the output tree+file:
     outfile = r.TFile(outfile_path, "RECREATE")
@@ -315,31 +309,291 @@ def processFile(input_vars):
 
     # Finally, write the filled tree to the ouput file:
     outfile.Write()
+
+
+# Vector branches in the output tree:  (input collection, output group, branch name suffix, counter branch)
+vector_groups = [
+    ('EcalScoringPlaneHits_v3_v13',   'sp',  '',     'nSPHits'),
+    ('TargetScoringPlaneHits_v3_v13', 'tsp', 'tsp_', 'nTSPHits'),
+    ('EcalRecHits_v3_v13',            'rec', 'rec_', 'nRecHits'),
+]
+
+
+def outputArrays(preselected_data):
+    # Rearrange (a chunk of) preselected data into the skimmed_events layout written by writeFileROOT():
+    # float32 scalars named after their leaf, the int counters, and one record array of float32 vectors per
+    # collection (written as branches <leaf><suffix>[<counter>]).  Events w/o ecal hits are dropped.
+    keep = preselected_data['nRecHits'] > 0
+    nRecHits = preselected_data['nRecHits'][keep].astype('int32')
+    out = {}
+    for branchname, leafdict in data_to_save.items():
+        for leaf in leafdict['scalars']:
+            out[leaf] = awkward.to_numpy(preselected_data[blname(branchname, leaf)][keep]).astype('float32')
+    out['TargetSPRecoilE_pt'] = np.asarray(preselected_data['TargetSPRecoilE_pt'])[keep].astype('float32')
+    for branchname, group, suffix, counter in vector_groups:
+        fields = {}
+        for leaf in data_to_save[branchname]['vectors']:
+            arr = awkward.values_astype(preselected_data[blname(branchname, leaf)][keep], np.float32)
+            if group == 'rec':
+                # Same as the [nRecHits] leaf in the ROOT output:  only the first nRecHits (# of E>0 hits) are kept
+                arr = arr[awkward.local_index(arr, axis=1) < nRecHits]
+            fields[leaf] = arr
+        out[group] = awkward.zip(fields)
+    return out
+
+
+def writeFileUproot(outfile_path, preselected_data):
+    # Columnar output mode:  write the preselected jagged arrays with uproot, WRITE_CHUNK_SIZE events per basket,
+    # instead of filling a PyROOT tree event by event.  Branch names and types match writeFileROOT().
+    out = outputArrays(preselected_data)
+    with uproot.recreate(outfile_path) as outfile:
+        tree = mkSkimmedTree(outfile)
+        extendSkimmedTree(tree, out)
+
+
+def mkSkimmedTree(outfile):
+    # Create an empty skimmed_events tree in an uproot file w/ the same branches as writeFileROOT()
+    branch_types = {}
+    for branchname, leafdict in data_to_save.items():
+        for leaf in leafdict['scalars']:
+            branch_types[leaf] = 'float32'
+    branch_types['TargetSPRecoilE_pt'] = 'float32'
+    for branchname, group, suffix, counter in vector_groups:
+        branch_types[group] = 'var * {' + ', '.join('{}: float32'.format(leaf) for leaf in data_to_save[branchname]['vectors']) + '}'
+    counters = {group: counter for _, group, _, counter in vector_groups}
+    suffixes = {group: suffix for _, group, suffix, _ in vector_groups}
+    return outfile.mktree('skimmed_events', branch_types, title='skimmed ldmx event data',
+                          counter_name=lambda counted: counters[counted],
+                          field_name=lambda outer, inner: inner + suffixes[outer])
+
+
+def extendSkimmedTree(tree, out):
+    # Append the output arrays from outputArrays() to the tree in chunks of WRITE_CHUNK_SIZE events
+    nEvents = len(out['TargetSPRecoilE_pt'])
+    for start in range(0, nEvents, WRITE_CHUNK_SIZE):
+        tree.extend({k: v[start:start + WRITE_CHUNK_SIZE] for k, v in out.items()})
+
+
+def preselect(raw_data, branchList):
+    # Apply the preselection to raw_data (all branches in branchList), then add TargetSPRecoilE_pt and the hit
+    # counts.  Returns the preselected_data dict that gets written to the output file.
+    # raw_data is either a whole file or one chunk of it (streaming mode).
+
+    # Perform the preselection:  Drop all events with more than MAX_NUM_ECAL_HITS in the ecal, 
+    # and all events with an isolated energy that exceeds MAXX_ISO_ENERGY
+    el = (raw_data[blname('EcalVeto_v3_v13', 'nReadoutHits_')] < MAX_NUM_ECAL_HITS) * (raw_data[blname('EcalVeto_v3_v13', 'summedTightIso_')] < MAX_ISO_ENERGY)
+    preselected_data = {}
+    for branch in branchList:
+        preselected_data[branch] = raw_data[branch][el]
+    nEvents = len(preselected_data[blname('EcalVeto_v3_v13', 'summedTightIso_')])
+    print("After preselection:  found {} events".format(nEvents))
+
+    # Next, we have to compute TargetSPRecoilE_pt here instead of in train.py.  (This involves TargetScoringPlane
+    # information that ParticleNet doesn't need, and that would take a long time to load with the lazy-loading
+    # approach.)
+    # For each event, find the recoil electron (maximal recoil pz) and put its pT in the preselected_data; it's
+    # treated as an ordinary branch from here on out.
+    # Additionally, add new branches storing the length for vector data (number of SP hits, number of ecal hits):
+    if VECTORIZED:
+        preselected_data['TargetSPRecoilE_pt'] = recoilPt(preselected_data)
+        nSPHits, nTSPHits, nRecHits = hitCounts(preselected_data)
+    else:
+        preselected_data['TargetSPRecoilE_pt'] = recoilPt_loop(preselected_data)
+        nSPHits, nTSPHits, nRecHits = hitCounts_loop(preselected_data)
+    preselected_data['nSPHits']  = nSPHits
+    preselected_data['nTSPHits'] = nTSPHits
+    preselected_data['nRecHits'] = nRecHits
+    return preselected_data
+
+
+def currentRSS():
+    # Resident memory of this process in MB (from /proc on Linux; elsewhere falls back to the peak from getrusage)
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024.**2
+    except (IOError, OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.
+
+
+def processFileStreaming(filename, outfile_path, branchList):
+    # Streaming version of processFile():  read the input STREAM_CHUNK_SIZE events at a time, preselect each chunk and
+    # append the survivors to the output right away, so only one chunk is ever held in memory.
+    # The chunk size is also capped so that a chunk's arrays fit in MEMORY_BUDGET_MB/CHUNK_MEMORY_FACTOR, and is
+    # halved whenever the worker's RSS still exceeds MEMORY_BUDGET_MB after a chunk.
+    t = uproot.open(filename)['LDMX_Events']
+    nEntries = t.num_entries
+    step = STREAM_CHUNK_SIZE
+    if MEMORY_BUDGET_MB:
+        step = min(step, t.num_entries_for('{} MB'.format(MEMORY_BUDGET_MB / float(CHUNK_MEMORY_FACTOR)), branchList))
+    step = max(step, MIN_CHUNK_SIZE)
+    print("Streaming {} events from {} in chunks of {}".format(nEntries, filename, step))
+
+    nTotalEvents = 0
+    nEvents = 0
+    peak_rss = currentRSS()
+    # Write to a temporary name first so an interrupted job doesn't leave behind a partial file that gets skipped
+    tmp_path = outfile_path + '.part'
+    with uproot.recreate(tmp_path) as outfile:
+        tree = mkSkimmedTree(outfile)
+        start = 0
+        while start < nEntries:
+            stop = min(start + step, nEntries)
+            raw_data = t.arrays(branchList, entry_start=start, entry_stop=stop)
+            preselected_data = preselect(raw_data, branchList)
+            extendSkimmedTree(tree, outputArrays(preselected_data))
+            nTotalEvents += stop - start
+            nEvents += len(preselected_data['nRecHits'])
+            rss = currentRSS()
+            peak_rss = max(peak_rss, rss)
+            del raw_data, preselected_data
+            if MEMORY_BUDGET_MB and rss > MEMORY_BUDGET_MB and step > MIN_CHUNK_SIZE:
+                step = max(MIN_CHUNK_SIZE, step // 2)
+                print("RSS {:.0f} MB exceeds budget of {} MB; reducing chunk size to {}".format(rss, MEMORY_BUDGET_MB, step))
+            start = stop
+    os.rename(tmp_path, outfile_path)
+    print("Peak RSS for {}:  {:.0f} MB (sampled per chunk), {:.0f} MB (worker lifetime max)".format(
+          filename, peak_rss, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.))
+    print("FINISHED.  File written to {}.".format(outfile_path))
+    return (nTotalEvents, nEvents)
+
+
+def processFile(input_vars):
+    # input_vars is a list:
+    # [file_to_read, signal_mass, nth_file_in_mass_group]
+    filename = input_vars[0]  # Apparently this is the easiest approach to multiple args...
+    mass = input_vars[1]
+    filenum = input_vars[2]
+
+    print("Processing file {}".format(filename))
+    if mass == 0:
+        outfile_name = "v13_pn_trigger_{}.root".format(filenum)
+    else:
+        outfile_name = "v13_{}_trigger_{}.root".format(mass, filenum)
+    outfile_path = os.sep.join([output_dir, outfile_name])
+
+    # NOTE:  Added this to ...
+    if os.path.exists(outfile_path):
+        print("FILE {} ALREADY EXISTS.  SKIPPING...".format(outfile_name))
+        return 0, 0
+
+    # Fix branch names:  uproot refers to EcalVeto branches with a / ('EcalVeto_v12/nReadoutHits_', etc), while
+    # all other branches are referred to with a . ('EcalRecHits_v12.energy_', etc).  This is because ldmx-sw
+    # writes EcalVeto information to the ROOT files in a somewhat unusual way; this may change in future updates
+    # to ldmx-sw.
+    branchList = []
+    for branchname, leafdict in data_to_save.items():
+        for leaf in leafdict['scalars'] + leafdict['vectors']:
+            # EcalVeto needs slightly different syntax:   . -> /
+            if branchname == "EcalVeto_v3_v13":
+                branchList.append(branchname + '/' + leaf)
+            else:
+                branchList.append(branchname + '/' + branchname + '.' + leaf)
+
+    print("Branches to load:")
+    print(branchList)
+
+    if STREAMING:
+        return processFileStreaming(filename, outfile_path, branchList)
+
+    # Open the file and read all necessary data from it:
+    t = uproot.open(filename)['LDMX_Events']
+    print("OPENED FiLE")
+    # (This part is just for printing the # of pre-preselection events:)
+    #tmp = t.arrays(['EcalRecHits_v12/id_'])
+    #nTotalEvents = len(tmp)
+    #print("Before preselection:  found {} events".format(nTotalEvents))
+
+    # t.arrays() returns a dict-like object:
+    #    raw_data['EcalVeto_v12/nReadoutHits_'] == awkward array containing the value of 
+    #    nReadoutHits_ for each event, and so on.
+    raw_data = t.arrays(branchList) #, preselection)  #, aliases=alias_dict)
+    print("Check raw_data:")
+    print(raw_data[blname('EcalScoringPlaneHits_v3_v13','pdgID_')])
+
+
+    nTotalEvents = len(raw_data[blname('EcalRecHits_v3_v13', 'xpos_')])
+    print("Before preselection:  found {} events".format(nTotalEvents))
+
+    preselected_data = preselect(raw_data, branchList)
+    nEvents = len(preselected_data['nRecHits'])
+
+    # Finally, write the preselected events to the output file:
+    if OUTPUT_MODE == 'uproot':
+        writeFileUproot(outfile_path, preselected_data)
+    else:
+        writeFileROOT(outfile_path, branchList, preselected_data)
     print("FINISHED.  File written to {}.".format(outfile_path))
 
     return (nTotalEvents, nEvents)
 
 
+def taskSize(input_vars):
+    # Cost estimate used to order the tasks:  on-disk size, or number of events in the input file
+    if SCHEDULE_BY == 'entries':
+        with uproot.open(input_vars[0]) as f:
+            return f['LDMX_Events'].num_entries
+    return os.path.getsize(input_vars[0])
+
+
+def scheduleTasks(params):
+    # Order the processFile() params largest-first
+    return sorted(params, key=taskSize, reverse=True)
+
+
+def timedProcessFile(input_vars):
+    # processFile() + the info needed for the summary:  (filename, mass, (nTotalEvents, nEvents), wall time)
+    start = time.time()
+    result = processFile(input_vars)
+    return input_vars[0], input_vars[1], result, time.time() - start
+
+
+def writeTaskSummary(timings, total_time):
+    # Print per-file timings (slowest first) and save them to TASK_SUMMARY_LOG in output_dir, so stragglers are visible
+    timings = sorted(timings, reverse=True)
+    lines = ["Processed {} files in {:.1f} s w/ {} processes".format(len(timings), total_time, NUM_PROCESSES),
+             "{:>10} {:>8} {:>10} {:>10}  {}".format('seconds', 'mass', 'nTotal', 'nPassed', 'file')]
+    for seconds, filename, mass, nT, nE in timings:
+        lines.append("{:>10.1f} {:>8} {:>10} {:>10}  {}".format(seconds, mass, nT, nE, filename))
+    if timings:
+        t = np.array([tm[0] for tm in timings])
+        lines.append("Per-file time:  median {:.1f} s, max {:.1f} s, sum {:.1f} s".format(np.median(t), t.max(), t.sum()))
+    print('\n'.join(lines))
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    with open(os.path.join(output_dir, TASK_SUMMARY_LOG), 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
 if __name__ == '__main__':
     # New approach:  Use multiprocessing
-    #pool = Pool(16) -> Run 16 threads/process 16 files in parallel
-    
-    presel_eff = {}
-    # For each signal mass and for PN background:
+    # All (mass, file) tasks share one pool, and are submitted largest-first so that a single huge file can't
+    # stall the end of the run while other cores sit idle.  Results come back in completion order.
+
+    # Assemble list of function params for every mass up front
+    # These get passed to processFile() when Pool requests them
+    params = []
     for mass, filepath in file_templates.items():
-        print("======  m={}  ======".format(mass))
-        # Assemble list of function params
-        # These get passed to processFile() when Pool requests them
-        params = []
         for filenum, f in enumerate(glob.glob(filepath)):
             params.append([f, mass, filenum])  # list will be passed to ProcessFile:  processFile([filepath, mass, file_number])
-        with Pool(20) as pool:  # Can increase this number if desired, although this depends on how many threads POD will let you run at once...
-            # this number is unclear, but 20 seems right judging from the POD webpage
-            results = pool.map(processFile, params)
-        print("Finished.  Result len:", len(results))
-        print(results)
-        nTotal  = sum([r[0] for r in results])
-        nEvents = sum([r[1] for r in results])
+    params = scheduleTasks(params)
+    print("Scheduled {} files (largest first, by {})".format(len(params), SCHEDULE_BY))
+
+    results = {mass: [] for mass in file_templates}
+    timings = []
+    start = time.time()
+    with Pool(NUM_PROCESSES) as pool:  # Can increase this number if desired, although this depends on how many threads POD will let you run at once...
+        # this number is unclear, but 20 seems right judging from the POD webpage
+        for filename, mass, (nT, nE), seconds in pool.imap_unordered(timedProcessFile, params):
+            results[mass].append((nT, nE))
+            timings.append((seconds, filename, mass, nT, nE))
+            print("[{}/{}] {:.1f} s  {}".format(len(timings), len(params), seconds, filename))
+    writeTaskSummary(timings, time.time() - start)
+
+    presel_eff = {}
+    # For each signal mass and for PN background:
+    for mass in file_templates:
+        nTotal  = sum([r[0] for r in results[mass]])
+        nEvents = sum([r[1] for r in results[mass]])
         print("m = {} MeV:  Read {} events, {} passed preselection".format(int(mass*1000), nTotal, nEvents))
         if nTotal > 0:
             presel_eff[int(mass * 1000)] = float(nEvents) / nTotal
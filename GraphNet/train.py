@@ -2,9 +2,6 @@ from __future__ import print_function
 
 import psutil
 
-print("Importing ROOT")
-import ROOT as r
-print("ROOT imported")
 
 import resource
 # Note:  This doesn't work on POD
@@ -24,6 +21,7 @@ import argparse
 
 from utils.ParticleNet import ParticleNet
 from dataset import ECalHitsDataset
+from dataset import ChunkShuffleSampler
 from dataset import collate_wrapper as collate_fn
 from utils.SplitNet import SplitNet
 
@@ -67,9 +65,16 @@ parser.add_argument('--test-output-path', type=str, default='test-outputs/partic
                     help='path to save the prediction output')
 parser.add_argument('--num-regions', type=int, default=1,
                     help='Number of regions for SplitNet')
+parser.add_argument('--backend', type=str, default='root', choices=['root', 'uproot'],
+                    help='how ECalHitsDataset reads the input files; uproot never imports ROOT')
 print(sys.argv)
 args = parser.parse_args()
 
+if args.backend == 'root':
+    print("Importing ROOT")
+    import ROOT as r
+    print("ROOT imported")
+
 ###### locations of the signal and background files ######
 # NOTE:  These must be output files produced by file_processor.py, not unprocessed ldmx-sw ROOT files.
 bkglist = {
@@ -200,11 +205,17 @@ dev = torch.device(args.device)
 if training_mode:
     # for training: we use the first 0-20% for testing, and 20-80% for training
     # Create one EcalHitsDatset storing the testing/validation sample...
-    train_data = ECalHitsDataset(siglist=siglist, bkglist=bkglist, load_range=(0.2, 1), nRegions=args.num_regions)
+    train_data = ECalHitsDataset(siglist=siglist, bkglist=bkglist, load_range=(0.2, 1), nRegions=args.num_regions,
+                                 backend=args.backend)
     # ...and one storing the training sample.
-    val_data = ECalHitsDataset(siglist=siglist, bkglist=bkglist, load_range=(0, 0.2), nRegions=args.num_regions)
+    val_data = ECalHitsDataset(siglist=siglist, bkglist=bkglist, load_range=(0, 0.2), nRegions=args.num_regions,
+                               backend=args.backend)
+    # uproot backend:  shuffle chunks, then events within groups of chunks, so the chunk cache isn't read from
+    # disk for nearly every event (see ChunkShuffleSampler in dataset.py)
+    train_sampler = ChunkShuffleSampler(train_data) if args.backend == 'uproot' else None
     train_loader = DataLoader(train_data, num_workers=args.num_workers, batch_size=args.batch_size,
-                              collate_fn=collate_fn, shuffle=True, drop_last=True, pin_memory=True)
+                              collate_fn=collate_fn, shuffle=train_sampler is None, sampler=train_sampler,
+                              drop_last=True, pin_memory=True)
     val_loader = DataLoader(val_data, num_workers=args.num_workers, batch_size=args.batch_size,
                             collate_fn=collate_fn, shuffle=False, drop_last=False, pin_memory=True)
     print('Train: %d events, Val: %d events' % (len(train_data), len(val_data)))
@@ -216,7 +227,7 @@ else:
     # If not in training mode, don't need to bother with the second training dataset.
     test_frac = (0, 1) if args.test_sig or args.test_bkg else (0, 0.2)
     test_data = ECalHitsDataset(siglist=siglist, bkglist=bkglist, load_range=test_frac, 
-                                obs_branches=obs_branches, nRegions=args.num_regions)
+                                obs_branches=obs_branches, nRegions=args.num_regions, backend=args.backend)
     test_loader = DataLoader(test_data, num_workers=args.num_workers, batch_size=args.batch_size,
                              collate_fn=collate_fn, shuffle=False, drop_last=False, pin_memory=True)
 
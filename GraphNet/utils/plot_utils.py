@@ -69,3 +69,144 @@ def get_signal_effs(fpr, tpr, mistags=[1e-3, 1e-4, 1e-5, 1e-6]):
         idx = next(idx for idx, v in enumerate(fpr) if v > m)
         outputs.append((fpr[idx], tpr[idx]))
     return outputs
+
+
+class ScoreHistogram(object):
+    """Fine-binned histogram of classifier scores, for ROC curves of samples too large to keep in memory.
+    Scores are added a chunk at a time with `fill`; histograms of the same sample from different files
+    or jobs are merged with `add` (or saved with `save` and merged with `load_histograms`).
+    Memory is `num_bins` numbers per sample, and curves, AUC and cuts are exact to within one bin.
+    # Arguments
+        num_bins: number of equal bins over [low, high]; scores outside go into the end bins.
+    """
+
+    def __init__(self, num_bins=1000000, low=0., high=1.):
+        self.num_bins = int(num_bins)
+        self.low = float(low)
+        self.high = float(high)
+        self.counts = np.zeros(self.num_bins)
+        self.entries = 0
+
+    def fill(self, scores, weights=None):
+        scores = np.asarray(scores, dtype=np.float64).ravel()
+        keep = ~np.isnan(scores)
+        if weights is not None:
+            weights = np.asarray(weights, dtype=np.float64).ravel()[keep]
+        scores = scores[keep]
+        bins = np.floor((scores - self.low) * (self.num_bins / (self.high - self.low)))
+        bins = np.clip(bins, 0, self.num_bins - 1).astype(np.int64)
+        self.counts += np.bincount(bins, weights=weights, minlength=self.num_bins)
+        self.entries += len(scores)
+        return self
+
+    def add(self, other):
+        if (self.num_bins, self.low, self.high) != (other.num_bins, other.low, other.high):
+            raise ValueError('Cannot add histograms with different binnings')
+        self.counts += other.counts
+        self.entries += other.entries
+        return self
+
+    def edges(self):
+        return np.linspace(self.low, self.high, self.num_bins + 1)
+
+    def efficiencies(self):
+        """Fraction of the sample with score >= each bin edge, from the loosest cut to the tightest."""
+        above = np.append(np.cumsum(self.counts[::-1])[::-1], 0.)
+        return above / above[0]
+
+    def save(self, path):
+        np.savez(path, counts=self.counts, low=self.low, high=self.high, entries=self.entries)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as saved:
+            hist = cls(len(saved['counts']), saved['low'], saved['high'])
+            hist.counts = saved['counts'].astype(np.float64)
+            hist.entries = int(saved['entries'])
+        return hist
+
+
+def load_histograms(paths):
+    """Sum of the ScoreHistograms saved in `paths` (e.g. one per job)."""
+    hist = ScoreHistogram.load(paths[0])
+    for path in paths[1:]:
+        hist.add(ScoreHistogram.load(path))
+    return hist
+
+
+def histograms_from_parquet(files, disc='ParticleNet_disc', label='ParticleNet_extra_label',
+                            batch_size=1000000, **kwargs):
+    """Streams eval output parquet files a batch at a time into one ScoreHistogram per label value
+    (0 for background, the signal mass otherwise).
+    # Returns
+        A dict {label: ScoreHistogram}.
+    """
+    import pyarrow.parquet as pq
+    hists = {}
+    for f in files:
+        for batch in pq.ParquetFile(f).iter_batches(batch_size=batch_size, columns=[disc, label]):
+            scores = batch.column(0).to_numpy(zero_copy_only=False)
+            labels = batch.column(1).to_numpy(zero_copy_only=False)
+            for k in np.unique(labels):
+                if k not in hists:
+                    hists[k] = ScoreHistogram(**kwargs)
+                hists[k].fill(scores[labels == k])
+    return hists
+
+
+def roc_from_histograms(sig_hist, bkg_hist):
+    """ROC curve from score histograms, like sklearn's roc_curve (fpr increasing, thresholds decreasing),
+    with only the cuts at bin edges where either efficiency changes.
+    # Returns
+        fpr, tpr, thresholds, auc and auc_error:  the trapezoid AUC counts each signal-background pair in
+        the same bin as half ordered right, so the exact AUC is within auc_error of it.
+    """
+    fpr = bkg_hist.efficiencies()[::-1]
+    tpr = sig_hist.efficiencies()[::-1]
+    thresholds = sig_hist.edges()[::-1]
+    auc = np.sum((fpr[1:] - fpr[:-1]) * (tpr[1:] + tpr[:-1])) / 2.
+    auc_error = 0.5 * np.sum(sig_hist.counts * bkg_hist.counts) / (sig_hist.counts.sum() * bkg_hist.counts.sum())
+    keep = np.append(True, (np.diff(fpr) != 0) | (np.diff(tpr) != 0))
+    return fpr[keep], tpr[keep], thresholds[keep], auc, auc_error
+
+
+def cut_for_efficiency(hist, target, at_most=False):
+    """Cut (score >= cut) at a bin edge with efficiency as close to `target` as the binning allows:
+    the tightest one with at least `target`, or with `at_most` the loosest one with at most `target`.
+    # Returns
+        The cut and its efficiency; the cut giving exactly `target` is within one bin of it.
+    """
+    effs = hist.efficiencies()
+    if at_most:
+        idx = int(np.argmax(effs <= target))
+    else:
+        idx = int(len(effs) - 1 - np.argmax(effs[::-1] >= target))
+    return hist.edges()[idx], effs[idx]
+
+
+def plotROCHist(sig_hist, bkg_hist, output=None, label='signal', sig_eff=1, bkg_eff=1, **kwargs):
+    """plotROC from ScoreHistograms instead of score arrays (same plot and keyword arguments).
+    # Returns
+        fpr, tpr and auc, like plotROC (without accuracy).
+    """
+    fpr, tpr, _, roc_auc, auc_error = roc_from_histograms(sig_hist, bkg_hist)
+    fpr = fpr * bkg_eff
+    tpr = tpr * sig_eff
+
+    plt.figure()
+    legend = '%s (auc* = %0.6f)' % (label, roc_auc)
+    print('%s, within %.1g' % (legend, auc_error))
+    plt.plot(fpr, tpr, label=legend)
+    plt.xlim(kwargs.get('xlim', [0, 1]))
+    plt.ylim(kwargs.get('ylim', [0, 1]))
+    plt.xlabel('False positive rate / eff_bkg')
+    plt.ylabel('True positive rate / eff_sig')
+    plt.legend(loc='best')
+    if kwargs.get('logy', False):
+        plt.yscale('log')
+    if kwargs.get('logx', False):
+        plt.xscale('log')
+    plt.grid()
+    if output:
+        plt.savefig(output)
+    return fpr, tpr, roc_auc
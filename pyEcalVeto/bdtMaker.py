@@ -1,6 +1,9 @@
 import os
 import sys
+import time
+import shutil
 import logging
+import resource
 import argparse
 import ROOT as r
 import numpy as np
@@ -9,6 +12,7 @@ import xgboost as xgb
 import matplotlib as plt
 from array    import array
 from optparse import OptionParser
+from mods import matrixCache
 
 
 mpl_logger = logging.getLogger('matplotlib')
@@ -16,7 +20,7 @@ mpl_logger.setLevel(logging.WARNING)
 plt.use('Agg')
 
 class sampleContainer:
-    def __init__(self,filename,maxEvts,trainFrac,isSig):
+    def __init__(self,filename,maxEvts,trainFrac,isSig,seed=0,sample=False):
 
         print("Initializing Container!")
         self.tree = r.TChain("EcalVeto")
@@ -24,427 +28,476 @@ class sampleContainer:
         self.maxEvts = maxEvts
         self.trainFrac = trainFrac
         self.isSig   = isSig
+        self.seed    = seed
+        self.sample  = sample
+
+    def eventFeatures(self, event):
+
+        # BDT input variables of an event, in the order the BDT takes them
+        evt = [
+                # Base variables
+                event.nReadoutHits              ,
+                event.summedDet                 ,
+                event.summedTightIso            ,
+                event.maxCellDep                ,
+                event.showerRMS                 ,
+                event.xStd                      ,
+                event.yStd                      ,
+                event.avgLayerHit               ,
+                event.stdLayerHit               ,
+                event.deepestLayerHit           ,
+                event.ecalBackEnergy            ,
+                # MIP Tracking variables
+                event.straight4                 ,
+                event.firstNearPhLayer          ,
+                event.nNearPhHits               ,
+                event.fullElectronTerritoryHits ,
+                event.fullPhotonTerritoryHits   ,
+                event.fullTerritoryRatio        ,
+                event.electronTerritoryHits     ,
+                event.photonTerritoryHits       ,
+                event.TerritoryRatio            ,
+                event.epSep                     ,
+                event.epDot                     ,
+                # Longitudinal segment variables
+                event.energy_s1                 ,
+                event.nHits_s1                  ,
+                event.xMean_s1                  ,
+                event.yMean_s1                  ,
+                event.layerMean_s1              ,
+                event.xStd_s1                   ,
+                event.yStd_s1                   ,
+                event.layerStd_s1               ,
+                event.energy_s2                 ,
+                event.nHits_s2                  ,
+                event.xMean_s2                  ,
+                event.yMean_s2                  ,
+                event.layerMean_s2              ,
+                event.xStd_s2                   ,
+                event.yStd_s2                   ,
+                event.layerStd_s2               ,
+                event.energy_s3                 ,
+                event.nHits_s3                  ,
+                event.xMean_s3                  ,
+                event.yMean_s3                  ,
+                event.layerMean_s3              ,
+                event.xStd_s3                   ,
+                event.yStd_s3                   ,
+                event.layerStd_s3               ,
+                # Electron RoC variables
+                event.eContEnergy_x1_s1         ,
+                event.eContEnergy_x2_s1         ,
+                event.eContEnergy_x3_s1         ,
+                event.eContEnergy_x4_s1         ,
+                event.eContEnergy_x5_s1         ,
+                event.eContNHits_x1_s1          ,
+                event.eContNHits_x2_s1          ,
+                event.eContNHits_x3_s1          ,
+                event.eContNHits_x4_s1          ,
+                event.eContNHits_x5_s1          ,
+                event.eContXMean_x1_s1          ,
+                event.eContXMean_x2_s1          ,
+                event.eContXMean_x3_s1          ,
+                event.eContXMean_x4_s1          ,
+                event.eContXMean_x5_s1          ,
+                event.eContYMean_x1_s1          ,
+                event.eContYMean_x2_s1          ,
+                event.eContYMean_x3_s1          ,
+                event.eContYMean_x4_s1          ,
+                event.eContYMean_x5_s1          ,
+                event.eContLayerMean_x1_s1      ,
+                event.eContLayerMean_x2_s1      ,
+                event.eContLayerMean_x3_s1      ,
+                event.eContLayerMean_x4_s1      ,
+                event.eContLayerMean_x5_s1      ,
+                event.eContXStd_x1_s1           ,
+                event.eContXStd_x2_s1           ,
+                event.eContXStd_x3_s1           ,
+                event.eContXStd_x4_s1           ,
+                event.eContXStd_x5_s1           ,
+                event.eContYStd_x1_s1           ,
+                event.eContYStd_x2_s1           ,
+                event.eContYStd_x3_s1           ,
+                event.eContYStd_x4_s1           ,
+                event.eContYStd_x5_s1           ,
+                event.eContLayerStd_x1_s1       ,
+                event.eContLayerStd_x2_s1       ,
+                event.eContLayerStd_x3_s1       ,
+                event.eContLayerStd_x4_s1       ,
+                event.eContLayerStd_x5_s1       ,
+                event.eContEnergy_x1_s2         ,
+                event.eContEnergy_x2_s2         ,
+                event.eContEnergy_x3_s2         ,
+                event.eContEnergy_x4_s2         ,
+                event.eContEnergy_x5_s2         ,
+                event.eContNHits_x1_s2          ,
+                event.eContNHits_x2_s2          ,
+                event.eContNHits_x3_s2          ,
+                event.eContNHits_x4_s2          ,
+                event.eContNHits_x5_s2          ,
+                event.eContXMean_x1_s2          ,
+                event.eContXMean_x2_s2          ,
+                event.eContXMean_x3_s2          ,
+                event.eContXMean_x4_s2          ,
+                event.eContXMean_x5_s2          ,
+                event.eContYMean_x1_s2          ,
+                event.eContYMean_x2_s2          ,
+                event.eContYMean_x3_s2          ,
+                event.eContYMean_x4_s2          ,
+                event.eContYMean_x5_s2          ,
+                event.eContLayerMean_x1_s2      ,
+                event.eContLayerMean_x2_s2      ,
+                event.eContLayerMean_x3_s2      ,
+                event.eContLayerMean_x4_s2      ,
+                event.eContLayerMean_x5_s2      ,
+                event.eContXStd_x1_s2           ,
+                event.eContXStd_x2_s2           ,
+                event.eContXStd_x3_s2           ,
+                event.eContXStd_x4_s2           ,
+                event.eContXStd_x5_s2           ,
+                event.eContYStd_x1_s2           ,
+                event.eContYStd_x2_s2           ,
+                event.eContYStd_x3_s2           ,
+                event.eContYStd_x4_s2           ,
+                event.eContYStd_x5_s2           ,
+                event.eContLayerStd_x1_s2       ,
+                event.eContLayerStd_x2_s2       ,
+                event.eContLayerStd_x3_s2       ,
+                event.eContLayerStd_x4_s2       ,
+                event.eContLayerStd_x5_s2       ,
+                event.eContEnergy_x1_s3         ,
+                event.eContEnergy_x2_s3         ,
+                event.eContEnergy_x3_s3         ,
+                event.eContEnergy_x4_s3         ,
+                event.eContEnergy_x5_s3         ,
+                event.eContNHits_x1_s3          ,
+                event.eContNHits_x2_s3          ,
+                event.eContNHits_x3_s3          ,
+                event.eContNHits_x4_s3          ,
+                event.eContNHits_x5_s3          ,
+                event.eContXMean_x1_s3          ,
+                event.eContXMean_x2_s3          ,
+                event.eContXMean_x3_s3          ,
+                event.eContXMean_x4_s3          ,
+                event.eContXMean_x5_s3          ,
+                event.eContYMean_x1_s3          ,
+                event.eContYMean_x2_s3          ,
+                event.eContYMean_x3_s3          ,
+                event.eContYMean_x4_s3          ,
+                event.eContYMean_x5_s3          ,
+                event.eContLayerMean_x1_s3      ,
+                event.eContLayerMean_x2_s3      ,
+                event.eContLayerMean_x3_s3      ,
+                event.eContLayerMean_x4_s3      ,
+                event.eContLayerMean_x5_s3      ,
+                event.eContXStd_x1_s3           ,
+                event.eContXStd_x2_s3           ,
+                event.eContXStd_x3_s3           ,
+                event.eContXStd_x4_s3           ,
+                event.eContXStd_x5_s3           ,
+                event.eContYStd_x1_s3           ,
+                event.eContYStd_x2_s3           ,
+                event.eContYStd_x3_s3           ,
+                event.eContYStd_x4_s3           ,
+                event.eContYStd_x5_s3           ,
+                event.eContLayerStd_x1_s3       ,
+                event.eContLayerStd_x2_s3       ,
+                event.eContLayerStd_x3_s3       ,
+                event.eContLayerStd_x4_s3       ,
+                event.eContLayerStd_x5_s3       ,
+                # Photon RoC variables
+                event.gContEnergy_x1_s1         ,
+                event.gContEnergy_x2_s1         ,
+                event.gContEnergy_x3_s1         ,
+                event.gContEnergy_x4_s1         ,
+                event.gContEnergy_x5_s1         ,
+                event.gContNHits_x1_s1          ,
+                event.gContNHits_x2_s1          ,
+                event.gContNHits_x3_s1          ,
+                event.gContNHits_x4_s1          ,
+                event.gContNHits_x5_s1          ,
+                event.gContXMean_x1_s1          ,
+                event.gContXMean_x2_s1          ,
+                event.gContXMean_x3_s1          ,
+                event.gContXMean_x4_s1          ,
+                event.gContXMean_x5_s1          ,
+                event.gContYMean_x1_s1          ,
+                event.gContYMean_x2_s1          ,
+                event.gContYMean_x3_s1          ,
+                event.gContYMean_x4_s1          ,
+                event.gContYMean_x5_s1          ,
+                event.gContLayerMean_x1_s1      ,
+                event.gContLayerMean_x2_s1      ,
+                event.gContLayerMean_x3_s1      ,
+                event.gContLayerMean_x4_s1      ,
+                event.gContLayerMean_x5_s1      ,
+                event.gContXStd_x1_s1           ,
+                event.gContXStd_x2_s1           ,
+                event.gContXStd_x3_s1           ,
+                event.gContXStd_x4_s1           ,
+                event.gContXStd_x5_s1           ,
+                event.gContYStd_x1_s1           ,
+                event.gContYStd_x2_s1           ,
+                event.gContYStd_x3_s1           ,
+                event.gContYStd_x4_s1           ,
+                event.gContYStd_x5_s1           ,
+                event.gContLayerStd_x1_s1       ,
+                event.gContLayerStd_x2_s1       ,
+                event.gContLayerStd_x3_s1       ,
+                event.gContLayerStd_x4_s1       ,
+                event.gContLayerStd_x5_s1       ,
+                event.gContEnergy_x1_s2         ,
+                event.gContEnergy_x2_s2         ,
+                event.gContEnergy_x3_s2         ,
+                event.gContEnergy_x4_s2         ,
+                event.gContEnergy_x5_s2         ,
+                event.gContNHits_x1_s2          ,
+                event.gContNHits_x2_s2          ,
+                event.gContNHits_x3_s2          ,
+                event.gContNHits_x4_s2          ,
+                event.gContNHits_x5_s2          ,
+                event.gContXMean_x1_s2          ,
+                event.gContXMean_x2_s2          ,
+                event.gContXMean_x3_s2          ,
+                event.gContXMean_x4_s2          ,
+                event.gContXMean_x5_s2          ,
+                event.gContYMean_x1_s2          ,
+                event.gContYMean_x2_s2          ,
+                event.gContYMean_x3_s2          ,
+                event.gContYMean_x4_s2          ,
+                event.gContYMean_x5_s2          ,
+                event.gContLayerMean_x1_s2      ,
+                event.gContLayerMean_x2_s2      ,
+                event.gContLayerMean_x3_s2      ,
+                event.gContLayerMean_x4_s2      ,
+                event.gContLayerMean_x5_s2      ,
+                event.gContXStd_x1_s2           ,
+                event.gContXStd_x2_s2           ,
+                event.gContXStd_x3_s2           ,
+                event.gContXStd_x4_s2           ,
+                event.gContXStd_x5_s2           ,
+                event.gContYStd_x1_s2           ,
+                event.gContYStd_x2_s2           ,
+                event.gContYStd_x3_s2           ,
+                event.gContYStd_x4_s2           ,
+                event.gContYStd_x5_s2           ,
+                event.gContLayerStd_x1_s2       ,
+                event.gContLayerStd_x2_s2       ,
+                event.gContLayerStd_x3_s2       ,
+                event.gContLayerStd_x4_s2       ,
+                event.gContLayerStd_x5_s2       ,
+                event.gContEnergy_x1_s3         ,
+                event.gContEnergy_x2_s3         ,
+                event.gContEnergy_x3_s3         ,
+                event.gContEnergy_x4_s3         ,
+                event.gContEnergy_x5_s3         ,
+                event.gContNHits_x1_s3          ,
+                event.gContNHits_x2_s3          ,
+                event.gContNHits_x3_s3          ,
+                event.gContNHits_x4_s3          ,
+                event.gContNHits_x5_s3          ,
+                event.gContXMean_x1_s3          ,
+                event.gContXMean_x2_s3          ,
+                event.gContXMean_x3_s3          ,
+                event.gContXMean_x4_s3          ,
+                event.gContXMean_x5_s3          ,
+                event.gContYMean_x1_s3          ,
+                event.gContYMean_x2_s3          ,
+                event.gContYMean_x3_s3          ,
+                event.gContYMean_x4_s3          ,
+                event.gContYMean_x5_s3          ,
+                event.gContLayerMean_x1_s3      ,
+                event.gContLayerMean_x2_s3      ,
+                event.gContLayerMean_x3_s3      ,
+                event.gContLayerMean_x4_s3      ,
+                event.gContLayerMean_x5_s3      ,
+                event.gContXStd_x1_s3           ,
+                event.gContXStd_x2_s3           ,
+                event.gContXStd_x3_s3           ,
+                event.gContXStd_x4_s3           ,
+                event.gContXStd_x5_s3           ,
+                event.gContYStd_x1_s3           ,
+                event.gContYStd_x2_s3           ,
+                event.gContYStd_x3_s3           ,
+                event.gContYStd_x4_s3           ,
+                event.gContYStd_x5_s3           ,
+                event.gContLayerStd_x1_s3       ,
+                event.gContLayerStd_x2_s3       ,
+                event.gContLayerStd_x3_s3       ,
+                event.gContLayerStd_x4_s3       ,
+                event.gContLayerStd_x5_s3       ,
+                # Outside RoC variables
+                event.oContEnergy_x1_s1         ,
+                event.oContEnergy_x2_s1         ,
+                event.oContEnergy_x3_s1         ,
+                event.oContEnergy_x4_s1         ,
+                event.oContEnergy_x5_s1         ,
+                event.oContNHits_x1_s1          ,
+                event.oContNHits_x2_s1          ,
+                event.oContNHits_x3_s1          ,
+                event.oContNHits_x4_s1          ,
+                event.oContNHits_x5_s1          ,
+                event.oContXMean_x1_s1          ,
+                event.oContXMean_x2_s1          ,
+                event.oContXMean_x3_s1          ,
+                event.oContXMean_x4_s1          ,
+                event.oContXMean_x5_s1          ,
+                event.oContYMean_x1_s1          ,
+                event.oContYMean_x2_s1          ,
+                event.oContYMean_x3_s1          ,
+                event.oContYMean_x4_s1          ,
+                event.oContYMean_x5_s1          ,
+                event.oContLayerMean_x1_s1      ,
+                event.oContLayerMean_x2_s1      ,
+                event.oContLayerMean_x3_s1      ,
+                event.oContLayerMean_x4_s1      ,
+                event.oContLayerMean_x5_s1      ,
+                event.oContXStd_x1_s1           ,
+                event.oContXStd_x2_s1           ,
+                event.oContXStd_x3_s1           ,
+                event.oContXStd_x4_s1           ,
+                event.oContXStd_x5_s1           ,
+                event.oContYStd_x1_s1           ,
+                event.oContYStd_x2_s1           ,
+                event.oContYStd_x3_s1           ,
+                event.oContYStd_x4_s1           ,
+                event.oContYStd_x5_s1           ,
+                event.oContLayerStd_x1_s1       ,
+                event.oContLayerStd_x2_s1       ,
+                event.oContLayerStd_x3_s1       ,
+                event.oContLayerStd_x4_s1       ,
+                event.oContLayerStd_x5_s1       ,
+                event.oContEnergy_x1_s2         ,
+                event.oContEnergy_x2_s2         ,
+                event.oContEnergy_x3_s2         ,
+                event.oContEnergy_x4_s2         ,
+                event.oContEnergy_x5_s2         ,
+                event.oContNHits_x1_s2          ,
+                event.oContNHits_x2_s2          ,
+                event.oContNHits_x3_s2          ,
+                event.oContNHits_x4_s2          ,
+                event.oContNHits_x5_s2          ,
+                event.oContXMean_x1_s2          ,
+                event.oContXMean_x2_s2          ,
+                event.oContXMean_x3_s2          ,
+                event.oContXMean_x4_s2          ,
+                event.oContXMean_x5_s2          ,
+                event.oContYMean_x1_s2          ,
+                event.oContYMean_x2_s2          ,
+                event.oContYMean_x3_s2          ,
+                event.oContYMean_x4_s2          ,
+                event.oContYMean_x5_s2          ,
+                event.oContLayerMean_x1_s2      ,
+                event.oContLayerMean_x2_s2      ,
+                event.oContLayerMean_x3_s2      ,
+                event.oContLayerMean_x4_s2      ,
+                event.oContLayerMean_x5_s2      ,
+                event.oContXStd_x1_s2           ,
+                event.oContXStd_x2_s2           ,
+                event.oContXStd_x3_s2           ,
+                event.oContXStd_x4_s2           ,
+                event.oContXStd_x5_s2           ,
+                event.oContYStd_x1_s2           ,
+                event.oContYStd_x2_s2           ,
+                event.oContYStd_x3_s2           ,
+                event.oContYStd_x4_s2           ,
+                event.oContYStd_x5_s2           ,
+                event.oContLayerStd_x1_s2       ,
+                event.oContLayerStd_x2_s2       ,
+                event.oContLayerStd_x3_s2       ,
+                event.oContLayerStd_x4_s2       ,
+                event.oContLayerStd_x5_s2       ,
+                event.oContEnergy_x1_s3         ,
+                event.oContEnergy_x2_s3         ,
+                event.oContEnergy_x3_s3         ,
+                event.oContEnergy_x4_s3         ,
+                event.oContEnergy_x5_s3         ,
+                event.oContNHits_x1_s3          ,
+                event.oContNHits_x2_s3          ,
+                event.oContNHits_x3_s3          ,
+                event.oContNHits_x4_s3          ,
+                event.oContNHits_x5_s3          ,
+                event.oContXMean_x1_s3          ,
+                event.oContXMean_x2_s3          ,
+                event.oContXMean_x3_s3          ,
+                event.oContXMean_x4_s3          ,
+                event.oContXMean_x5_s3          ,
+                event.oContYMean_x1_s3          ,
+                event.oContYMean_x2_s3          ,
+                event.oContYMean_x3_s3          ,
+                event.oContYMean_x4_s3          ,
+                event.oContYMean_x5_s3          ,
+                event.oContLayerMean_x1_s3      ,
+                event.oContLayerMean_x2_s3      ,
+                event.oContLayerMean_x3_s3      ,
+                event.oContLayerMean_x4_s3      ,
+                event.oContLayerMean_x5_s3      ,
+                event.oContXStd_x1_s3           ,
+                event.oContXStd_x2_s3           ,
+                event.oContXStd_x3_s3           ,
+                event.oContXStd_x4_s3           ,
+                event.oContXStd_x5_s3           ,
+                event.oContYStd_x1_s3           ,
+                event.oContYStd_x2_s3           ,
+                event.oContYStd_x3_s3           ,
+                event.oContYStd_x4_s3           ,
+                event.oContYStd_x5_s3           ,
+                event.oContLayerStd_x1_s3       ,
+                event.oContLayerStd_x2_s3       ,
+                event.oContLayerStd_x3_s3       ,
+                event.oContLayerStd_x4_s3       ,
+                event.oContLayerStd_x5_s3
+        ]
+
+        return evt
+
+    def sampledEntries(self):
+
+        # maxEvts entries drawn uniformly at random (without replacement) from all files of the
+        # chain, in increasing order:  how many come from each file is drawn first, from the
+        # files' entry counts, then which entries they are within each file
+
+        counts = []
+        for element in self.tree.GetListOfFiles():
+            rfile = r.TFile.Open(element.GetTitle())
+            counts.append(int(rfile.Get(self.tree.GetName()).GetEntries()))
+            rfile.Close()
+        counts = np.array(counts, dtype=np.int64)
+        if counts.sum() == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        rng = np.random.default_rng([self.seed, int(self.isSig)])
+        perFile = rng.multivariate_hypergeometric(counts, min(self.maxEvts, counts.sum()))
+        offsets = np.cumsum(counts) - counts
+        entries = [offset + np.sort(rng.choice(count, n, replace=False))
+                   for offset, count, n in zip(offsets, counts, perFile)]
+        print( 'Sampling {} of {} events in {} files'.format(perFile.sum(), counts.sum(), len(counts)) )
+
+        return np.concatenate(entries)
+
+    def selectedEvents(self):
+
+        # The events to use:  the first maxEvts, or with sample a uniform random maxEvts of
+        # them (reading only those entries, in file order)
+
+        if self.sample:
+            for entry in self.sampledEntries():
+                self.tree.GetEntry(int(entry))
+                yield self.tree
+            return
+
+        nEvents = 0
+        for event in self.tree:
+            if nEvents >= self.maxEvts:
+                break
+            yield event
+            nEvents += 1
 
     def root2PyEvents(self):
         self.events =  []
-        for event in self.tree:
-            if len(self.events) >= self.maxEvts:
-                continue
-
-            evt = [
-                    # Base variables
-                    event.nReadoutHits              ,
-                    event.summedDet                 ,
-                    event.summedTightIso            ,
-                    event.maxCellDep                ,
-                    event.showerRMS                 ,
-                    event.xStd                      ,
-                    event.yStd                      ,
-                    event.avgLayerHit               ,
-                    event.stdLayerHit               ,
-                    event.deepestLayerHit           ,
-                    event.ecalBackEnergy            ,
-                    # MIP Tracking variables
-                    event.straight4                 ,
-                    event.firstNearPhLayer          ,
-                    event.nNearPhHits               ,
-                    event.fullElectronTerritoryHits ,
-                    event.fullPhotonTerritoryHits   ,
-                    event.fullTerritoryRatio        ,
-                    event.electronTerritoryHits     ,
-                    event.photonTerritoryHits       ,
-                    event.TerritoryRatio            ,
-                    event.epSep                     ,
-                    event.epDot                     ,
-                    # Longitudinal segment variables
-                    event.energy_s1                 ,
-                    event.nHits_s1                  ,
-                    event.xMean_s1                  ,
-                    event.yMean_s1                  ,
-                    event.layerMean_s1              ,
-                    event.xStd_s1                   ,
-                    event.yStd_s1                   ,
-                    event.layerStd_s1               ,
-                    event.energy_s2                 ,
-                    event.nHits_s2                  ,
-                    event.xMean_s2                  ,
-                    event.yMean_s2                  ,
-                    event.layerMean_s2              ,
-                    event.xStd_s2                   ,
-                    event.yStd_s2                   ,
-                    event.layerStd_s2               ,
-                    event.energy_s3                 ,
-                    event.nHits_s3                  ,
-                    event.xMean_s3                  ,
-                    event.yMean_s3                  ,
-                    event.layerMean_s3              ,
-                    event.xStd_s3                   ,
-                    event.yStd_s3                   ,
-                    event.layerStd_s3               ,
-                    # Electron RoC variables
-                    event.eContEnergy_x1_s1         ,
-                    event.eContEnergy_x2_s1         ,
-                    event.eContEnergy_x3_s1         ,
-                    event.eContEnergy_x4_s1         ,
-                    event.eContEnergy_x5_s1         ,
-                    event.eContNHits_x1_s1          ,
-                    event.eContNHits_x2_s1          ,
-                    event.eContNHits_x3_s1          ,
-                    event.eContNHits_x4_s1          ,
-                    event.eContNHits_x5_s1          ,
-                    event.eContXMean_x1_s1          ,
-                    event.eContXMean_x2_s1          ,
-                    event.eContXMean_x3_s1          ,
-                    event.eContXMean_x4_s1          ,
-                    event.eContXMean_x5_s1          ,
-                    event.eContYMean_x1_s1          ,
-                    event.eContYMean_x2_s1          ,
-                    event.eContYMean_x3_s1          ,
-                    event.eContYMean_x4_s1          ,
-                    event.eContYMean_x5_s1          ,
-                    event.eContLayerMean_x1_s1      ,
-                    event.eContLayerMean_x2_s1      ,
-                    event.eContLayerMean_x3_s1      ,
-                    event.eContLayerMean_x4_s1      ,
-                    event.eContLayerMean_x5_s1      ,
-                    event.eContXStd_x1_s1           ,
-                    event.eContXStd_x2_s1           ,
-                    event.eContXStd_x3_s1           ,
-                    event.eContXStd_x4_s1           ,
-                    event.eContXStd_x5_s1           ,
-                    event.eContYStd_x1_s1           ,
-                    event.eContYStd_x2_s1           ,
-                    event.eContYStd_x3_s1           ,
-                    event.eContYStd_x4_s1           ,
-                    event.eContYStd_x5_s1           ,
-                    event.eContLayerStd_x1_s1       ,
-                    event.eContLayerStd_x2_s1       ,
-                    event.eContLayerStd_x3_s1       ,
-                    event.eContLayerStd_x4_s1       ,
-                    event.eContLayerStd_x5_s1       ,
-                    event.eContEnergy_x1_s2         ,
-                    event.eContEnergy_x2_s2         ,
-                    event.eContEnergy_x3_s2         ,
-                    event.eContEnergy_x4_s2         ,
-                    event.eContEnergy_x5_s2         ,
-                    event.eContNHits_x1_s2          ,
-                    event.eContNHits_x2_s2          ,
-                    event.eContNHits_x3_s2          ,
-                    event.eContNHits_x4_s2          ,
-                    event.eContNHits_x5_s2          ,
-                    event.eContXMean_x1_s2          ,
-                    event.eContXMean_x2_s2          ,
-                    event.eContXMean_x3_s2          ,
-                    event.eContXMean_x4_s2          ,
-                    event.eContXMean_x5_s2          ,
-                    event.eContYMean_x1_s2          ,
-                    event.eContYMean_x2_s2          ,
-                    event.eContYMean_x3_s2          ,
-                    event.eContYMean_x4_s2          ,
-                    event.eContYMean_x5_s2          ,
-                    event.eContLayerMean_x1_s2      ,
-                    event.eContLayerMean_x2_s2      ,
-                    event.eContLayerMean_x3_s2      ,
-                    event.eContLayerMean_x4_s2      ,
-                    event.eContLayerMean_x5_s2      ,
-                    event.eContXStd_x1_s2           ,
-                    event.eContXStd_x2_s2           ,
-                    event.eContXStd_x3_s2           ,
-                    event.eContXStd_x4_s2           ,
-                    event.eContXStd_x5_s2           ,
-                    event.eContYStd_x1_s2           ,
-                    event.eContYStd_x2_s2           ,
-                    event.eContYStd_x3_s2           ,
-                    event.eContYStd_x4_s2           ,
-                    event.eContYStd_x5_s2           ,
-                    event.eContLayerStd_x1_s2       ,
-                    event.eContLayerStd_x2_s2       ,
-                    event.eContLayerStd_x3_s2       ,
-                    event.eContLayerStd_x4_s2       ,
-                    event.eContLayerStd_x5_s2       ,
-                    event.eContEnergy_x1_s3         ,
-                    event.eContEnergy_x2_s3         ,
-                    event.eContEnergy_x3_s3         ,
-                    event.eContEnergy_x4_s3         ,
-                    event.eContEnergy_x5_s3         ,
-                    event.eContNHits_x1_s3          ,
-                    event.eContNHits_x2_s3          ,
-                    event.eContNHits_x3_s3          ,
-                    event.eContNHits_x4_s3          ,
-                    event.eContNHits_x5_s3          ,
-                    event.eContXMean_x1_s3          ,
-                    event.eContXMean_x2_s3          ,
-                    event.eContXMean_x3_s3          ,
-                    event.eContXMean_x4_s3          ,
-                    event.eContXMean_x5_s3          ,
-                    event.eContYMean_x1_s3          ,
-                    event.eContYMean_x2_s3          ,
-                    event.eContYMean_x3_s3          ,
-                    event.eContYMean_x4_s3          ,
-                    event.eContYMean_x5_s3          ,
-                    event.eContLayerMean_x1_s3      ,
-                    event.eContLayerMean_x2_s3      ,
-                    event.eContLayerMean_x3_s3      ,
-                    event.eContLayerMean_x4_s3      ,
-                    event.eContLayerMean_x5_s3      ,
-                    event.eContXStd_x1_s3           ,
-                    event.eContXStd_x2_s3           ,
-                    event.eContXStd_x3_s3           ,
-                    event.eContXStd_x4_s3           ,
-                    event.eContXStd_x5_s3           ,
-                    event.eContYStd_x1_s3           ,
-                    event.eContYStd_x2_s3           ,
-                    event.eContYStd_x3_s3           ,
-                    event.eContYStd_x4_s3           ,
-                    event.eContYStd_x5_s3           ,
-                    event.eContLayerStd_x1_s3       ,
-                    event.eContLayerStd_x2_s3       ,
-                    event.eContLayerStd_x3_s3       ,
-                    event.eContLayerStd_x4_s3       ,
-                    event.eContLayerStd_x5_s3       ,
-                    # Photon RoC variables
-                    event.gContEnergy_x1_s1         ,
-                    event.gContEnergy_x2_s1         ,
-                    event.gContEnergy_x3_s1         ,
-                    event.gContEnergy_x4_s1         ,
-                    event.gContEnergy_x5_s1         ,
-                    event.gContNHits_x1_s1          ,
-                    event.gContNHits_x2_s1          ,
-                    event.gContNHits_x3_s1          ,
-                    event.gContNHits_x4_s1          ,
-                    event.gContNHits_x5_s1          ,
-                    event.gContXMean_x1_s1          ,
-                    event.gContXMean_x2_s1          ,
-                    event.gContXMean_x3_s1          ,
-                    event.gContXMean_x4_s1          ,
-                    event.gContXMean_x5_s1          ,
-                    event.gContYMean_x1_s1          ,
-                    event.gContYMean_x2_s1          ,
-                    event.gContYMean_x3_s1          ,
-                    event.gContYMean_x4_s1          ,
-                    event.gContYMean_x5_s1          ,
-                    event.gContLayerMean_x1_s1      ,
-                    event.gContLayerMean_x2_s1      ,
-                    event.gContLayerMean_x3_s1      ,
-                    event.gContLayerMean_x4_s1      ,
-                    event.gContLayerMean_x5_s1      ,
-                    event.gContXStd_x1_s1           ,
-                    event.gContXStd_x2_s1           ,
-                    event.gContXStd_x3_s1           ,
-                    event.gContXStd_x4_s1           ,
-                    event.gContXStd_x5_s1           ,
-                    event.gContYStd_x1_s1           ,
-                    event.gContYStd_x2_s1           ,
-                    event.gContYStd_x3_s1           ,
-                    event.gContYStd_x4_s1           ,
-                    event.gContYStd_x5_s1           ,
-                    event.gContLayerStd_x1_s1       ,
-                    event.gContLayerStd_x2_s1       ,
-                    event.gContLayerStd_x3_s1       ,
-                    event.gContLayerStd_x4_s1       ,
-                    event.gContLayerStd_x5_s1       ,
-                    event.gContEnergy_x1_s2         ,
-                    event.gContEnergy_x2_s2         ,
-                    event.gContEnergy_x3_s2         ,
-                    event.gContEnergy_x4_s2         ,
-                    event.gContEnergy_x5_s2         ,
-                    event.gContNHits_x1_s2          ,
-                    event.gContNHits_x2_s2          ,
-                    event.gContNHits_x3_s2          ,
-                    event.gContNHits_x4_s2          ,
-                    event.gContNHits_x5_s2          ,
-                    event.gContXMean_x1_s2          ,
-                    event.gContXMean_x2_s2          ,
-                    event.gContXMean_x3_s2          ,
-                    event.gContXMean_x4_s2          ,
-                    event.gContXMean_x5_s2          ,
-                    event.gContYMean_x1_s2          ,
-                    event.gContYMean_x2_s2          ,
-                    event.gContYMean_x3_s2          ,
-                    event.gContYMean_x4_s2          ,
-                    event.gContYMean_x5_s2          ,
-                    event.gContLayerMean_x1_s2      ,
-                    event.gContLayerMean_x2_s2      ,
-                    event.gContLayerMean_x3_s2      ,
-                    event.gContLayerMean_x4_s2      ,
-                    event.gContLayerMean_x5_s2      ,
-                    event.gContXStd_x1_s2           ,
-                    event.gContXStd_x2_s2           ,
-                    event.gContXStd_x3_s2           ,
-                    event.gContXStd_x4_s2           ,
-                    event.gContXStd_x5_s2           ,
-                    event.gContYStd_x1_s2           ,
-                    event.gContYStd_x2_s2           ,
-                    event.gContYStd_x3_s2           ,
-                    event.gContYStd_x4_s2           ,
-                    event.gContYStd_x5_s2           ,
-                    event.gContLayerStd_x1_s2       ,
-                    event.gContLayerStd_x2_s2       ,
-                    event.gContLayerStd_x3_s2       ,
-                    event.gContLayerStd_x4_s2       ,
-                    event.gContLayerStd_x5_s2       ,
-                    event.gContEnergy_x1_s3         ,
-                    event.gContEnergy_x2_s3         ,
-                    event.gContEnergy_x3_s3         ,
-                    event.gContEnergy_x4_s3         ,
-                    event.gContEnergy_x5_s3         ,
-                    event.gContNHits_x1_s3          ,
-                    event.gContNHits_x2_s3          ,
-                    event.gContNHits_x3_s3          ,
-                    event.gContNHits_x4_s3          ,
-                    event.gContNHits_x5_s3          ,
-                    event.gContXMean_x1_s3          ,
-                    event.gContXMean_x2_s3          ,
-                    event.gContXMean_x3_s3          ,
-                    event.gContXMean_x4_s3          ,
-                    event.gContXMean_x5_s3          ,
-                    event.gContYMean_x1_s3          ,
-                    event.gContYMean_x2_s3          ,
-                    event.gContYMean_x3_s3          ,
-                    event.gContYMean_x4_s3          ,
-                    event.gContYMean_x5_s3          ,
-                    event.gContLayerMean_x1_s3      ,
-                    event.gContLayerMean_x2_s3      ,
-                    event.gContLayerMean_x3_s3      ,
-                    event.gContLayerMean_x4_s3      ,
-                    event.gContLayerMean_x5_s3      ,
-                    event.gContXStd_x1_s3           ,
-                    event.gContXStd_x2_s3           ,
-                    event.gContXStd_x3_s3           ,
-                    event.gContXStd_x4_s3           ,
-                    event.gContXStd_x5_s3           ,
-                    event.gContYStd_x1_s3           ,
-                    event.gContYStd_x2_s3           ,
-                    event.gContYStd_x3_s3           ,
-                    event.gContYStd_x4_s3           ,
-                    event.gContYStd_x5_s3           ,
-                    event.gContLayerStd_x1_s3       ,
-                    event.gContLayerStd_x2_s3       ,
-                    event.gContLayerStd_x3_s3       ,
-                    event.gContLayerStd_x4_s3       ,
-                    event.gContLayerStd_x5_s3       ,
-                    # Outside RoC variables
-                    event.oContEnergy_x1_s1         ,
-                    event.oContEnergy_x2_s1         ,
-                    event.oContEnergy_x3_s1         ,
-                    event.oContEnergy_x4_s1         ,
-                    event.oContEnergy_x5_s1         ,
-                    event.oContNHits_x1_s1          ,
-                    event.oContNHits_x2_s1          ,
-                    event.oContNHits_x3_s1          ,
-                    event.oContNHits_x4_s1          ,
-                    event.oContNHits_x5_s1          ,
-                    event.oContXMean_x1_s1          ,
-                    event.oContXMean_x2_s1          ,
-                    event.oContXMean_x3_s1          ,
-                    event.oContXMean_x4_s1          ,
-                    event.oContXMean_x5_s1          ,
-                    event.oContYMean_x1_s1          ,
-                    event.oContYMean_x2_s1          ,
-                    event.oContYMean_x3_s1          ,
-                    event.oContYMean_x4_s1          ,
-                    event.oContYMean_x5_s1          ,
-                    event.oContLayerMean_x1_s1      ,
-                    event.oContLayerMean_x2_s1      ,
-                    event.oContLayerMean_x3_s1      ,
-                    event.oContLayerMean_x4_s1      ,
-                    event.oContLayerMean_x5_s1      ,
-                    event.oContXStd_x1_s1           ,
-                    event.oContXStd_x2_s1           ,
-                    event.oContXStd_x3_s1           ,
-                    event.oContXStd_x4_s1           ,
-                    event.oContXStd_x5_s1           ,
-                    event.oContYStd_x1_s1           ,
-                    event.oContYStd_x2_s1           ,
-                    event.oContYStd_x3_s1           ,
-                    event.oContYStd_x4_s1           ,
-                    event.oContYStd_x5_s1           ,
-                    event.oContLayerStd_x1_s1       ,
-                    event.oContLayerStd_x2_s1       ,
-                    event.oContLayerStd_x3_s1       ,
-                    event.oContLayerStd_x4_s1       ,
-                    event.oContLayerStd_x5_s1       ,
-                    event.oContEnergy_x1_s2         ,
-                    event.oContEnergy_x2_s2         ,
-                    event.oContEnergy_x3_s2         ,
-                    event.oContEnergy_x4_s2         ,
-                    event.oContEnergy_x5_s2         ,
-                    event.oContNHits_x1_s2          ,
-                    event.oContNHits_x2_s2          ,
-                    event.oContNHits_x3_s2          ,
-                    event.oContNHits_x4_s2          ,
-                    event.oContNHits_x5_s2          ,
-                    event.oContXMean_x1_s2          ,
-                    event.oContXMean_x2_s2          ,
-                    event.oContXMean_x3_s2          ,
-                    event.oContXMean_x4_s2          ,
-                    event.oContXMean_x5_s2          ,
-                    event.oContYMean_x1_s2          ,
-                    event.oContYMean_x2_s2          ,
-                    event.oContYMean_x3_s2          ,
-                    event.oContYMean_x4_s2          ,
-                    event.oContYMean_x5_s2          ,
-                    event.oContLayerMean_x1_s2      ,
-                    event.oContLayerMean_x2_s2      ,
-                    event.oContLayerMean_x3_s2      ,
-                    event.oContLayerMean_x4_s2      ,
-                    event.oContLayerMean_x5_s2      ,
-                    event.oContXStd_x1_s2           ,
-                    event.oContXStd_x2_s2           ,
-                    event.oContXStd_x3_s2           ,
-                    event.oContXStd_x4_s2           ,
-                    event.oContXStd_x5_s2           ,
-                    event.oContYStd_x1_s2           ,
-                    event.oContYStd_x2_s2           ,
-                    event.oContYStd_x3_s2           ,
-                    event.oContYStd_x4_s2           ,
-                    event.oContYStd_x5_s2           ,
-                    event.oContLayerStd_x1_s2       ,
-                    event.oContLayerStd_x2_s2       ,
-                    event.oContLayerStd_x3_s2       ,
-                    event.oContLayerStd_x4_s2       ,
-                    event.oContLayerStd_x5_s2       ,
-                    event.oContEnergy_x1_s3         ,
-                    event.oContEnergy_x2_s3         ,
-                    event.oContEnergy_x3_s3         ,
-                    event.oContEnergy_x4_s3         ,
-                    event.oContEnergy_x5_s3         ,
-                    event.oContNHits_x1_s3          ,
-                    event.oContNHits_x2_s3          ,
-                    event.oContNHits_x3_s3          ,
-                    event.oContNHits_x4_s3          ,
-                    event.oContNHits_x5_s3          ,
-                    event.oContXMean_x1_s3          ,
-                    event.oContXMean_x2_s3          ,
-                    event.oContXMean_x3_s3          ,
-                    event.oContXMean_x4_s3          ,
-                    event.oContXMean_x5_s3          ,
-                    event.oContYMean_x1_s3          ,
-                    event.oContYMean_x2_s3          ,
-                    event.oContYMean_x3_s3          ,
-                    event.oContYMean_x4_s3          ,
-                    event.oContYMean_x5_s3          ,
-                    event.oContLayerMean_x1_s3      ,
-                    event.oContLayerMean_x2_s3      ,
-                    event.oContLayerMean_x3_s3      ,
-                    event.oContLayerMean_x4_s3      ,
-                    event.oContLayerMean_x5_s3      ,
-                    event.oContXStd_x1_s3           ,
-                    event.oContXStd_x2_s3           ,
-                    event.oContXStd_x3_s3           ,
-                    event.oContXStd_x4_s3           ,
-                    event.oContXStd_x5_s3           ,
-                    event.oContYStd_x1_s3           ,
-                    event.oContYStd_x2_s3           ,
-                    event.oContYStd_x3_s3           ,
-                    event.oContYStd_x4_s3           ,
-                    event.oContYStd_x5_s3           ,
-                    event.oContLayerStd_x1_s3       ,
-                    event.oContLayerStd_x2_s3       ,
-                    event.oContLayerStd_x3_s3       ,
-                    event.oContLayerStd_x4_s3       ,
-                    event.oContLayerStd_x5_s3
-            ]
+        for event in self.selectedEvents():
+
+            evt = self.eventFeatures(event)
 
             self.events.append(evt)
 
@@ -460,8 +513,27 @@ class sampleContainer:
         self.train_y = np.zeros(len(self.train_x)) + (self.isSig == True)
         self.test_y = np.zeros(len(self.test_x)) + (self.isSig == True)
 
+    def eventChunks(self, chunkSize):
+
+        # The same events as root2PyEvents (in file order), chunkSize at a time
+
+        chunk = []
+        for event in self.selectedEvents():
+            chunk.append(self.eventFeatures(event))
+            if len(chunk) == chunkSize:
+                yield np.array(chunk)
+                chunk = []
+        if len(chunk) > 0:
+            yield np.array(chunk)
+
+    def isTrain(self, i, n):
+
+        # Which of the n events of chunk i are for training (trainFrac of them at random),
+        # the same every time the chunks are gone through
+        return np.random.RandomState([self.seed, int(self.isSig), i]).rand(n) < float(self.trainFrac)
+
 class mergedContainer:
-    def __init__(self, sigContainer,bkgContainer):
+    def __init__(self, sigContainer,bkgContainer,dmatrix=True):
         self.train_x = np.vstack((sigContainer.train_x,bkgContainer.train_x))
         self.train_y = np.append(sigContainer.train_y,bkgContainer.train_y)
         
@@ -471,9 +543,101 @@ class mergedContainer:
         self.test_x  = np.vstack((sigContainer.test_x,bkgContainer.test_x))
         self.test_y  = np.append(sigContainer.test_y,bkgContainer.test_y)
         
+        if dmatrix:
+            self.makeDMatrices()
+
+    def makeDMatrices(self):
         self.dtrain = xgb.DMatrix(self.train_x,self.train_y)
         self.dtest  = xgb.DMatrix(self.test_x,self.test_y)
 
+class chunkIter(xgb.DataIter):
+
+    # Hands xgboost the training (part='train') or test events of the containers a chunk at
+    # a time, reading them again from the trees on every pass xgboost makes
+
+    def __init__(self, containers, part, chunkSize, cache_prefix=None):
+        self.containers = containers
+        self.part = part
+        self.chunkSize = chunkSize
+        self.chunks = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def generate(self):
+        for container in self.containers:
+            for i, chunk in enumerate(container.eventChunks(self.chunkSize)):
+                train = container.isTrain(i, len(chunk))
+                if self.part == 'train':
+                    x = chunk[train]
+                    x[np.isnan(x)] = 0.000
+                else:
+                    x = chunk[~train]
+                if len(x) == 0: continue
+                yield x, np.zeros(len(x)) + (container.isSig == True)
+
+    def reset(self):
+        self.chunks = None
+
+    def next(self, input_data):
+        if self.chunks == None:
+            self.chunks = self.generate()
+        try:
+            x, y = next(self.chunks)
+        except StopIteration:
+            return 0
+        input_data(data=x, label=y)
+        return 1
+
+class streamedContainer:
+
+    # dtrain and dtest like mergedContainer, without ever holding all events in memory:
+    # mode 'quantile' keeps only their histogram bin indices (QuantileDMatrix),
+    # mode 'external' writes them in pages to cacheDir (external memory DMatrix)
+
+    def __init__(self, sigContainer, bkgContainer, mode, chunkSize, cacheDir):
+        containers = [sigContainer, bkgContainer]
+        if mode == 'quantile':
+            self.dtrain = xgb.QuantileDMatrix(chunkIter(containers, 'train', chunkSize))
+            self.dtest  = xgb.QuantileDMatrix(chunkIter(containers, 'test', chunkSize), ref=self.dtrain)
+        elif mode == 'external':
+            self.dtrain = xgb.DMatrix(chunkIter(containers, 'train', chunkSize, cacheDir + '/train'))
+            self.dtest  = xgb.DMatrix(chunkIter(containers, 'test', chunkSize, cacheDir + '/test'))
+        else:
+            sys.exit('Unknown --stream mode {}'.format(mode))
+
+def mergedEvents(options, dmatrix=True):
+
+    # Signal and background events, shuffled, split and merged, or the same matrices from
+    # options.cache_dir if they were saved there by an earlier run (see mods/matrixCache.py)
+
+    if options.cache_dir:
+        key = matrixCache.cacheKey(options.sig_file, options.bkg_file, 'EcalVeto',
+                                   matrixCache.featureNames(sampleContainer.eventFeatures),
+                                   options.max_evt, options.train_frac, options.seed, options.sample)
+        eventContainer = matrixCache.load(options.cache_dir, key)
+        if eventContainer != None:
+            if dmatrix:
+                eventContainer.makeDMatrices()
+            return eventContainer
+
+    # Make Signal Container
+    print( 'Loading sig_file = {}'.format(options.sig_file) )
+    sigContainer = sampleContainer(options.sig_file,options.max_evt,options.train_frac,True,options.seed,options.sample)
+    sigContainer.root2PyEvents()
+    sigContainer.constructTrainAndTest()
+
+    # Make Background Container
+    print( 'Loading bkg_file = {}'.format(options.bkg_file) )
+    bkgContainer = sampleContainer(options.bkg_file,options.max_evt,options.train_frac,False,options.seed,options.sample)
+    bkgContainer.root2PyEvents()
+    bkgContainer.constructTrainAndTest()
+
+    # Merge
+    eventContainer = mergedContainer(sigContainer,bkgContainer,dmatrix)
+    if options.cache_dir:
+        matrixCache.save(options.cache_dir, key, eventContainer)
+
+    return eventContainer
+
 if __name__ == "__main__":
     
     # Parse
@@ -481,12 +645,20 @@ if __name__ == "__main__":
     parser.add_option('--seed', dest='seed',type="int",  default=2, help='Numpy random seed.')
     parser.add_option('--max_evt', dest='max_evt',type="int",  default=1500000, help='Max Events to load')
     parser.add_option('--train_frac', dest='train_frac',  default=.8, help='Fraction of events to use for training')
+    parser.add_option('--sample', dest='sample', action='store_true', default=False, help='Take max_evt events'\
+            ' at random from all the input files instead of the first max_evt')
     parser.add_option('--eta', dest='eta',type="float",  default=0.023, help='Learning Rate')
     parser.add_option('--tree_number', dest='tree_number',type="int",  default=1000, help='Tree Number')
     parser.add_option('--depth', dest='depth',type="int",  default=10, help='Max Tree Depth')
     parser.add_option('-b', dest='bkg_file', default='./bdt_0/bkg_train.root', help='name of background file')
     parser.add_option('-s', dest='sig_file', default='./bdt_0/sig_train.root', help='name of signal file')
     parser.add_option('-o', dest='out_name',  default='bdt_test', help='Output Pickle Name')
+    parser.add_option('--stream', dest='stream',  default='', help='Read the events a chunk at a time'\
+            ' instead of all at once: quantile (QuantileDMatrix) or external (DMatrix cached on disk).'\
+            ' Uses the hist tree method and a random train/test split per chunk')
+    parser.add_option('--cache_dir', dest='cache_dir',  default='', help='Directory to save the training/test'\
+            ' matrices in and reuse them from when the inputs, features, max_evt, train_frac and seed are the same')
+    parser.add_option('--chunk_size', dest='chunk_size',type="int",  default=100000, help='Events per chunk with --stream')
     (options, args) = parser.parse_args()
 
     # Seed numpy's randomness
@@ -512,20 +684,23 @@ if __name__ == "__main__":
     print( 'You set max tree depth = {}'.format(options.depth)    )
     print( 'You set eta = {}'.format(options.eta)                 )
 
-    # Make Signal Container
-    print( 'Loading sig_file = {}'.format(options.sig_file) )
-    sigContainer = sampleContainer(options.sig_file,options.max_evt,options.train_frac,True)
-    sigContainer.root2PyEvents()
-    sigContainer.constructTrainAndTest()
+    start = time.time()
 
-    # Make Background Container
-    print( 'Loading bkg_file = {}'.format(options.bkg_file) )
-    bkgContainer = sampleContainer(options.bkg_file,options.max_evt,options.train_frac,False)
-    bkgContainer.root2PyEvents()
-    bkgContainer.constructTrainAndTest()
+    # Stream events into xgboost, or load (or take from --cache_dir) and merge them
+    pages_dir = options.out_name+'_'+str(bdt_num)+'/cache'
+    if options.stream:
+        print( 'Streaming sig_file = {}'.format(options.sig_file) )
+        sigContainer = sampleContainer(options.sig_file,options.max_evt,options.train_frac,True,options.seed,options.sample)
+        print( 'Streaming bkg_file = {}'.format(options.bkg_file) )
+        bkgContainer = sampleContainer(options.bkg_file,options.max_evt,options.train_frac,False,options.seed,options.sample)
+        # xgboost doesn't make the directory its external memory pages go in
+        if not os.path.exists(pages_dir):
+            os.makedirs(pages_dir)
+        eventContainer = streamedContainer(sigContainer,bkgContainer,options.stream,options.chunk_size,pages_dir)
+    else:
+        eventContainer = mergedEvents(options)
 
-    # Merge
-    eventContainer = mergedContainer(sigContainer,bkgContainer)
+    load_time = time.time() - start
 
     params = {
                'objective': 'binary:logistic',
@@ -543,9 +718,21 @@ if __name__ == "__main__":
                # 'early_stopping_rounds' : 10
     }
 
+    if options.stream:
+        params['tree_method'] = 'hist'
+
     # Train the BDT model
+    start = time.time()
     evallist = [(eventContainer.dtrain,'train'), (eventContainer.dtest,'eval')]
     gbm = xgb.train(params, eventContainer.dtrain, num_boost_round = options.tree_number, evals = evallist, early_stopping_rounds = 10)
+    train_time = time.time() - start
+
+    # Time and memory used, to see how they scale with the number of events (see bdtScaling.py)
+    print( 'Loaded {} training and {} test events in {:.1f} s, trained in {:.1f} s, peak memory {:.0f} MB'.format(
+        eventContainer.dtrain.num_row(), eventContainer.dtest.num_row(), load_time, train_time,
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024.) )
+    if os.path.exists(pages_dir):
+        shutil.rmtree(pages_dir)
 
     # Store BDT
     output = open(options.out_name+'_'+str(bdt_num)+'/' + \
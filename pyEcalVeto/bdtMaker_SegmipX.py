@@ -9,6 +9,7 @@ import xgboost as xgb
 import matplotlib as plt
 from array    import array
 from optparse import OptionParser
+from mods import matrixCache
 
 
 mpl_logger = logging.getLogger('matplotlib')
@@ -132,6 +133,8 @@ if __name__ == "__main__":
     parser.add_option('-b', dest='bkg_file', default='./bdt_0/bkg_train.root', help='name of background file')
     parser.add_option('-s', dest='sig_file', default='./bdt_0/sig_train.root', help='name of signal file')
     parser.add_option('-o', dest='out_name',  default='bdt_test', help='Output Pickle Name')
+    parser.add_option('--cache_dir', dest='cache_dir',  default='', help='Directory to save the training/test'\
+            ' matrices in and reuse them from when the inputs, features, max_evt, train_frac and seed are the same')
     (options, args) = parser.parse_args()
 
     # Seed numpy's randomness
@@ -157,20 +160,34 @@ if __name__ == "__main__":
     print( 'You set max tree depth = {}'.format(options.depth)    )
     print( 'You set eta = {}'.format(options.eta)                 )
 
-    # Make Signal Container
-    print( 'Loading sig_file = {}'.format(options.sig_file) )
-    sigContainer = sampleContainer(options.sig_file,options.max_evt,options.train_frac,True)
-    sigContainer.root2PyEvents()
-    sigContainer.constructTrainAndTest()
-
-    # Make Background Container
-    print( 'Loading bkg_file = {}'.format(options.bkg_file) )
-    bkgContainer = sampleContainer(options.bkg_file,options.max_evt,options.train_frac,False)
-    bkgContainer.root2PyEvents()
-    bkgContainer.constructTrainAndTest()
-
-    # Merge
-    eventContainer = mergedContainer(sigContainer,bkgContainer)
+    # Reuse the matrices of an earlier run with the same inputs and settings (see mods/matrixCache.py)
+    eventContainer = None
+    if options.cache_dir:
+        key = matrixCache.cacheKey(options.sig_file, options.bkg_file, 'EcalVeto_flatten',
+                                   matrixCache.featureNames(sampleContainer.root2PyEvents),
+                                   options.max_evt, options.train_frac, options.seed)
+        eventContainer = matrixCache.load(options.cache_dir, key)
+        if eventContainer != None:
+            eventContainer.makeDMatrices()
+
+    if eventContainer == None:
+
+        # Make Signal Container
+        print( 'Loading sig_file = {}'.format(options.sig_file) )
+        sigContainer = sampleContainer(options.sig_file,options.max_evt,options.train_frac,True)
+        sigContainer.root2PyEvents()
+        sigContainer.constructTrainAndTest()
+
+        # Make Background Container
+        print( 'Loading bkg_file = {}'.format(options.bkg_file) )
+        bkgContainer = sampleContainer(options.bkg_file,options.max_evt,options.train_frac,False)
+        bkgContainer.root2PyEvents()
+        bkgContainer.constructTrainAndTest()
+
+        # Merge
+        eventContainer = mergedContainer(sigContainer,bkgContainer)
+        if options.cache_dir:
+            matrixCache.save(options.cache_dir, key, eventContainer)
 
     params = {
                'objective': 'binary:logistic',
@@ -0,0 +1,70 @@
+"""
+bdtScaling.py
+
+Runs bdtMaker.py (or EcalVeto-3.0/bdtMaker.py with --maker) on increasing numbers of events per
+class, with all events in memory and/or streamed (--stream quantile/external), each in its own
+process, and reports how loading time, training time and peak memory scale with sample size.
+
+Example:
+    python3 bdtScaling.py -s sig_train.root -b bkg_train.root --sizes 100000,300000,1000000
+"""
+
+import re
+import sys
+import argparse
+import subprocess
+import numpy as np
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-s', dest='sig_file', required=True, help='signal file')
+parser.add_argument('-b', dest='bkg_file', required=True, help='background file')
+parser.add_argument('--maker', default='bdtMaker.py', help='bdtMaker script to run')
+parser.add_argument('--sizes', default='100000,300000,1000000', help='comma-separated max_evt values')
+parser.add_argument('--modes', default='memory,quantile,external',
+                    help='comma-separated:  memory (all events at once) and/or --stream modes')
+parser.add_argument('--tree_number', type=int, default=100, help='boosting rounds for each run')
+parser.add_argument('--chunk_size', type=int, default=100000)
+parser.add_argument('-o', dest='out_name', default='bdt_scaling', help='prefix of the bdtMaker output dirs')
+args = parser.parse_args()
+
+result_line = re.compile(r'Loaded (\d+) training and (\d+) test events in ([\d.]+) s, '
+                         r'trained in ([\d.]+) s, peak memory ([\d.]+) MB')
+
+sizes = [int(n) for n in args.sizes.split(',')]
+modes = args.modes.split(',')
+results = {} # mode: [(events, load s, train s, MB)]
+
+for mode in modes:
+    results[mode] = []
+    for n in sizes:
+        cmd = [sys.executable, args.maker, '-s', args.sig_file, '-b', args.bkg_file,
+               '--max_evt', str(n), '--tree_number', str(args.tree_number),
+               '-o', '{}_{}_{}'.format(args.out_name, mode, n)]
+        if mode != 'memory':
+            cmd += ['--stream', mode, '--chunk_size', str(args.chunk_size)]
+        print('Running {}'.format(' '.join(cmd)))
+        out = subprocess.run(cmd, stdout=subprocess.PIPE, universal_newlines=True).stdout
+        match = [result_line.search(l) for l in out.splitlines()]
+        match = [m for m in match if m != None]
+        if not match:
+            print('  failed')
+            continue
+        n_train, n_test, load, train, mem = match[-1].groups()
+        results[mode].append((int(n_train) + int(n_test), float(load), float(train), float(mem)))
+        print('  {} events: load {} s, train {} s, peak memory {} MB'.format(
+              int(n_train) + int(n_test), load, train, mem))
+
+print('\n====== Scaling with events (sig + bkg) ======')
+print('{:>10} {:>12} {:>10} {:>10} {:>12}'.format('mode', 'events', 'load [s]', 'train [s]', 'memory [MB]'))
+for mode in modes:
+    for row in results[mode]:
+        print('{:>10} {:>12d} {:>10.1f} {:>10.1f} {:>12.0f}'.format(mode, *row))
+
+    # Power law exponents (time ~ events^k) and memory per extra event
+    rows = np.array(results[mode])
+    if len(rows) > 1 and len(np.unique(rows[:, 0])) > 1:
+        k_load = np.polyfit(np.log(rows[:, 0]), np.log(np.maximum(rows[:, 1], 1e-3)), 1)[0]
+        k_train = np.polyfit(np.log(rows[:, 0]), np.log(np.maximum(rows[:, 2], 1e-3)), 1)[0]
+        mem_slope, mem_base = np.polyfit(rows[:, 0], rows[:, 3], 1)
+        print('{:>10}  load ~ events^{:.2f}, train ~ events^{:.2f}, memory {:.0f} MB + {:.2f} kB/event'.format(
+              mode, k_load, k_train, mem_base, mem_slope*1024.))
@@ -0,0 +1,144 @@
+import os
+import sys
+import time
+import pickle as pkl
+import itertools
+import numpy as np
+import xgboost as xgb
+import multiprocessing as mp
+from optparse import OptionParser
+from bdtMaker import mergedEvents
+
+# Hyperparameter sweep:  reads and merges the inputs once (as bdtMaker.py does), then trains
+# every configuration of a grid (or a random subset of it) in parallel worker processes,
+# each training with --threads threads.  Every trial's metrics and early-stopping round go to
+# <out>_<n>/trials.csv and only the --keep best models are saved
+
+# Filled in before the workers are forked, so they share the events instead of copying them
+eventContainer = None
+
+def initWorker():
+    # DMatrices are made in each worker (not before forking, xgboost's threads don't survive it)
+    eventContainer.makeDMatrices()
+
+def runTrial(trial):
+
+    k, config, params, options = trial
+    params = dict(params, **config)
+
+    evals_result = {}
+    start = time.time()
+    gbm = xgb.train(params, eventContainer.dtrain, num_boost_round = options.tree_number,
+                    evals = [(eventContainer.dtrain,'train'), (eventContainer.dtest,'eval')],
+                    early_stopping_rounds = options.early_stop, evals_result = evals_result,
+                    verbose_eval = False)
+    train_time = time.time() - start
+
+    best = gbm.best_iteration
+    metrics = {}
+    for sample in ['train', 'eval']:
+        for metric in evals_result[sample]:
+            metrics['{}_{}'.format(sample, metric)] = evals_result[sample][metric][best]
+
+    print( 'Trial {}: {} -> best iteration {}, {}'.format(k, config, best,
+           ', '.join('{} {:.5f}'.format(m, metrics[m]) for m in sorted(metrics))) )
+    sys.stdout.flush()
+
+    return k, config, best, metrics, train_time, gbm.save_raw()
+
+if __name__ == "__main__":
+
+    # Parse
+    parser = OptionParser()
+    parser.add_option('--seed', dest='seed',type="int",  default=2, help='Numpy random seed.')
+    parser.add_option('--max_evt', dest='max_evt',type="int",  default=1500000, help='Max Events to load')
+    parser.add_option('--train_frac', dest='train_frac',type="float",  default=.8, help='Fraction of events to use for training')
+    parser.add_option('--sample', dest='sample', action='store_true', default=False, help='Take max_evt events'\
+            ' at random from all the input files instead of the first max_evt')
+    parser.add_option('--tree_number', dest='tree_number',type="int",  default=1000, help='Max number of trees')
+    parser.add_option('--early_stop', dest='early_stop',type="int",  default=10, help='Early stopping rounds')
+    parser.add_option('--eta', dest='eta',  default='0.023,0.05,0.1', help='Learning rates to try')
+    parser.add_option('--depth', dest='depth',  default='6,8,10', help='Max tree depths to try')
+    parser.add_option('--min_child_weight', dest='min_child_weight',  default='1,20', help='min_child_weights to try')
+    parser.add_option('--random', dest='random',type="int",  default=0, help='Train this many random configurations of the grid instead of all')
+    parser.add_option('--metric', dest='metric',  default='error', help='Metric for early stopping and ranking (error, auc or logloss)')
+    parser.add_option('--threads', dest='threads',type="int",  default=1, help='Threads per trial')
+    parser.add_option('--workers', dest='workers',type="int",  default=0, help='Trials at once [Default: cores/threads]')
+    parser.add_option('--keep', dest='keep',type="int",  default=3, help='Number of best models to save')
+    parser.add_option('-b', dest='bkg_file', default='./bdt_0/bkg_train.root', help='name of background file')
+    parser.add_option('-s', dest='sig_file', default='./bdt_0/sig_train.root', help='name of signal file')
+    parser.add_option('--cache_dir', dest='cache_dir',  default='', help='Matrix cache directory (as in bdtMaker.py)')
+    parser.add_option('-o', dest='out_name',  default='bdt_sweep', help='Output Name')
+    (options, args) = parser.parse_args()
+
+    # Seed numpy's randomness
+    np.random.seed(options.seed)
+
+    # Get sweep num
+    bdt_num=0
+    Check=True
+    while Check:
+        if not os.path.exists(options.out_name+'_'+str(bdt_num)):
+            try:
+                os.makedirs(options.out_name+'_'+str(bdt_num))
+                Check=False
+            except:
+               Check=True
+        else:
+            bdt_num+=1
+    out_dir = options.out_name+'_'+str(bdt_num)
+
+    # Configurations to try
+    grid = {
+            'eta':              [float(x) for x in options.eta.split(',')],
+            'max_depth':        [int(x) for x in options.depth.split(',')],
+            'min_child_weight': [float(x) for x in options.min_child_weight.split(',')]
+            }
+    names = sorted(grid)
+    configs = [dict(zip(names, values)) for values in itertools.product(*[grid[n] for n in names])]
+    if options.random > 0 and options.random < len(configs):
+        configs = [configs[i] for i in sorted(np.random.choice(len(configs), options.random, replace=False))]
+
+    workers = options.workers if options.workers > 0 else max(mp.cpu_count()//options.threads, 1)
+    print( 'Sweeping {} configurations, {} at a time with {} thread(s) each'.format(
+           len(configs), workers, options.threads) )
+
+    # Load the events once
+    eventContainer = mergedEvents(options, dmatrix=False)
+
+    # As in bdtMaker.py, apart from what's swept; the early stopping metric goes last
+    params = {
+               'objective': 'binary:logistic',
+               'subsample':.9,
+               'colsample_bytree': .85,
+               'eval_metric': [m for m in ['error', 'auc', 'logloss'] if m != options.metric] + [options.metric],
+               'seed': 1,
+               'nthread': options.threads,
+               'verbosity': 0
+    }
+
+    # Train
+    trials = [(k, config, params, options) for k, config in enumerate(configs)]
+    with mp.get_context('fork').Pool(workers, initializer=initWorker) as pool:
+        results = pool.map(runTrial, trials, chunksize=1)
+
+    # Record every trial, best first
+    maximize = options.metric.startswith('auc')
+    results.sort(key=lambda res: res[3]['eval_'+options.metric], reverse=maximize)
+    metric_names = sorted(results[0][3])
+    with open(out_dir+'/trials.csv', 'w') as f:
+        f.write(','.join(['trial'] + names + ['best_iteration'] + metric_names + ['train_time']) + '\n')
+        for k, config, best, metrics, train_time, raw in results:
+            f.write(','.join([str(k)] + [str(config[n]) for n in names] + [str(best)]
+                             + ['%.6g' % metrics[m] for m in metric_names] + ['%.1f' % train_time]) + '\n')
+
+    # Store the best BDTs
+    for rank, (k, config, best, metrics, train_time, raw) in enumerate(results[:options.keep]):
+        gbm = xgb.Booster(model_file=bytearray(raw))
+        with open('{}/{}_trial{}_weights.pkl'.format(out_dir, out_dir, k), 'wb') as output:
+            pkl.dump(gbm, output)
+        print( 'Rank {}: trial {} {} with eval {} {:.5f} at iteration {}'.format(
+               rank + 1, k, config, options.metric, metrics['eval_'+options.metric], best) )
+
+    # Closing statment
+    print("Files saved in: ", out_dir)
@@ -0,0 +1,100 @@
+"""
+check_featureCache.py
+
+Checks that treeMaker.py's feature cache (--cache, FeatureCache in mods/ROOTmanager.py) gives
+the same output as computing everything, on two input files of a group.  Cached values are kept
+by file and entry in that file, so they must be found for the right events however the files
+are chained:
+
+- both files, no cache (the reference)
+- both files, filling the cache, then again taking everything from it
+- both files from the cache, with --staging async (one file per chain)
+- each file on its own from the cache, against each on its own without it
+
+Every output EcalVeto tree must equal its reference, value for value.  Exits with a nonzero
+status if one doesn't.
+
+Example:
+    ldmx python3 check_featureCache.py -i sample_1.root sample_2.root -m 2000
+"""
+
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+import subprocess
+import uproot
+import numpy as np
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-i', nargs=2, dest='infiles', required=True, help='two input event files')
+parser.add_argument('-m', dest='maxEvents', type=int, default=-1,
+                    help='max events per run (more than the first file has, to cache both)')
+parser.add_argument('--keep', action='store_true', default=False, help='keep the work directory')
+args = parser.parse_args()
+
+work = tempfile.mkdtemp(prefix='check_featureCache_')
+cache = os.path.join(work, 'cache')
+
+# One input directory per set of files (treeMaker takes a group's files with --indirs)
+def inputDir(name, files):
+    path = os.path.join(work, 'in_' + name)
+    os.makedirs(path)
+    for f in files:
+        os.symlink(os.path.abspath(f), os.path.join(path, os.path.basename(f)))
+    return path
+
+dirs = {'both': inputDir('both', args.infiles),
+        'first': inputDir('first', args.infiles[:1]),
+        'second': inputDir('second', args.infiles[1:])}
+
+def treeMaker(label, files, options=[]):
+    # Run treeMaker.py on a set of files and return its output EcalVeto tree as arrays
+    outdir = os.path.join(work, 'out_' + label)
+    command = [sys.executable, 'treeMaker.py', '--indirs', dirs[files], '-g', label, '-o', outdir]
+    if args.maxEvents >= 0:
+        command += ['-m', str(args.maxEvents)]
+    print('\n' + ' '.join(command + options))
+    subprocess.check_call(command + options)
+    with uproot.open(os.path.join(outdir, label + '_unsorted.root')) as rfile:
+        return rfile['EcalVeto'].arrays(library='np')
+
+ok = True
+def check(passed, message):
+    global ok
+    ok = ok and passed
+    print('{:>6}  {}'.format('OK' if passed else 'FAILED', message))
+
+def compare(arrays, reference, message):
+    # Same branches, entries and values (nan == nan)
+    same = set(arrays) == set(reference)
+    bad = []
+    for name in reference:
+        if not same or len(arrays[name]) != len(reference[name]):
+            same = False
+            break
+        a, b = arrays[name], reference[name]
+        equal = (a == b) | (np.isnan(a) & np.isnan(b)) if a.dtype.kind == 'f' else (a == b)
+        if not equal.all():
+            bad.append(name)
+    check(same and len(bad) == 0, '{}{}'.format(message,
+          '' if len(bad) == 0 else ' ({} branches differ: {})'.format(len(bad), ', '.join(bad[:5]))))
+
+reference = treeMaker('nocache', 'both')
+references = dict((files, treeMaker('nocache_' + files, files)) for files in ('first', 'second'))
+
+compare(treeMaker('fill', 'both', ['--cache', cache]), reference, 'both files, filling the cache')
+compare(treeMaker('cached', 'both', ['--cache', cache]), reference, 'both files, from the cache')
+compare(treeMaker('async', 'both', ['--cache', cache, '--staging', 'async']), reference,
+        'both files, from the cache with --staging async')
+for files in ('first', 'second'):
+    compare(treeMaker('cached_' + files, files, ['--cache', cache]), references[files],
+            '{} file alone, from the cache'.format(files))
+
+if args.keep:
+    print('Work directory kept: {}'.format(work))
+else:
+    shutil.rmtree(work)
+
+sys.exit(0 if ok else 1)
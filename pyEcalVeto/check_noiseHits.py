@@ -0,0 +1,102 @@
+"""
+check_noiseHits.py
+
+Checks the rec/sim noise hit matching of the sample analyzers (physTools.noiseHits per event,
+and noiseHitsArray/noiseTotalsArray on a whole chunk) against the nested loop over sorted
+hits they used before, on random events:  every rec hit must get the same label, and every
+event the same noise energy (to the bit) and number of noise hits.  Times the three ways.
+
+Example:
+    python3 check_noiseHits.py -n 2000 --hits 1500
+Exits with a nonzero status if anything differs.
+"""
+
+import sys
+import time
+import argparse
+import numpy as np
+from mods import physTools
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-n', type=int, default=500, help='number of events')
+parser.add_argument('--hits', type=int, default=1000, help='mean number of rec hits per event')
+parser.add_argument('--seed', type=int, default=1)
+args = parser.parse_args()
+
+rng = np.random.RandomState(args.seed)
+
+# Random events:  rec and sim hit IDs from a pool small enough for repeats, some rec hits
+# flagged as noise and some without sim hits
+events = []
+for i in range(args.n):
+    nRec, nSim = rng.poisson(args.hits), rng.poisson(2*args.hits)
+    pool = rng.randint(0, 2**31, 3*args.hits + 1)
+    recIDs = [int(ID) for ID in rng.choice(pool, nRec)]
+    simIDs = [int(ID) for ID in rng.choice(pool, nSim)]
+    recNoise = [bool(flag) for flag in rng.rand(nRec) < 0.05]
+    recEnergy = [float(e) for e in rng.exponential(1., nRec).astype(np.float32)]
+    events.append((recIDs, recNoise, recEnergy, simIDs))
+
+def nestedLoop(recIDs, recNoise, recEnergy, simIDs):
+    # The analyzers' matching before noiseHits
+    rec = sorted(zip(recIDs, recNoise, recEnergy), key = lambda hit : hit[0])
+    sim = sorted(simIDs)
+    labels, energy, count = [], 0., 0
+    for ID, noise, e in rec:
+        nSimHitMatch = 0
+        for simID in sim:
+            if simID == ID:
+                nSimHitMatch += 1
+            elif simID > ID:
+                break
+        labels.append(noise or nSimHitMatch == 0)
+        if labels[-1]:
+            energy += e
+            count += 1
+    return labels, energy, count
+
+def perEvent(recIDs, recNoise, recEnergy, simIDs):
+    # The analyzers' matching with noiseHits
+    rec = sorted(zip(recIDs, recNoise, recEnergy), key = lambda hit : hit[0])
+    labels = physTools.noiseHits([hit[0] for hit in rec], [hit[1] for hit in rec], simIDs)
+    energy, count = 0., 0
+    for hit, noise in zip(rec, labels):
+        if noise:
+            energy += hit[2]
+            count += 1
+    return labels, energy, count
+
+ok = True
+def check(passed, message):
+    global ok
+    ok = ok and passed
+    print('{:>6}  {}'.format('OK' if passed else 'FAILED', message))
+
+results = {}
+for name, matcher in (('nested loop', nestedLoop), ('noiseHits', perEvent)):
+    start = time.time()
+    results[name] = [matcher(*event) for event in events]
+    print('{:>12}: {:.3f} s'.format(name, time.time() - start))
+
+# The whole chunk at once, flat over its events
+offsets = lambda lists: np.concatenate(([0], np.cumsum([len(l) for l in lists])))
+recOffsets, simOffsets = offsets([e[0] for e in events]), offsets([e[3] for e in events])
+recIDs, recNoise, recEnergy, simIDs = [np.concatenate([np.asarray(e[k]) for e in events]) for k in range(4)]
+start = time.time()
+noise = physTools.noiseHitsArray(recIDs, recNoise, recOffsets, simIDs, simOffsets)
+energy, count = physTools.noiseTotalsArray(recIDs, recEnergy, recOffsets, noise)
+print('{:>12}: {:.3f} s'.format('chunk', time.time() - start))
+
+reference = results['nested loop']
+check(results['noiseHits'] == reference, 'noiseHits labels, noise energies and counts in {} events'.format(args.n))
+
+# Chunk labels are in the events' hit order, the nested loop's in hit ID order
+bad = 0
+for i, (labels, e, c) in enumerate(reference):
+    order = sorted(range(len(events[i][0])), key = lambda k : events[i][0][k])
+    chunkLabels = noise[recOffsets[i]:recOffsets[i + 1]][order].tolist()
+    if chunkLabels != labels or energy[i] != e or count[i] != c:
+        bad += 1
+check(bad == 0, 'chunk labels, noise energies and counts ({} events differ)'.format(bad))
+
+sys.exit(0 if ok else 1)
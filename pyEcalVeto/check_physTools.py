@@ -0,0 +1,179 @@
+"""
+check_physTools.py
+
+Checks that the array versions of the physTools geometry kernels (projectionArray,
+layerInterceptsArray, ...) agree exactly with the scalar ones on random inputs, and times
+both:  the scalar function called in a loop over N inputs vs. one call of the array version.
+Same for the scoring-plane truth finders (electronTargetSPHit, electronEcalSPHit, gammaEcalSPHit
+per event vs. truthSPHitsArray on a whole chunk), on random hit collections.
+
+The kernels physTools promises to be exact (projection, layerIntercepts, dot, dist and the SP
+truth) must give the same bits.  Those whose scalar versions go through BLAS (np.linalg.norm,
+np.dot) or libm (acos, ** on python floats), namely mag, unit, distPtToLine, distTwoLines and
+angle, may differ by up to --max-ulp ulps, since that depends on the platform and numpy build.
+
+Example:
+    python3 check_physTools.py -n 100000
+Exits with a nonzero status if any kernel disagrees by more than it's allowed.
+"""
+
+import sys
+import timeit
+import argparse
+import numpy as np
+from mods import physTools
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-n', type=int, default=20000, help='number of inputs per kernel')
+parser.add_argument('--seed', type=int, default=1)
+parser.add_argument('--repeat', type=int, default=3, help='timing runs per kernel (best is kept)')
+parser.add_argument('--max-ulp', dest='max_ulp', type=float, default=4.,
+                    help='largest difference (in ulps) allowed for the BLAS/libm kernels')
+parser.add_argument('--skip-benchmark', action='store_true', default=False)
+args = parser.parse_args()
+
+rng = np.random.RandomState(args.seed)
+n = args.n
+
+# Inputs roughly like the ones in treeMaker:  SP hit positions/momenta, hit (x,y), trajectory points
+pos = np.column_stack((rng.uniform(-200, 200, n), rng.uniform(-200, 200, n),
+                       rng.uniform(0, 250, n)))
+mom = np.column_stack((rng.normal(0, 300, n), rng.normal(0, 300, n), rng.uniform(1, 4000, n)))
+zs = rng.uniform(240, 760, n)
+xy1 = rng.uniform(-300, 300, (n, 2))
+xy2 = rng.uniform(-300, 300, (n, 2))
+p1, p2, p3, p4 = [rng.uniform(-300, 300, (n, 3)) for i in range(4)]
+
+# Degenerate lines:  zero length and parallel ones, to go through every branch
+k = n//10
+p4[:k] = p3[:k]                              # y1 == y2
+p2[k:2*k] = p1[k:2*k]                        # x1 == x2
+p2[2*k:3*k] = p1[2*k:3*k]                    # both
+p4[2*k:3*k] = p3[2*k:3*k]
+p4[3*k:4*k] = p3[3*k:4*k] + 2.*(p1[3*k:4*k] - p2[3*k:4*k]) # parallel
+
+# Python lists/tuples for the scalar versions, as they'd get them from the getters
+pos_l, mom_l, xy1_l, xy2_l = pos.tolist(), mom.tolist(), [tuple(v) for v in xy1.tolist()], [tuple(v) for v in xy2.tolist()]
+
+# Scoring-plane hits for the truth finders:  n/10 events of ~10 hits each on the planes they look at
+class Hit:
+    def __init__(self, pos, mom, pdgID, trackID):
+        self.pos, self.mom, self.pdgID, self.trackID = pos, mom, pdgID, trackID
+    def getPosition(self): return self.pos
+    def getMomentum(self): return self.mom
+    def getPdgID(self): return self.pdgID
+    def getTrackID(self): return self.trackID
+
+class Columns:
+    # Like a ColumnarBranch:  flat member arrays and where each event starts
+    def __init__(self, values, offsets):
+        self.values = values
+        self.offsets = dict((member, offsets) for member in values)
+
+n_sp = max(n//10, 1)
+counts = rng.poisson(10, n_sp)
+n_hits = counts.sum()
+planes = [physTools.sp_target_down_z, physTools.sp_trigger_pad_down_l1_z,
+          physTools.sp_trigger_pad_down_l2_z, physTools.sp_ecal_front_z, 300.]
+sp_values = {'x_': rng.uniform(-200, 200, n_hits), 'y_': rng.uniform(-200, 200, n_hits),
+             'z_': np.array(planes)[rng.randint(len(planes), size=n_hits)],
+             'px_': rng.normal(0, 200, n_hits), 'py_': rng.normal(0, 200, n_hits),
+             'pz_': rng.uniform(-1000, 4000, n_hits),
+             'pdgID_': np.array([11, 22, -22, 13, 2112])[rng.randint(5, size=n_hits)],
+             'trackID_': rng.randint(1, 3, size=n_hits)}
+tied = np.arange(0, n_hits - 1, 7) # some ties in p
+for member in ('px_', 'py_', 'pz_', 'z_', 'pdgID_'):
+    sp_values[member][tied] = sp_values[member][tied + 1]
+sp_offsets = np.concatenate(([0], np.cumsum(counts)))
+sp_columns = Columns(sp_values, sp_offsets)
+sp_events = [[Hit((sp_values['x_'][k], sp_values['y_'][k], sp_values['z_'][k]),
+                  (sp_values['px_'][k], sp_values['py_'][k], sp_values['pz_'][k]),
+                  sp_values['pdgID_'][k], sp_values['trackID_'][k])
+              for k in range(sp_offsets[i], sp_offsets[i + 1])] for i in range(n_sp)]
+
+def spRow(hit):
+    # pos and mom of a hit as one row, nan if none was found
+    if hit == None: return [np.nan]*6
+    return list(hit.getPosition()) + list(hit.getMomentum())
+
+def spScalar(target_finder):
+    return [spRow(target_finder(hits)) + spRow(physTools.electronEcalSPHit(hits))
+            + spRow(physTools.gammaEcalSPHit(hits)) for hits in sp_events]
+
+def spArray(deltaPz):
+    truth = physTools.truthSPHitsArray(sp_columns, sp_columns, deltaPz=deltaPz)
+    return np.concatenate([np.concatenate((truth[key].pos, truth[key].mom), axis=1)
+                           for key in ('e_target', 'e_ecal', 'g_ecal')], axis=1)
+
+# name: (scalar loop, array call)
+kernels = [
+    ('projection',
+        lambda: [physTools.projection(pos_l[i], mom_l[i], zs[i]) for i in range(n)],
+        lambda: physTools.projectionArray(pos, mom, zs)),
+    ('layerIntercepts',
+        lambda: [physTools.layerIntercepts(pos_l[i], mom_l[i]) for i in range(n)],
+        lambda: physTools.layerInterceptsArray(pos, mom)),
+    ('mag',
+        lambda: [physTools.mag(mom_l[i]) for i in range(n)],
+        lambda: physTools.magArray(mom)),
+    ('unit',
+        lambda: [physTools.unit(mom_l[i]) for i in range(n)],
+        lambda: physTools.unitArray(mom)),
+    ('dot',
+        lambda: [physTools.dot(pos_l[i], mom_l[i]) for i in range(n)],
+        lambda: physTools.dotArray(pos, mom)),
+    ('dist',
+        lambda: [physTools.dist(xy1_l[i], xy2_l[i]) for i in range(n)],
+        lambda: physTools.distArray(xy1, xy2)),
+    ('distPtToLine',
+        lambda: [physTools.distPtToLine(p1[i], p3[i], p4[i]) for i in range(n)],
+        lambda: physTools.distPtToLineArray(p1, p3, p4)),
+    ('distTwoLines',
+        lambda: [physTools.distTwoLines(p1[i], p2[i], p3[i], p4[i]) for i in range(n)],
+        lambda: physTools.distTwoLinesArray(p1, p2, p3, p4)),
+    ('angle',
+        lambda: [physTools.angle(mom_l[i], units='degrees') for i in range(n)],
+        lambda: physTools.angleArray(mom, units='degrees')),
+    ('SP truth',
+        lambda: spScalar(physTools.electronTargetSPHit),
+        lambda: spArray(False)),
+    ('SP truth (dpz)',
+        lambda: spScalar(physTools.electronTargetSPHit_deltaPz),
+        lambda: spArray(True)),
+    ]
+
+# Kernels that can differ in the last bits (see physTools' array versions); all others must be exact
+libm_kernels = ['mag', 'unit', 'distPtToLine', 'distTwoLines', 'angle']
+
+def compare(scalar, array):
+    # Number of values that differ (nan == nan) and the largest difference in ulps
+    scalar = np.array(scalar, dtype=float).reshape(array.shape)
+    same = (scalar == array) | (np.isnan(scalar) & np.isnan(array))
+    if same.all():
+        return 0, 0.
+    diff = np.abs(scalar[~same] - array[~same])/np.spacing(np.abs(scalar[~same]))
+    return int((~same).sum()), float(np.nanmax(diff)) if np.isfinite(diff).any() else float('inf')
+
+print('====== Agreement (%d inputs per kernel, %d events for the SP truth) ======' % (n, n_sp))
+ok = True
+with np.errstate(divide='ignore', invalid='ignore'):
+    for name, scalar, array in kernels:
+        n_bad, max_ulp = compare(scalar(), array())
+        tolerance = args.max_ulp if name in libm_kernels else 0.
+        passed = n_bad == 0 or max_ulp <= tolerance
+        ok = ok and passed
+        print('%-16s %s%s' % (name, 'exact' if n_bad == 0 else
+                               '%d differ (max %.1f ulp, %g allowed)' % (n_bad, max_ulp, tolerance),
+                               '' if passed else '  FAILED'))
+
+if not args.skip_benchmark:
+    print('\n====== Time per input/event (best of %d) ======' % args.repeat)
+    print('%-16s %12s %12s %9s' % ('kernel', 'scalar [us]', 'array [us]', 'speedup'))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for name, scalar, array in kernels:
+            count = n_sp if name.startswith('SP') else n
+            t_scalar = min(timeit.repeat(scalar, number=1, repeat=args.repeat))/count*1e6
+            t_array = min(timeit.repeat(array, number=1, repeat=args.repeat))/count*1e6
+            print('%-16s %12.3f %12.4f %8.0fx' % (name, t_scalar, t_array, t_scalar/t_array))
+
+sys.exit(0 if ok else 1)
@@ -0,0 +1,98 @@
+"""
+check_rocHist.py
+
+Checks the histogram ROC engine (mods/rocHist.py) against sklearn on random BDT-like scores
+(signal piled up near 1, background spread out with a tail towards 1):
+
+- AUC:  the histogram AUC must be within its stated error of sklearn's roc_auc_score.
+- Curve:  at cuts on bin edges the histogram efficiencies must equal the fraction of scores >= the
+  edge, but for scores on the edge itself, which may be filled a bin either side of it.
+- Cuts:  cutForEfficiency's cut must give the efficiency it reports, and be the best bin edge.
+- Merging:  filling in chunks and adding histograms must give the same counts as one fill.
+
+and times both ways.  Exits with a nonzero status if a check fails.
+
+Example:
+    python3 check_rocHist.py -n 2000000 --bins 1000000
+"""
+
+import sys
+import time
+import argparse
+import numpy as np
+from sklearn import metrics
+from mods import rocHist
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-n', type=int, default=1000000, help='events per sample')
+parser.add_argument('--bins', type=int, default=1000000)
+parser.add_argument('--chunks', type=int, default=7, help='chunks to fill in for the merging check')
+parser.add_argument('--seed', type=int, default=1)
+args = parser.parse_args()
+
+rng = np.random.RandomState(args.seed)
+sig = 1. - rng.beta(1., 40., args.n)
+bkg = rng.beta(1.2, 6., args.n)
+tail = rng.rand(args.n) < 1e-3
+bkg[tail] = 1. - rng.beta(1., 400., tail.sum())
+sig = np.round(sig, 7) # Some exact ties, like float32 scores have
+bkg = np.round(bkg, 7)
+
+ok = True
+def check(passed, message):
+    global ok
+    ok = ok and passed
+    print('{:>6}  {}'.format('OK' if passed else 'FAILED', message))
+
+start = time.time()
+sigHist = rocHist.ScoreHist(args.bins).fill(sig)
+bkgHist = rocHist.ScoreHist(args.bins).fill(bkg)
+auc, error = rocHist.rocAUC(sigHist, bkgHist)
+fpr, tpr, cuts = rocHist.rocCurve(sigHist, bkgHist)
+hist_time = time.time() - start
+
+start = time.time()
+scores = np.concatenate((sig, bkg))
+labels = np.concatenate((np.ones(args.n), np.zeros(args.n)))
+exact_auc = metrics.roc_auc_score(labels, scores)
+metrics.roc_curve(labels, scores)
+exact_time = time.time() - start
+
+print('Histogram: {:.2f} s, {:.0f} MB;  sklearn: {:.2f} s'.format(
+      hist_time, 2*sigHist.counts.nbytes/1024.**2, exact_time))
+check(abs(auc - exact_auc) <= error + 1e-12,
+      'AUC {:.8f} vs exact {:.8f} (difference {:.2g}, stated error {:.2g})'.format(auc, exact_auc, abs(auc - exact_auc), error))
+
+# Exact efficiencies at some of the bin edges (the ones clipped into the end bins excepted).
+# A score on an edge (to within rounding) may be binned either side of it, so the scores there
+# are the tolerance
+picks = rng.choice(np.arange(1, args.bins), 200, replace=False)
+edges = sigHist.edges()
+width = (sigHist.high - sigHist.low)/args.bins
+effs_s, effs_b = rocHist.efficiencies(sigHist), rocHist.efficiencies(bkgHist)
+bad = 0
+for i in picks:
+    for scores, effs in ((sig, effs_s), (bkg, effs_b)):
+        exact = np.mean(scores >= edges[i])
+        onEdge = np.mean(np.abs(scores - edges[i]) <= 1e-6*width)
+        if abs(effs[i] - exact) > onEdge + 1e-12:
+            bad += 1
+            break
+check(bad == 0, 'efficiencies at {} bin edges ({} differ)'.format(len(picks), bad))
+
+for target in [0.99, 0.9, 0.5]:
+    cut, eff, binEff = rocHist.cutForEfficiency(sigHist, target)
+    i = int(np.argmin(np.abs(edges - cut)))
+    best = eff >= target and (i == args.bins or effs_s[i + 1] < target)
+    check(best and eff - target <= binEff + 1e-12,
+          'signal efficiency {}: cut {:.7f} keeps {:.6f} (bin {:.2g})'.format(target, cut, eff, binEff))
+for cut, bkgEff, sigEff in rocHist.sigEffsAtMistags(sigHist, bkgHist):
+    print('        cut {:.7f}: bkg eff {:.3g}, sig eff {:.5f}'.format(cut, bkgEff, sigEff))
+
+merged = rocHist.ScoreHist(args.bins)
+for chunk in np.array_split(bkg, args.chunks):
+    merged.add(rocHist.ScoreHist(args.bins).fill(chunk))
+check(np.array_equal(merged.counts, bkgHist.counts) and merged.entries == bkgHist.entries,
+      'merging {} chunk histograms'.format(args.chunks))
+
+sys.exit(0 if ok else 1)
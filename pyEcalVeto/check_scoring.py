@@ -0,0 +1,104 @@
+"""
+check_scoring.py
+
+Compares the BDT scoring backends in mods/scoring.py on a validation sample:
+
+- Parity:  scores every event with the pickled booster (xgboost) and its ONNX export
+  (ONNX Runtime) and reports the largest absolute difference.  Exits with a nonzero status
+  if it's above --tolerance.
+- Throughput:  events/s of each backend for each batch size (1 is what the eval scripts do,
+  one event per call) and thread count.
+
+The validation sample is a flat EcalVeto tree (treeMaker/eval output) holding the BDT's
+features, taken in the order the eval script given with --features (eval, eval_SegmipX) scores
+them in (its bdt_features).  There must be as many as the models take, and if the booster has
+feature names they must be the same.
+
+Example:
+    python3 check_scoring.py --pkl bdt_test_0/bdt_test_0_weights.pkl --onnx bdt_test_0_weights_f.onnx \
+        -i val_sig.root val_bkg.root --features eval_SegmipX
+"""
+
+import sys
+import time
+import argparse
+import importlib
+import uproot
+import numpy as np
+from mods import scoring
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--pkl', required=True, help='pickled xgboost booster')
+parser.add_argument('--onnx', required=True, help='ONNX export of the same booster')
+parser.add_argument('-i', nargs='+', dest='infiles', required=True, help='validation file(s)')
+parser.add_argument('--tree', default='EcalVeto')
+parser.add_argument('--features', default='eval',
+                    help='eval script whose bdt_features lists the features, in order (eval, eval_SegmipX)')
+parser.add_argument('--max-events', type=int, default=100000)
+parser.add_argument('--tolerance', type=float, default=1e-5, help='max abs score difference allowed')
+parser.add_argument('--batch-sizes', default='1,16,256,4096,65536')
+parser.add_argument('--threads', default='1,2,4,8')
+parser.add_argument('--min-time', type=float, default=2., help='seconds to time each configuration for')
+parser.add_argument('--skip-benchmark', action='store_true', default=False)
+args = parser.parse_args()
+
+backends = {'xgboost': scoring.loadScorer(args.pkl, 'xgboost'),
+            'onnx': scoring.loadScorer(args.onnx, 'onnx')}
+n_features = backends['xgboost'].numFeatures()
+if isinstance(backends['onnx'].numFeatures(), int) and backends['onnx'].numFeatures() != n_features:
+    sys.exit('The models take different numbers of features ({} and {})'.format(
+             n_features, backends['onnx'].numFeatures()))
+
+# Features, as the eval script scores them
+feature_names = list(importlib.import_module(args.features).bdt_features)
+if len(feature_names) != n_features:
+    sys.exit('{} scores {} features but the models take {}'.format(args.features, len(feature_names), n_features))
+booster_names = backends['xgboost'].model.feature_names
+if booster_names != None and list(booster_names) != feature_names:
+    sys.exit('The booster\'s features are not those {} scores:  {}'.format(args.features,
+             ', '.join('{} vs {}'.format(a, b) for a, b in zip(booster_names, feature_names) if a != b)))
+
+# Validation events
+events = []
+n_events = 0
+for rfilename in args.infiles:
+    if n_events >= args.max_events: break
+    with uproot.open(rfilename) as rfile:
+        arrays = rfile[args.tree].arrays(feature_names, library='np',
+                                         entry_stop=args.max_events - n_events)
+        events.append(np.column_stack([arrays[name] for name in feature_names]).astype(np.float64))
+        n_events += len(events[-1])
+events = np.concatenate(events)
+print('Loaded {} events with {} features'.format(len(events), n_features))
+
+print('\n====== Parity ======')
+scores = dict((name, backends[name].score(events)) for name in backends)
+diff = np.abs(scores['xgboost'] - scores['onnx'])
+print('max abs difference {:.3g}, mean {:.3g}, 99.9% below {:.3g}'.format(
+      diff.max(), diff.mean(), np.percentile(diff, 99.9)))
+worst = np.argsort(diff)[::-1][:5]
+for i in worst:
+    print('  event {:8d}:  xgboost {:.8f}  onnx {:.8f}'.format(i, scores['xgboost'][i], scores['onnx'][i]))
+ok = diff.max() <= args.tolerance
+print('{} (tolerance {:g})'.format('OK' if ok else 'FAILED', args.tolerance))
+
+if not args.skip_benchmark:
+    print('\n====== Throughput [events/s] ======')
+    batch_sizes = [int(b) for b in args.batch_sizes.split(',')]
+    print('{:>8} {:>8}'.format('backend', 'threads') + ''.join('{:>12}'.format('batch ' + str(b)) for b in batch_sizes))
+    for name in backends:
+        for threads in [int(t) for t in args.threads.split(',')]:
+            backends[name].setThreads(threads)
+            row = []
+            for batch in batch_sizes:
+                # Go through the events in batches until min_time has passed
+                n_scored = 0
+                start = time.perf_counter()
+                while time.perf_counter() - start < args.min_time:
+                    first = n_scored % len(events)
+                    backends[name].score(events[first:first + batch])
+                    n_scored += len(events[first:first + batch])
+                row.append(n_scored/(time.perf_counter() - start))
+            print('{:>8} {:>8d}'.format(name, threads) + ''.join('{:>12.0f}'.format(r) for r in row))
+
+sys.exit(0 if ok else 1)
@@ -3,6 +3,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib
 from matplotlib import font_manager
+from mods import rocHist
 matplotlib.use('Agg')
 #font_path = font_manager.findfont(font_manager.FontProperties(family='Helvetica'))
 font_path = 'arial.ttf'
@@ -33,13 +34,34 @@ s1=([0.1, 0.4, 0.35, 0.3])
 
 
 def createAllRoc(labels, scores, positive_label,graphlabel,colors): #positive_label=1
+    curves = []
+    for i in range(len(labels)):
+        fpr, tpr, thresholds = metrics.roc_curve(labels[i], scores[i], pos_label=positive_label)
+        print(thresholds)
+        curves.append((fpr, tpr))
+    plotAllRoc(curves,graphlabel,colors)
+
+def createAllRocHist(sigHists, bkgHist, graphlabel, colors):
+    # Same plot from score histograms (mods/rocHist.py), for samples too big to hold in memory
+    curves = []
+    for i in range(len(sigHists)):
+        fpr, tpr, cuts = rocHist.rocCurve(sigHists[i], bkgHist)
+        keep = np.append(True, (np.diff(fpr) != 0) | (np.diff(tpr) != 0)) # Skip empty bins
+        fpr, tpr = fpr[keep], tpr[keep]
+        auc, error = rocHist.rocAUC(sigHists[i], bkgHist)
+        print('{}: AUC = {:.6f} +- {:.1g}'.format(graphlabel[i], auc, error))
+        for cut, bkgEff, sigEff in rocHist.sigEffsAtMistags(sigHists[i], bkgHist):
+            print('    cut {:.6f}: bkg eff {:.3g}, sig eff {:.4f}'.format(cut, bkgEff, sigEff))
+        curves.append((fpr, tpr))
+    plotAllRoc(curves,graphlabel,colors)
+
+def plotAllRoc(curves,graphlabel,colors):
     plt.rcParams["lines.linewidth"]=1.35
     fig =plt.figure(figsize = (8,6.6))
     plt.title('ROC Analysis')
     coun = 0
-    for i in range(len(labels)):
-        fpr, tpr, thresholds = metrics.roc_curve(labels[i], scores[i], pos_label=positive_label)
-        print(thresholds)
+    for i in range(len(curves)):
+        fpr, tpr = curves[i]
         if coun < 4:
             plt.plot(fpr, tpr, 'b', label=graphlabel[i], color=colors[i])
         elif coun < 8:
@@ -63,50 +85,14 @@ def createAllRoc(labels, scores, positive_label,graphlabel,colors): #positive_la
 
 #createAllRoc([y,y], [s1,scores], 1,['h1','h2'])
 
-import ROOT
-file1 = ROOT.TFile.Open('1.0_tree.root')
-sig1 = file1.Get('EcalVeto')
-file2 = ROOT.TFile.Open('0.1_tree.root')
-sig01 = file2.Get('EcalVeto')
-file3 = ROOT.TFile.Open('0.01_tree.root')
-sig001 = file3.Get('EcalVeto')
-file4 = ROOT.TFile.Open('0.001_tree.root')
-sig0001 = file4.Get('EcalVeto')
-file5 = ROOT.TFile.Open('bkg_tree.root')
-bkg = file5.Get('EcalVeto')
-
-
-
-sig1preds = []
-for i in sig1:
-    sig1preds +=[i.discValue_EcalVeto]
-sig01preds = []
-for i in sig01:
-    sig01preds +=[i.discValue_EcalVeto]
-sig001preds = []
-for i in sig001:
-    sig001preds +=[i.discValue_EcalVeto]
-sig0001preds = []
-for i in sig0001:
-    sig0001preds +=[i.discValue_EcalVeto]
-bkgpreds = []
-for i in bkg:
-    bkgpreds +=[i.discValue_EcalVeto]
-bkgmirror = np.zeros(len(bkgpreds),dtype=int)
-sig1mirror = np.zeros(len(sig1preds),dtype=int)+1
-sig01mirror = np.zeros(len(sig01preds),dtype=int)+1
-sig001mirror = np.zeros(len(sig001preds),dtype=int)+1
-sig0001mirror = np.zeros(len(sig0001preds),dtype=int)+1
-sig1roc = bkgpreds+sig1preds
-sig01roc = bkgpreds+sig01preds
-sig001roc = bkgpreds+sig001preds
-sig0001roc = bkgpreds+sig0001preds
-
-sig1label =np.concatenate((bkgmirror,sig1mirror))
-sig01label =np.concatenate((bkgmirror,sig01mirror))
-sig001label =np.concatenate((bkgmirror,sig001mirror))
-sig0001label =np.concatenate((bkgmirror,sig0001mirror))
+# Scores are streamed from the eval outputs into histograms (mods/rocHist.py) rather than
+# read into lists, so this works for any number of events.  For outputs split over many files
+# or jobs, fill one histogram per job, save() it and add them up with rocHist.mergeHists
+sig_files = ['1.0_tree.root', '0.1_tree.root', '0.01_tree.root', '0.001_tree.root']
+bkg_files = ['bkg_tree.root']
 
+sigHists = [rocHist.ScoreHist().fillTree([f], 'discValue_EcalVeto') for f in sig_files]
+bkgHist = rocHist.ScoreHist().fillTree(bkg_files, 'discValue_EcalVeto')
 
-out = createAllRoc([sig1label,sig01label,sig001label,sig0001label], [sig1roc,sig01roc,sig001roc,sig0001roc], 1,['1 GeV Sig Seg','0.1 GeV Sig Seg','0.01 GeV Sig Seg','0.001 GeV Sig Seg'],['darkgreen','indigo','darkorange','lightskyblue'])
+out = createAllRocHist(sigHists, bkgHist, ['1 GeV Sig Seg','0.1 GeV Sig Seg','0.01 GeV Sig Seg','0.001 GeV Sig Seg'],['darkgreen','indigo','darkorange','lightskyblue'])
 print(out)
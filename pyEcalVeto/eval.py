@@ -1,30 +1,462 @@
 import os
 import sys
 import numpy as np
-import pickle as pkl
-import xgboost as xgb
 import mods.ROOTmanager as manager
+from mods import scoring
 from treeMaker import branches_info
 
 pkl_file   = os.getcwd()+'/dummy_0/dummy_0_weights.pkl'
-model = pkl.load(open(pkl_file,'rb'))
+model = None # Loaded in main (--model/--backend)
+
+# Features the BDT takes, in order (check_scoring.py reads them from here too)
+bdt_features = [
+        # Base variables
+        'nReadoutHits',
+        'summedDet',
+        'summedTightIso',
+        'maxCellDep',
+        'showerRMS',
+        'xStd',
+        'yStd',
+        'avgLayerHit',
+        'stdLayerHit',
+        'deepestLayerHit',
+        'ecalBackEnergy',
+        # MIP Tracking variables
+        'straight4',
+        'firstNearPhLayer',
+        'nNearPhHits',
+        'fullElectronTerritoryHits',
+        'fullPhotonTerritoryHits',
+        'fullTerritoryRatio',
+        'electronTerritoryHits',
+        'photonTerritoryHits',
+        'TerritoryRatio',
+        'epSep',
+        'epDot',
+        # Longitudinal segment variables
+        'energy_s1',
+        'nHits_s1',
+        'xMean_s1',
+        'yMean_s1',
+        'layerMean_s1',
+        'xStd_s1',
+        'yStd_s1',
+        'layerStd_s1',
+        'energy_s2',
+        'nHits_s2',
+        'xMean_s2',
+        'yMean_s2',
+        'layerMean_s2',
+        'xStd_s2',
+        'yStd_s2',
+        'layerStd_s2',
+        'energy_s3',
+        'nHits_s3',
+        'xMean_s3',
+        'yMean_s3',
+        'layerMean_s3',
+        'xStd_s3',
+        'yStd_s3',
+        'layerStd_s3',
+        # Electron RoC variables
+        'eContEnergy_x1_s1',
+        'eContEnergy_x2_s1',
+        'eContEnergy_x3_s1',
+        'eContEnergy_x4_s1',
+        'eContEnergy_x5_s1',
+        'eContNHits_x1_s1',
+        'eContNHits_x2_s1',
+        'eContNHits_x3_s1',
+        'eContNHits_x4_s1',
+        'eContNHits_x5_s1',
+        'eContXMean_x1_s1',
+        'eContXMean_x2_s1',
+        'eContXMean_x3_s1',
+        'eContXMean_x4_s1',
+        'eContXMean_x5_s1',
+        'eContYMean_x1_s1',
+        'eContYMean_x2_s1',
+        'eContYMean_x3_s1',
+        'eContYMean_x4_s1',
+        'eContYMean_x5_s1',
+        'eContLayerMean_x1_s1',
+        'eContLayerMean_x2_s1',
+        'eContLayerMean_x3_s1',
+        'eContLayerMean_x4_s1',
+        'eContLayerMean_x5_s1',
+        'eContXStd_x1_s1',
+        'eContXStd_x2_s1',
+        'eContXStd_x3_s1',
+        'eContXStd_x4_s1',
+        'eContXStd_x5_s1',
+        'eContYStd_x1_s1',
+        'eContYStd_x2_s1',
+        'eContYStd_x3_s1',
+        'eContYStd_x4_s1',
+        'eContYStd_x5_s1',
+        'eContLayerStd_x1_s1',
+        'eContLayerStd_x2_s1',
+        'eContLayerStd_x3_s1',
+        'eContLayerStd_x4_s1',
+        'eContLayerStd_x5_s1',
+        'eContEnergy_x1_s2',
+        'eContEnergy_x2_s2',
+        'eContEnergy_x3_s2',
+        'eContEnergy_x4_s2',
+        'eContEnergy_x5_s2',
+        'eContNHits_x1_s2',
+        'eContNHits_x2_s2',
+        'eContNHits_x3_s2',
+        'eContNHits_x4_s2',
+        'eContNHits_x5_s2',
+        'eContXMean_x1_s2',
+        'eContXMean_x2_s2',
+        'eContXMean_x3_s2',
+        'eContXMean_x4_s2',
+        'eContXMean_x5_s2',
+        'eContYMean_x1_s2',
+        'eContYMean_x2_s2',
+        'eContYMean_x3_s2',
+        'eContYMean_x4_s2',
+        'eContYMean_x5_s2',
+        'eContLayerMean_x1_s2',
+        'eContLayerMean_x2_s2',
+        'eContLayerMean_x3_s2',
+        'eContLayerMean_x4_s2',
+        'eContLayerMean_x5_s2',
+        'eContXStd_x1_s2',
+        'eContXStd_x2_s2',
+        'eContXStd_x3_s2',
+        'eContXStd_x4_s2',
+        'eContXStd_x5_s2',
+        'eContYStd_x1_s2',
+        'eContYStd_x2_s2',
+        'eContYStd_x3_s2',
+        'eContYStd_x4_s2',
+        'eContYStd_x5_s2',
+        'eContLayerStd_x1_s2',
+        'eContLayerStd_x2_s2',
+        'eContLayerStd_x3_s2',
+        'eContLayerStd_x4_s2',
+        'eContLayerStd_x5_s2',
+        'eContEnergy_x1_s3',
+        'eContEnergy_x2_s3',
+        'eContEnergy_x3_s3',
+        'eContEnergy_x4_s3',
+        'eContEnergy_x5_s3',
+        'eContNHits_x1_s3',
+        'eContNHits_x2_s3',
+        'eContNHits_x3_s3',
+        'eContNHits_x4_s3',
+        'eContNHits_x5_s3',
+        'eContXMean_x1_s3',
+        'eContXMean_x2_s3',
+        'eContXMean_x3_s3',
+        'eContXMean_x4_s3',
+        'eContXMean_x5_s3',
+        'eContYMean_x1_s3',
+        'eContYMean_x2_s3',
+        'eContYMean_x3_s3',
+        'eContYMean_x4_s3',
+        'eContYMean_x5_s3',
+        'eContLayerMean_x1_s3',
+        'eContLayerMean_x2_s3',
+        'eContLayerMean_x3_s3',
+        'eContLayerMean_x4_s3',
+        'eContLayerMean_x5_s3',
+        'eContXStd_x1_s3',
+        'eContXStd_x2_s3',
+        'eContXStd_x3_s3',
+        'eContXStd_x4_s3',
+        'eContXStd_x5_s3',
+        'eContYStd_x1_s3',
+        'eContYStd_x2_s3',
+        'eContYStd_x3_s3',
+        'eContYStd_x4_s3',
+        'eContYStd_x5_s3',
+        'eContLayerStd_x1_s3',
+        'eContLayerStd_x2_s3',
+        'eContLayerStd_x3_s3',
+        'eContLayerStd_x4_s3',
+        'eContLayerStd_x5_s3',
+        # Photon RoC variables
+        'gContEnergy_x1_s1',
+        'gContEnergy_x2_s1',
+        'gContEnergy_x3_s1',
+        'gContEnergy_x4_s1',
+        'gContEnergy_x5_s1',
+        'gContNHits_x1_s1',
+        'gContNHits_x2_s1',
+        'gContNHits_x3_s1',
+        'gContNHits_x4_s1',
+        'gContNHits_x5_s1',
+        'gContXMean_x1_s1',
+        'gContXMean_x2_s1',
+        'gContXMean_x3_s1',
+        'gContXMean_x4_s1',
+        'gContXMean_x5_s1',
+        'gContYMean_x1_s1',
+        'gContYMean_x2_s1',
+        'gContYMean_x3_s1',
+        'gContYMean_x4_s1',
+        'gContYMean_x5_s1',
+        'gContLayerMean_x1_s1',
+        'gContLayerMean_x2_s1',
+        'gContLayerMean_x3_s1',
+        'gContLayerMean_x4_s1',
+        'gContLayerMean_x5_s1',
+        'gContXStd_x1_s1',
+        'gContXStd_x2_s1',
+        'gContXStd_x3_s1',
+        'gContXStd_x4_s1',
+        'gContXStd_x5_s1',
+        'gContYStd_x1_s1',
+        'gContYStd_x2_s1',
+        'gContYStd_x3_s1',
+        'gContYStd_x4_s1',
+        'gContYStd_x5_s1',
+        'gContLayerStd_x1_s1',
+        'gContLayerStd_x2_s1',
+        'gContLayerStd_x3_s1',
+        'gContLayerStd_x4_s1',
+        'gContLayerStd_x5_s1',
+        'gContEnergy_x1_s2',
+        'gContEnergy_x2_s2',
+        'gContEnergy_x3_s2',
+        'gContEnergy_x4_s2',
+        'gContEnergy_x5_s2',
+        'gContNHits_x1_s2',
+        'gContNHits_x2_s2',
+        'gContNHits_x3_s2',
+        'gContNHits_x4_s2',
+        'gContNHits_x5_s2',
+        'gContXMean_x1_s2',
+        'gContXMean_x2_s2',
+        'gContXMean_x3_s2',
+        'gContXMean_x4_s2',
+        'gContXMean_x5_s2',
+        'gContYMean_x1_s2',
+        'gContYMean_x2_s2',
+        'gContYMean_x3_s2',
+        'gContYMean_x4_s2',
+        'gContYMean_x5_s2',
+        'gContLayerMean_x1_s2',
+        'gContLayerMean_x2_s2',
+        'gContLayerMean_x3_s2',
+        'gContLayerMean_x4_s2',
+        'gContLayerMean_x5_s2',
+        'gContXStd_x1_s2',
+        'gContXStd_x2_s2',
+        'gContXStd_x3_s2',
+        'gContXStd_x4_s2',
+        'gContXStd_x5_s2',
+        'gContYStd_x1_s2',
+        'gContYStd_x2_s2',
+        'gContYStd_x3_s2',
+        'gContYStd_x4_s2',
+        'gContYStd_x5_s2',
+        'gContLayerStd_x1_s2',
+        'gContLayerStd_x2_s2',
+        'gContLayerStd_x3_s2',
+        'gContLayerStd_x4_s2',
+        'gContLayerStd_x5_s2',
+        'gContEnergy_x1_s3',
+        'gContEnergy_x2_s3',
+        'gContEnergy_x3_s3',
+        'gContEnergy_x4_s3',
+        'gContEnergy_x5_s3',
+        'gContNHits_x1_s3',
+        'gContNHits_x2_s3',
+        'gContNHits_x3_s3',
+        'gContNHits_x4_s3',
+        'gContNHits_x5_s3',
+        'gContXMean_x1_s3',
+        'gContXMean_x2_s3',
+        'gContXMean_x3_s3',
+        'gContXMean_x4_s3',
+        'gContXMean_x5_s3',
+        'gContYMean_x1_s3',
+        'gContYMean_x2_s3',
+        'gContYMean_x3_s3',
+        'gContYMean_x4_s3',
+        'gContYMean_x5_s3',
+        'gContLayerMean_x1_s3',
+        'gContLayerMean_x2_s3',
+        'gContLayerMean_x3_s3',
+        'gContLayerMean_x4_s3',
+        'gContLayerMean_x5_s3',
+        'gContXStd_x1_s3',
+        'gContXStd_x2_s3',
+        'gContXStd_x3_s3',
+        'gContXStd_x4_s3',
+        'gContXStd_x5_s3',
+        'gContYStd_x1_s3',
+        'gContYStd_x2_s3',
+        'gContYStd_x3_s3',
+        'gContYStd_x4_s3',
+        'gContYStd_x5_s3',
+        'gContLayerStd_x1_s3',
+        'gContLayerStd_x2_s3',
+        'gContLayerStd_x3_s3',
+        'gContLayerStd_x4_s3',
+        'gContLayerStd_x5_s3',
+        # Outside RoC variables
+        'oContEnergy_x1_s1',
+        'oContEnergy_x2_s1',
+        'oContEnergy_x3_s1',
+        'oContEnergy_x4_s1',
+        'oContEnergy_x5_s1',
+        'oContNHits_x1_s1',
+        'oContNHits_x2_s1',
+        'oContNHits_x3_s1',
+        'oContNHits_x4_s1',
+        'oContNHits_x5_s1',
+        'oContXMean_x1_s1',
+        'oContXMean_x2_s1',
+        'oContXMean_x3_s1',
+        'oContXMean_x4_s1',
+        'oContXMean_x5_s1',
+        'oContYMean_x1_s1',
+        'oContYMean_x2_s1',
+        'oContYMean_x3_s1',
+        'oContYMean_x4_s1',
+        'oContYMean_x5_s1',
+        'oContLayerMean_x1_s1',
+        'oContLayerMean_x2_s1',
+        'oContLayerMean_x3_s1',
+        'oContLayerMean_x4_s1',
+        'oContLayerMean_x5_s1',
+        'oContXStd_x1_s1',
+        'oContXStd_x2_s1',
+        'oContXStd_x3_s1',
+        'oContXStd_x4_s1',
+        'oContXStd_x5_s1',
+        'oContYStd_x1_s1',
+        'oContYStd_x2_s1',
+        'oContYStd_x3_s1',
+        'oContYStd_x4_s1',
+        'oContYStd_x5_s1',
+        'oContLayerStd_x1_s1',
+        'oContLayerStd_x2_s1',
+        'oContLayerStd_x3_s1',
+        'oContLayerStd_x4_s1',
+        'oContLayerStd_x5_s1',
+        'oContEnergy_x1_s2',
+        'oContEnergy_x2_s2',
+        'oContEnergy_x3_s2',
+        'oContEnergy_x4_s2',
+        'oContEnergy_x5_s2',
+        'oContNHits_x1_s2',
+        'oContNHits_x2_s2',
+        'oContNHits_x3_s2',
+        'oContNHits_x4_s2',
+        'oContNHits_x5_s2',
+        'oContXMean_x1_s2',
+        'oContXMean_x2_s2',
+        'oContXMean_x3_s2',
+        'oContXMean_x4_s2',
+        'oContXMean_x5_s2',
+        'oContYMean_x1_s2',
+        'oContYMean_x2_s2',
+        'oContYMean_x3_s2',
+        'oContYMean_x4_s2',
+        'oContYMean_x5_s2',
+        'oContLayerMean_x1_s2',
+        'oContLayerMean_x2_s2',
+        'oContLayerMean_x3_s2',
+        'oContLayerMean_x4_s2',
+        'oContLayerMean_x5_s2',
+        'oContXStd_x1_s2',
+        'oContXStd_x2_s2',
+        'oContXStd_x3_s2',
+        'oContXStd_x4_s2',
+        'oContXStd_x5_s2',
+        'oContYStd_x1_s2',
+        'oContYStd_x2_s2',
+        'oContYStd_x3_s2',
+        'oContYStd_x4_s2',
+        'oContYStd_x5_s2',
+        'oContLayerStd_x1_s2',
+        'oContLayerStd_x2_s2',
+        'oContLayerStd_x3_s2',
+        'oContLayerStd_x4_s2',
+        'oContLayerStd_x5_s2',
+        'oContEnergy_x1_s3',
+        'oContEnergy_x2_s3',
+        'oContEnergy_x3_s3',
+        'oContEnergy_x4_s3',
+        'oContEnergy_x5_s3',
+        'oContNHits_x1_s3',
+        'oContNHits_x2_s3',
+        'oContNHits_x3_s3',
+        'oContNHits_x4_s3',
+        'oContNHits_x5_s3',
+        'oContXMean_x1_s3',
+        'oContXMean_x2_s3',
+        'oContXMean_x3_s3',
+        'oContXMean_x4_s3',
+        'oContXMean_x5_s3',
+        'oContYMean_x1_s3',
+        'oContYMean_x2_s3',
+        'oContYMean_x3_s3',
+        'oContYMean_x4_s3',
+        'oContYMean_x5_s3',
+        'oContLayerMean_x1_s3',
+        'oContLayerMean_x2_s3',
+        'oContLayerMean_x3_s3',
+        'oContLayerMean_x4_s3',
+        'oContLayerMean_x5_s3',
+        'oContXStd_x1_s3',
+        'oContXStd_x2_s3',
+        'oContXStd_x3_s3',
+        'oContXStd_x4_s3',
+        'oContXStd_x5_s3',
+        'oContYStd_x1_s3',
+        'oContYStd_x2_s3',
+        'oContYStd_x3_s3',
+        'oContYStd_x4_s3',
+        'oContYStd_x5_s3',
+        'oContLayerStd_x1_s3',
+        'oContLayerStd_x2_s3',
+        'oContLayerStd_x3_s3',
+        'oContLayerStd_x4_s3',
+        'oContLayerStd_x5_s3',
+        ]
 
 def main():
 
     # Inputs and their trees and stuff
     pdict = manager.parse()
+    global model
+    model = scoring.loadScorer(pdict['model'] if pdict['model'] else pkl_file, pdict['backend'])
     inlist = pdict['inlist']
     outlist = pdict['outlist']
     group_labels = pdict['groupls']
     maxEvent = pdict['maxEvents']
+    staging = pdict['staging']
+
+    # Options of the shared parser only treeMaker.py has
+    for option in ('columnar', 'profile', 'cache'):
+        if pdict[option]:
+            sys.exit('--%s is not supported by %s' % (option, os.path.basename(__file__)))
+
+    # Only the features get read from the input tree
+    feature_inputs = dict((feat_name, None) for feat_name in branches_info)
 
     branches_info['discValue_EcalVeto'] = {'rtype': float, 'default': 0.5}
 
+    # With --friend, only the event key and discValue are written (see manager.attachFriend)
+    friend = pdict['friend']
+    if friend:
+        out_info = dict(manager.friend_key_info)
+        out_info['discValue_EcalVeto'] = branches_info['discValue_EcalVeto']
+
     # Construct tree processes
     procs = []
     for gl, group in zip(group_labels, inlist):
         procs.append( manager.TreeProcess(event_process, group, ID=gl, tree_name='EcalVeto',
-            pfreq=100) )
+            pfreq=100, staging=staging) )
 
     # Process jobs
     for proc in procs:
@@ -34,12 +466,22 @@ def main():
         # Move into appropriate scratch dir
         os.chdir(proc.tmp_dir)
 
-        # Make an output file and new tree (copied from input + discValue)
-        proc.tfMaker = manager.TreeMaker(group_labels[procs.index(proc)]+'.root',\
-                                         "EcalVeto",\
-                                         branches_info,\
-                                         outlist[procs.index(proc)]
-                                         )
+        proc.declareInputs(feature_inputs)
+
+        # Make an output file and new tree (copied from input + discValue, or the friend)
+        proc.friend = friend
+        if friend:
+            proc.tfMaker = manager.TreeMaker(group_labels[procs.index(proc)]+'.root',\
+                                             manager.friend_tree_name,\
+                                             dict(out_info),\
+                                             outlist[procs.index(proc)]
+                                             )
+        else:
+            proc.tfMaker = manager.TreeMaker(group_labels[procs.index(proc)]+'.root',\
+                                             "EcalVeto",\
+                                             branches_info,\
+                                             outlist[procs.index(proc)]
+                                             )
 
         # RUN
         proc.extrafs = [ proc.tfMaker.wq ] # Gets executed at the end of run()
@@ -53,432 +495,26 @@ def main():
 
 def event_process(self):
 
-    # Feature list from input tree
-    # Exp: feats = [ feat_value for feat_value in self.tree~ ]
-    # Put all segmentation variables in for now (Take out the ones we won't need once
-    # we make sure that all the python bdt stuff works)
-    feats = [
-            # Base variables
-            self.tree.nReadoutHits              ,
-            self.tree.summedDet                 ,
-            self.tree.summedTightIso            ,
-            self.tree.maxCellDep                ,
-            self.tree.showerRMS                 ,
-            self.tree.xStd                      ,
-            self.tree.yStd                      ,
-            self.tree.avgLayerHit               ,
-            self.tree.stdLayerHit               ,
-            self.tree.deepestLayerHit           ,
-            self.tree.ecalBackEnergy            ,
-            # MIP Tracking variables
-            self.tree.straight4                 ,
-            self.tree.firstNearPhLayer          ,
-            self.tree.nNearPhHits               ,
-            self.tree.fullElectronTerritoryHits ,
-            self.tree.fullPhotonTerritoryHits   ,
-            self.tree.fullTerritoryRatio        ,
-            self.tree.electronTerritoryHits     ,
-            self.tree.photonTerritoryHits       ,
-            self.tree.TerritoryRatio            ,
-            self.tree.epSep                     ,
-            self.tree.epDot                     ,
-            # Longitudinal segment variables
-            self.tree.energy_s1                 ,
-            self.tree.nHits_s1                  ,
-            self.tree.xMean_s1                  ,
-            self.tree.yMean_s1                  ,
-            self.tree.layerMean_s1              ,
-            self.tree.xStd_s1                   ,
-            self.tree.yStd_s1                   ,
-            self.tree.layerStd_s1               ,
-            self.tree.energy_s2                 ,
-            self.tree.nHits_s2                  ,
-            self.tree.xMean_s2                  ,
-            self.tree.yMean_s2                  ,
-            self.tree.layerMean_s2              ,
-            self.tree.xStd_s2                   ,
-            self.tree.yStd_s2                   ,
-            self.tree.layerStd_s2               ,
-            self.tree.energy_s3                 ,
-            self.tree.nHits_s3                  ,
-            self.tree.xMean_s3                  ,
-            self.tree.yMean_s3                  ,
-            self.tree.layerMean_s3              ,
-            self.tree.xStd_s3                   ,
-            self.tree.yStd_s3                   ,
-            self.tree.layerStd_s3               ,
-            # Electron RoC variables
-            self.tree.eContEnergy_x1_s1         ,
-            self.tree.eContEnergy_x2_s1         ,
-            self.tree.eContEnergy_x3_s1         ,
-            self.tree.eContEnergy_x4_s1         ,
-            self.tree.eContEnergy_x5_s1         ,
-            self.tree.eContNHits_x1_s1          ,
-            self.tree.eContNHits_x2_s1          ,
-            self.tree.eContNHits_x3_s1          ,
-            self.tree.eContNHits_x4_s1          ,
-            self.tree.eContNHits_x5_s1          ,
-            self.tree.eContXMean_x1_s1          ,
-            self.tree.eContXMean_x2_s1          ,
-            self.tree.eContXMean_x3_s1          ,
-            self.tree.eContXMean_x4_s1          ,
-            self.tree.eContXMean_x5_s1          ,
-            self.tree.eContYMean_x1_s1          ,
-            self.tree.eContYMean_x2_s1          ,
-            self.tree.eContYMean_x3_s1          ,
-            self.tree.eContYMean_x4_s1          ,
-            self.tree.eContYMean_x5_s1          ,
-            self.tree.eContLayerMean_x1_s1      ,
-            self.tree.eContLayerMean_x2_s1      ,
-            self.tree.eContLayerMean_x3_s1      ,
-            self.tree.eContLayerMean_x4_s1      ,
-            self.tree.eContLayerMean_x5_s1      ,
-            self.tree.eContXStd_x1_s1           ,
-            self.tree.eContXStd_x2_s1           ,
-            self.tree.eContXStd_x3_s1           ,
-            self.tree.eContXStd_x4_s1           ,
-            self.tree.eContXStd_x5_s1           ,
-            self.tree.eContYStd_x1_s1           ,
-            self.tree.eContYStd_x2_s1           ,
-            self.tree.eContYStd_x3_s1           ,
-            self.tree.eContYStd_x4_s1           ,
-            self.tree.eContYStd_x5_s1           ,
-            self.tree.eContLayerStd_x1_s1       ,
-            self.tree.eContLayerStd_x2_s1       ,
-            self.tree.eContLayerStd_x3_s1       ,
-            self.tree.eContLayerStd_x4_s1       ,
-            self.tree.eContLayerStd_x5_s1       ,
-            self.tree.eContEnergy_x1_s2         ,
-            self.tree.eContEnergy_x2_s2         ,
-            self.tree.eContEnergy_x3_s2         ,
-            self.tree.eContEnergy_x4_s2         ,
-            self.tree.eContEnergy_x5_s2         ,
-            self.tree.eContNHits_x1_s2          ,
-            self.tree.eContNHits_x2_s2          ,
-            self.tree.eContNHits_x3_s2          ,
-            self.tree.eContNHits_x4_s2          ,
-            self.tree.eContNHits_x5_s2          ,
-            self.tree.eContXMean_x1_s2          ,
-            self.tree.eContXMean_x2_s2          ,
-            self.tree.eContXMean_x3_s2          ,
-            self.tree.eContXMean_x4_s2          ,
-            self.tree.eContXMean_x5_s2          ,
-            self.tree.eContYMean_x1_s2          ,
-            self.tree.eContYMean_x2_s2          ,
-            self.tree.eContYMean_x3_s2          ,
-            self.tree.eContYMean_x4_s2          ,
-            self.tree.eContYMean_x5_s2          ,
-            self.tree.eContLayerMean_x1_s2      ,
-            self.tree.eContLayerMean_x2_s2      ,
-            self.tree.eContLayerMean_x3_s2      ,
-            self.tree.eContLayerMean_x4_s2      ,
-            self.tree.eContLayerMean_x5_s2      ,
-            self.tree.eContXStd_x1_s2           ,
-            self.tree.eContXStd_x2_s2           ,
-            self.tree.eContXStd_x3_s2           ,
-            self.tree.eContXStd_x4_s2           ,
-            self.tree.eContXStd_x5_s2           ,
-            self.tree.eContYStd_x1_s2           ,
-            self.tree.eContYStd_x2_s2           ,
-            self.tree.eContYStd_x3_s2           ,
-            self.tree.eContYStd_x4_s2           ,
-            self.tree.eContYStd_x5_s2           ,
-            self.tree.eContLayerStd_x1_s2       ,
-            self.tree.eContLayerStd_x2_s2       ,
-            self.tree.eContLayerStd_x3_s2       ,
-            self.tree.eContLayerStd_x4_s2       ,
-            self.tree.eContLayerStd_x5_s2       ,
-            self.tree.eContEnergy_x1_s3         ,
-            self.tree.eContEnergy_x2_s3         ,
-            self.tree.eContEnergy_x3_s3         ,
-            self.tree.eContEnergy_x4_s3         ,
-            self.tree.eContEnergy_x5_s3         ,
-            self.tree.eContNHits_x1_s3          ,
-            self.tree.eContNHits_x2_s3          ,
-            self.tree.eContNHits_x3_s3          ,
-            self.tree.eContNHits_x4_s3          ,
-            self.tree.eContNHits_x5_s3          ,
-            self.tree.eContXMean_x1_s3          ,
-            self.tree.eContXMean_x2_s3          ,
-            self.tree.eContXMean_x3_s3          ,
-            self.tree.eContXMean_x4_s3          ,
-            self.tree.eContXMean_x5_s3          ,
-            self.tree.eContYMean_x1_s3          ,
-            self.tree.eContYMean_x2_s3          ,
-            self.tree.eContYMean_x3_s3          ,
-            self.tree.eContYMean_x4_s3          ,
-            self.tree.eContYMean_x5_s3          ,
-            self.tree.eContLayerMean_x1_s3      ,
-            self.tree.eContLayerMean_x2_s3      ,
-            self.tree.eContLayerMean_x3_s3      ,
-            self.tree.eContLayerMean_x4_s3      ,
-            self.tree.eContLayerMean_x5_s3      ,
-            self.tree.eContXStd_x1_s3           ,
-            self.tree.eContXStd_x2_s3           ,
-            self.tree.eContXStd_x3_s3           ,
-            self.tree.eContXStd_x4_s3           ,
-            self.tree.eContXStd_x5_s3           ,
-            self.tree.eContYStd_x1_s3           ,
-            self.tree.eContYStd_x2_s3           ,
-            self.tree.eContYStd_x3_s3           ,
-            self.tree.eContYStd_x4_s3           ,
-            self.tree.eContYStd_x5_s3           ,
-            self.tree.eContLayerStd_x1_s3       ,
-            self.tree.eContLayerStd_x2_s3       ,
-            self.tree.eContLayerStd_x3_s3       ,
-            self.tree.eContLayerStd_x4_s3       ,
-            self.tree.eContLayerStd_x5_s3       ,
-            # Photon RoC variables
-            self.tree.gContEnergy_x1_s1         ,
-            self.tree.gContEnergy_x2_s1         ,
-            self.tree.gContEnergy_x3_s1         ,
-            self.tree.gContEnergy_x4_s1         ,
-            self.tree.gContEnergy_x5_s1         ,
-            self.tree.gContNHits_x1_s1          ,
-            self.tree.gContNHits_x2_s1          ,
-            self.tree.gContNHits_x3_s1          ,
-            self.tree.gContNHits_x4_s1          ,
-            self.tree.gContNHits_x5_s1          ,
-            self.tree.gContXMean_x1_s1          ,
-            self.tree.gContXMean_x2_s1          ,
-            self.tree.gContXMean_x3_s1          ,
-            self.tree.gContXMean_x4_s1          ,
-            self.tree.gContXMean_x5_s1          ,
-            self.tree.gContYMean_x1_s1          ,
-            self.tree.gContYMean_x2_s1          ,
-            self.tree.gContYMean_x3_s1          ,
-            self.tree.gContYMean_x4_s1          ,
-            self.tree.gContYMean_x5_s1          ,
-            self.tree.gContLayerMean_x1_s1      ,
-            self.tree.gContLayerMean_x2_s1      ,
-            self.tree.gContLayerMean_x3_s1      ,
-            self.tree.gContLayerMean_x4_s1      ,
-            self.tree.gContLayerMean_x5_s1      ,
-            self.tree.gContXStd_x1_s1           ,
-            self.tree.gContXStd_x2_s1           ,
-            self.tree.gContXStd_x3_s1           ,
-            self.tree.gContXStd_x4_s1           ,
-            self.tree.gContXStd_x5_s1           ,
-            self.tree.gContYStd_x1_s1           ,
-            self.tree.gContYStd_x2_s1           ,
-            self.tree.gContYStd_x3_s1           ,
-            self.tree.gContYStd_x4_s1           ,
-            self.tree.gContYStd_x5_s1           ,
-            self.tree.gContLayerStd_x1_s1       ,
-            self.tree.gContLayerStd_x2_s1       ,
-            self.tree.gContLayerStd_x3_s1       ,
-            self.tree.gContLayerStd_x4_s1       ,
-            self.tree.gContLayerStd_x5_s1       ,
-            self.tree.gContEnergy_x1_s2         ,
-            self.tree.gContEnergy_x2_s2         ,
-            self.tree.gContEnergy_x3_s2         ,
-            self.tree.gContEnergy_x4_s2         ,
-            self.tree.gContEnergy_x5_s2         ,
-            self.tree.gContNHits_x1_s2          ,
-            self.tree.gContNHits_x2_s2          ,
-            self.tree.gContNHits_x3_s2          ,
-            self.tree.gContNHits_x4_s2          ,
-            self.tree.gContNHits_x5_s2          ,
-            self.tree.gContXMean_x1_s2          ,
-            self.tree.gContXMean_x2_s2          ,
-            self.tree.gContXMean_x3_s2          ,
-            self.tree.gContXMean_x4_s2          ,
-            self.tree.gContXMean_x5_s2          ,
-            self.tree.gContYMean_x1_s2          ,
-            self.tree.gContYMean_x2_s2          ,
-            self.tree.gContYMean_x3_s2          ,
-            self.tree.gContYMean_x4_s2          ,
-            self.tree.gContYMean_x5_s2          ,
-            self.tree.gContLayerMean_x1_s2      ,
-            self.tree.gContLayerMean_x2_s2      ,
-            self.tree.gContLayerMean_x3_s2      ,
-            self.tree.gContLayerMean_x4_s2      ,
-            self.tree.gContLayerMean_x5_s2      ,
-            self.tree.gContXStd_x1_s2           ,
-            self.tree.gContXStd_x2_s2           ,
-            self.tree.gContXStd_x3_s2           ,
-            self.tree.gContXStd_x4_s2           ,
-            self.tree.gContXStd_x5_s2           ,
-            self.tree.gContYStd_x1_s2           ,
-            self.tree.gContYStd_x2_s2           ,
-            self.tree.gContYStd_x3_s2           ,
-            self.tree.gContYStd_x4_s2           ,
-            self.tree.gContYStd_x5_s2           ,
-            self.tree.gContLayerStd_x1_s2       ,
-            self.tree.gContLayerStd_x2_s2       ,
-            self.tree.gContLayerStd_x3_s2       ,
-            self.tree.gContLayerStd_x4_s2       ,
-            self.tree.gContLayerStd_x5_s2       ,
-            self.tree.gContEnergy_x1_s3         ,
-            self.tree.gContEnergy_x2_s3         ,
-            self.tree.gContEnergy_x3_s3         ,
-            self.tree.gContEnergy_x4_s3         ,
-            self.tree.gContEnergy_x5_s3         ,
-            self.tree.gContNHits_x1_s3          ,
-            self.tree.gContNHits_x2_s3          ,
-            self.tree.gContNHits_x3_s3          ,
-            self.tree.gContNHits_x4_s3          ,
-            self.tree.gContNHits_x5_s3          ,
-            self.tree.gContXMean_x1_s3          ,
-            self.tree.gContXMean_x2_s3          ,
-            self.tree.gContXMean_x3_s3          ,
-            self.tree.gContXMean_x4_s3          ,
-            self.tree.gContXMean_x5_s3          ,
-            self.tree.gContYMean_x1_s3          ,
-            self.tree.gContYMean_x2_s3          ,
-            self.tree.gContYMean_x3_s3          ,
-            self.tree.gContYMean_x4_s3          ,
-            self.tree.gContYMean_x5_s3          ,
-            self.tree.gContLayerMean_x1_s3      ,
-            self.tree.gContLayerMean_x2_s3      ,
-            self.tree.gContLayerMean_x3_s3      ,
-            self.tree.gContLayerMean_x4_s3      ,
-            self.tree.gContLayerMean_x5_s3      ,
-            self.tree.gContXStd_x1_s3           ,
-            self.tree.gContXStd_x2_s3           ,
-            self.tree.gContXStd_x3_s3           ,
-            self.tree.gContXStd_x4_s3           ,
-            self.tree.gContXStd_x5_s3           ,
-            self.tree.gContYStd_x1_s3           ,
-            self.tree.gContYStd_x2_s3           ,
-            self.tree.gContYStd_x3_s3           ,
-            self.tree.gContYStd_x4_s3           ,
-            self.tree.gContYStd_x5_s3           ,
-            self.tree.gContLayerStd_x1_s3       ,
-            self.tree.gContLayerStd_x2_s3       ,
-            self.tree.gContLayerStd_x3_s3       ,
-            self.tree.gContLayerStd_x4_s3       ,
-            self.tree.gContLayerStd_x5_s3       ,
-            # Outside RoC variables
-            self.tree.oContEnergy_x1_s1         ,
-            self.tree.oContEnergy_x2_s1         ,
-            self.tree.oContEnergy_x3_s1         ,
-            self.tree.oContEnergy_x4_s1         ,
-            self.tree.oContEnergy_x5_s1         ,
-            self.tree.oContNHits_x1_s1          ,
-            self.tree.oContNHits_x2_s1          ,
-            self.tree.oContNHits_x3_s1          ,
-            self.tree.oContNHits_x4_s1          ,
-            self.tree.oContNHits_x5_s1          ,
-            self.tree.oContXMean_x1_s1          ,
-            self.tree.oContXMean_x2_s1          ,
-            self.tree.oContXMean_x3_s1          ,
-            self.tree.oContXMean_x4_s1          ,
-            self.tree.oContXMean_x5_s1          ,
-            self.tree.oContYMean_x1_s1          ,
-            self.tree.oContYMean_x2_s1          ,
-            self.tree.oContYMean_x3_s1          ,
-            self.tree.oContYMean_x4_s1          ,
-            self.tree.oContYMean_x5_s1          ,
-            self.tree.oContLayerMean_x1_s1      ,
-            self.tree.oContLayerMean_x2_s1      ,
-            self.tree.oContLayerMean_x3_s1      ,
-            self.tree.oContLayerMean_x4_s1      ,
-            self.tree.oContLayerMean_x5_s1      ,
-            self.tree.oContXStd_x1_s1           ,
-            self.tree.oContXStd_x2_s1           ,
-            self.tree.oContXStd_x3_s1           ,
-            self.tree.oContXStd_x4_s1           ,
-            self.tree.oContXStd_x5_s1           ,
-            self.tree.oContYStd_x1_s1           ,
-            self.tree.oContYStd_x2_s1           ,
-            self.tree.oContYStd_x3_s1           ,
-            self.tree.oContYStd_x4_s1           ,
-            self.tree.oContYStd_x5_s1           ,
-            self.tree.oContLayerStd_x1_s1       ,
-            self.tree.oContLayerStd_x2_s1       ,
-            self.tree.oContLayerStd_x3_s1       ,
-            self.tree.oContLayerStd_x4_s1       ,
-            self.tree.oContLayerStd_x5_s1       ,
-            self.tree.oContEnergy_x1_s2         ,
-            self.tree.oContEnergy_x2_s2         ,
-            self.tree.oContEnergy_x3_s2         ,
-            self.tree.oContEnergy_x4_s2         ,
-            self.tree.oContEnergy_x5_s2         ,
-            self.tree.oContNHits_x1_s2          ,
-            self.tree.oContNHits_x2_s2          ,
-            self.tree.oContNHits_x3_s2          ,
-            self.tree.oContNHits_x4_s2          ,
-            self.tree.oContNHits_x5_s2          ,
-            self.tree.oContXMean_x1_s2          ,
-            self.tree.oContXMean_x2_s2          ,
-            self.tree.oContXMean_x3_s2          ,
-            self.tree.oContXMean_x4_s2          ,
-            self.tree.oContXMean_x5_s2          ,
-            self.tree.oContYMean_x1_s2          ,
-            self.tree.oContYMean_x2_s2          ,
-            self.tree.oContYMean_x3_s2          ,
-            self.tree.oContYMean_x4_s2          ,
-            self.tree.oContYMean_x5_s2          ,
-            self.tree.oContLayerMean_x1_s2      ,
-            self.tree.oContLayerMean_x2_s2      ,
-            self.tree.oContLayerMean_x3_s2      ,
-            self.tree.oContLayerMean_x4_s2      ,
-            self.tree.oContLayerMean_x5_s2      ,
-            self.tree.oContXStd_x1_s2           ,
-            self.tree.oContXStd_x2_s2           ,
-            self.tree.oContXStd_x3_s2           ,
-            self.tree.oContXStd_x4_s2           ,
-            self.tree.oContXStd_x5_s2           ,
-            self.tree.oContYStd_x1_s2           ,
-            self.tree.oContYStd_x2_s2           ,
-            self.tree.oContYStd_x3_s2           ,
-            self.tree.oContYStd_x4_s2           ,
-            self.tree.oContYStd_x5_s2           ,
-            self.tree.oContLayerStd_x1_s2       ,
-            self.tree.oContLayerStd_x2_s2       ,
-            self.tree.oContLayerStd_x3_s2       ,
-            self.tree.oContLayerStd_x4_s2       ,
-            self.tree.oContLayerStd_x5_s2       ,
-            self.tree.oContEnergy_x1_s3         ,
-            self.tree.oContEnergy_x2_s3         ,
-            self.tree.oContEnergy_x3_s3         ,
-            self.tree.oContEnergy_x4_s3         ,
-            self.tree.oContEnergy_x5_s3         ,
-            self.tree.oContNHits_x1_s3          ,
-            self.tree.oContNHits_x2_s3          ,
-            self.tree.oContNHits_x3_s3          ,
-            self.tree.oContNHits_x4_s3          ,
-            self.tree.oContNHits_x5_s3          ,
-            self.tree.oContXMean_x1_s3          ,
-            self.tree.oContXMean_x2_s3          ,
-            self.tree.oContXMean_x3_s3          ,
-            self.tree.oContXMean_x4_s3          ,
-            self.tree.oContXMean_x5_s3          ,
-            self.tree.oContYMean_x1_s3          ,
-            self.tree.oContYMean_x2_s3          ,
-            self.tree.oContYMean_x3_s3          ,
-            self.tree.oContYMean_x4_s3          ,
-            self.tree.oContYMean_x5_s3          ,
-            self.tree.oContLayerMean_x1_s3      ,
-            self.tree.oContLayerMean_x2_s3      ,
-            self.tree.oContLayerMean_x3_s3      ,
-            self.tree.oContLayerMean_x4_s3      ,
-            self.tree.oContLayerMean_x5_s3      ,
-            self.tree.oContXStd_x1_s3           ,
-            self.tree.oContXStd_x2_s3           ,
-            self.tree.oContXStd_x3_s3           ,
-            self.tree.oContXStd_x4_s3           ,
-            self.tree.oContXStd_x5_s3           ,
-            self.tree.oContYStd_x1_s3           ,
-            self.tree.oContYStd_x2_s3           ,
-            self.tree.oContYStd_x3_s3           ,
-            self.tree.oContYStd_x4_s3           ,
-            self.tree.oContYStd_x5_s3           ,
-            self.tree.oContLayerStd_x1_s3       ,
-            self.tree.oContLayerStd_x2_s3       ,
-            self.tree.oContLayerStd_x3_s3       ,
-            self.tree.oContLayerStd_x4_s3       ,
-            self.tree.oContLayerStd_x5_s3       ,
-            ]
+    # Feature list from input tree, in the order of bdt_features
+    feats = [getattr(self.tree, feat) for feat in bdt_features]
+
+    # Prediction
+    evtarray = np.array([feats])
+    pred = float(model.score(evtarray)[0])
+
+    # Friend tree: where the event is in the inputs, and the prediction
+    if self.friend:
+        self.tfMaker.branches['fileIndex'][0] = self.file_index
+        self.tfMaker.branches['fileEntry'][0] = self.file_entry
+        self.tfMaker.branches['discValue_EcalVeto'][0] = pred
+        self.tfMaker.tree.Fill()
+        return
 
     # Copy input tree feats to new tree
     for feat_name, feat_value in zip(self.tfMaker.branches_info, feats):
         self.tfMaker.branches[feat_name][0] = feat_value
 
     # Add prediction to new tree
-    evtarray = np.array([feats])
-    pred = float(model.predict(xgb.DMatrix(evtarray))[0])
     self.tfMaker.branches['discValue_EcalVeto'][0] = pred
 
     # Fill new tree with current event values
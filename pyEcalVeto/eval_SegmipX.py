@@ -1,16 +1,71 @@
 import os
 import sys
 import numpy as np
-import pickle as pkl
-import xgboost as xgb
 import mods.ROOTmanager as manager
 import math
 import ROOT as r
 from mods import ROOTmanager as manager
-from mods import physTools, mipTracking
+from mods import physTools, mipTracking, scoring
 
 pkl_file   = os.getcwd()+'/bdt_test_0/bdt_test_0_weights.pkl'
-model = pkl.load(open(pkl_file,'rb'))
+model = None # Loaded in main (--model/--backend)
+
+# Features the BDT takes, in order (check_scoring.py reads them from here too)
+bdt_features = [
+        # Base variables
+        'nReadoutHits',
+        'summedDet',
+        'summedTightIso',
+        'maxCellDep',
+        'showerRMS',
+        'xStd',
+        'yStd',
+        'avgLayerHit',
+        'stdLayerHit',
+        'deepestLayerHit',
+        'ecalBackEnergy',
+        # MIP Tracking variables
+        'straight4',
+        'firstNearPhLayer',
+        'nNearPhHits',
+        'photonTerritoryHits',
+        'epSep',
+        'epDot',
+        # Longitudinal segment variables
+        'energy_s1',
+        'xMean_s1',
+        'yMean_s1',
+        'layerMean_s1',
+        'energy_s2',
+        'yMean_s3',
+        # Electron RoC variables
+        'eContEnergy_x1_s1',
+        'eContEnergy_x2_s1',
+        'eContYMean_x1_s1',
+        'eContEnergy_x1_s2',
+        'eContEnergy_x2_s2',
+        'eContYMean_x1_s2',
+        # Photon RoC variables
+        'gContNHits_x1_s1',
+        'gContYMean_x1_s1',
+        'gContNHits_x1_s2',
+        # Outside RoC variables
+        'oContEnergy_x1_s1',
+        'oContEnergy_x2_s1',
+        'oContEnergy_x3_s1',
+        'oContNHits_x1_s1',
+        'oContXMean_x1_s1',
+        'oContYMean_x1_s1',
+        'oContYMean_x2_s1',
+        'oContYStd_x1_s1',
+        'oContEnergy_x1_s2',
+        'oContEnergy_x2_s2',
+        'oContEnergy_x3_s2',
+        'oContLayerMean_x1_s2',
+        'oContLayerStd_x1_s2',
+        'oContEnergy_x1_s3',
+        'oContLayerMean_x1_s3',
+        ]
 
 branches_info = {
         # Base variables
@@ -80,12 +135,26 @@ def main():
 
     # Inputs and their trees and stuff
     pdict = manager.parse()
+    global model
+    model = scoring.loadScorer(pdict['model'] if pdict['model'] else pkl_file, pdict['backend'])
     inlist = pdict['inlist']
     outlist = pdict['outlist']
     group_labels = pdict['groupls']
     maxEvent = pdict['maxEvents']
+    staging = pdict['staging']
+
+    # Options of the shared parser only treeMaker.py has
+    for option in ('columnar', 'profile', 'cache'):
+        if pdict[option]:
+            sys.exit('--%s is not supported by %s' % (option, os.path.basename(__file__)))
 
     branches_info['discValue_EcalVeto'] = {'rtype': float, 'default': 0.5}
+
+    # With --friend, only the event key and discValue are written (see manager.attachFriend)
+    friend = pdict['friend']
+    if friend:
+        out_info = dict(manager.friend_key_info)
+        out_info['discValue_EcalVeto'] = branches_info['discValue_EcalVeto']
     #branches_info['epAng'] = {'rtype': float, 'default':99999}
     branches_info['epAng'] = {'rtype': float, 'default':99999}
     branches_info['HCalVeto_passesVeto'] = {'rtype': int, 'default': 0}
@@ -100,7 +169,7 @@ def main():
     procs = []
     for gl, group in zip(group_labels, inlist):
         procs.append( manager.TreeProcess(event_process, group, ID=gl, tree_name='EcalVeto_flatten',
-            pfreq=100) )
+            pfreq=100, staging=staging) )
 
     # Process jobs
     for proc in procs:
@@ -110,12 +179,20 @@ def main():
         # Move into appropriate scratch dir
         os.chdir(proc.tmp_dir)
 
-        # Make an output file and new tree (copied from input + discValue)
-        proc.tfMaker = manager.TreeMaker(group_labels[procs.index(proc)]+'.root',\
-                                         "EcalVeto",\
-                                         branches_info,\
-                                         outlist[procs.index(proc)]
-                                         )
+        # Make an output file and new tree (copied from input + discValue, or the friend)
+        proc.friend = friend
+        if friend:
+            proc.tfMaker = manager.TreeMaker(group_labels[procs.index(proc)]+'.root',\
+                                             manager.friend_tree_name,\
+                                             dict(out_info),\
+                                             outlist[procs.index(proc)]
+                                             )
+        else:
+            proc.tfMaker = manager.TreeMaker(group_labels[procs.index(proc)]+'.root',\
+                                             "EcalVeto",\
+                                             branches_info,\
+                                             outlist[procs.index(proc)]
+                                             )
 
         # RUN
         proc.extrafs = [ proc.tfMaker.wq ] # Gets executed at the end of run()
@@ -129,74 +206,26 @@ def main():
 
 def event_process(self):
 
-    # Feature list from input tree
-    # Exp: feats = [ feat_value for feat_value in self.tree~ ]
-    # Put all segmentation variables in for now (Take out the ones we won't need once
-    # we make sure that all the python bdt stuff works)
-    feats = [
-            # Base variables
-            self.tree.nReadoutHits              ,
-            self.tree.summedDet                 ,
-            self.tree.summedTightIso            ,
-            self.tree.maxCellDep                ,
-            self.tree.showerRMS                 ,
-            self.tree.xStd                      ,
-            self.tree.yStd                      ,
-            self.tree.avgLayerHit               ,
-            self.tree.stdLayerHit               ,
-            self.tree.deepestLayerHit           ,
-            self.tree.ecalBackEnergy            ,
-            # MIP Tracking variables
-            self.tree.straight4                 ,
-            self.tree.firstNearPhLayer          ,
-            self.tree.nNearPhHits               ,
-            self.tree.photonTerritoryHits       ,
-            self.tree.epSep                     ,
-            self.tree.epDot                     ,
-           
-            # Longitudinal segment variables
-            self.tree.energy_s1                 ,
-            self.tree.xMean_s1                  ,
-            self.tree.yMean_s1                  ,
-            self.tree.layerMean_s1              ,
-            self.tree.energy_s2                 ,
-            self.tree.yMean_s3                  ,
-            # Electron RoC variables
-            self.tree.eContEnergy_x1_s1         ,
-            self.tree.eContEnergy_x2_s1         ,
-            self.tree.eContYMean_x1_s1          ,
-            self.tree.eContEnergy_x1_s2         ,
-            self.tree.eContEnergy_x2_s2         ,
-            self.tree.eContYMean_x1_s2          ,
-            # Photon RoC variables
-            self.tree.gContNHits_x1_s1          ,
-            self.tree.gContYMean_x1_s1          ,
-            self.tree.gContNHits_x1_s2          ,
-            # Outside RoC variables
-            self.tree.oContEnergy_x1_s1         ,
-            self.tree.oContEnergy_x2_s1         ,
-            self.tree.oContEnergy_x3_s1         ,
-            self.tree.oContNHits_x1_s1          ,
-            self.tree.oContXMean_x1_s1          ,
-            self.tree.oContYMean_x1_s1          ,
-            self.tree.oContYMean_x2_s1          ,
-            self.tree.oContYStd_x1_s1           ,
-            self.tree.oContEnergy_x1_s2         ,
-            self.tree.oContEnergy_x2_s2         ,
-            self.tree.oContEnergy_x3_s2         ,
-            self.tree.oContLayerMean_x1_s2      ,
-            self.tree.oContLayerStd_x1_s2       ,
-            self.tree.oContEnergy_x1_s3         ,
-            self.tree.oContLayerMean_x1_s3      ,
-            ]
+    # Feature list from input tree, in the order of bdt_features
+    feats = [getattr(self.tree, feat) for feat in bdt_features]
+
+    # Prediction
+    evtarray = np.array([feats])
+    pred = float(model.score(evtarray)[0])
+
+    # Friend tree: where the event is in the inputs, and the prediction
+    if self.friend:
+        self.tfMaker.branches['fileIndex'][0] = self.file_index
+        self.tfMaker.branches['fileEntry'][0] = self.file_entry
+        self.tfMaker.branches['discValue_EcalVeto'][0] = pred
+        self.tfMaker.tree.Fill()
+        return
 
     # Copy input tree feats to new tree
     for feat_name, feat_value in zip(self.tfMaker.branches_info, feats):
         self.tfMaker.branches[feat_name][0] = feat_value
 
     # Add prediction to new tree
-    evtarray = np.array([feats])
-    pred = float(model.predict(xgb.DMatrix(evtarray))[0])
     self.tfMaker.branches['discValue_EcalVeto'][0] = pred
     #self.tfMaker.branches['epAng'][0] = self.tree.epAng
     self.tfMaker.branches['HCalVeto_passesVeto'][0] = self.tree.HCalVeto_passesVeto
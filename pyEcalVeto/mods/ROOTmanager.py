@@ -1,5 +1,9 @@
 import os
 import sys
+import time
+import zlib
+import hashlib
+import threading
 import ROOT as r
 import numpy as np # ?
 
@@ -38,6 +42,155 @@ lineStyles = {
 lineStyle_list = [i for i in range(1,11)]
 
 
+# Members ColumnarTreeProcess reads for each ldmx class (unless addBranch is given members=)
+ecalHit_members = ['id_', 'amplitude_', 'energy_', 'time_', 'xpos_', 'ypos_', 'zpos_', 'isNoise_']
+ldmx_members = {
+        'EcalHit': ecalHit_members,
+        'HcalHit': ecalHit_members + ['pe_', 'minpe_', 'section_', 'layer_', 'strip_', 'end_', 'isADC_'],
+        'SimTrackerHit': ['id_', 'layerID_', 'moduleID_', 'edep_', 'time_', 'px_', 'py_', 'pz_',
+                          'energy_', 'x_', 'y_', 'z_', 'pathLength_', 'trackID_', 'pdgID_'],
+        'EcalVetoResult': ['passesVeto_', 'nReadoutHits_', 'deepestLayerHit_', 'summedDet_',
+                           'summedTightIso_', 'maxCellDep_', 'showerRMS_', 'xStd_', 'yStd_',
+                           'avgLayerHit_', 'stdLayerHit_', 'ecalBackEnergy_', 'nStraightTracks_',
+                           'nLinregTracks_', 'firstNearPhLayer_', 'epAng_', 'epSep_',
+                           'electronContainmentEnergy_', 'photonContainmentEnergy_',
+                           'outsideContainmentEnergy_', 'outsideContainmentNHits_',
+                           'outsideContainmentXStd_', 'outsideContainmentYStd_', 'discValue_',
+                           'recoilPx_', 'recoilPy_', 'recoilPz_', 'recoilX_', 'recoilY_'],
+        'HcalVetoResult': ['passesVeto_'],
+        'EventHeader': ['eventNumber_', 'run_', 'weight_']
+        }
+
+# Getters whose member isn't simply getFooBar() -> fooBar_ (tuples give 3-vectors)
+ldmx_getters = {
+        'getID': 'id_',
+        'getXPos': 'xpos_',
+        'getYPos': 'ypos_',
+        'getZPos': 'zpos_',
+        'isNoise': 'isNoise_',
+        'getPE': 'pe_',
+        'getMinPE': 'minpe_',
+        'getPosition': ('x_', 'y_', 'z_'),
+        'getMomentum': ('px_', 'py_', 'pz_'),
+        'getRecoilMomentum': ('recoilPx_', 'recoilPy_', 'recoilPz_'),
+        'getEPAng': 'epAng_',
+        'getEPSep': 'epSep_',
+        'getDisc': 'discValue_',
+        'passesVeto': 'passesVeto_'
+        }
+
+# ldmx classes stored as a single object per event (rather than a vector of them)
+ldmx_objects = ['EventHeader', 'EcalVetoResult', 'HcalVetoResult', 'TriggerResult']
+
+# Filesystem types counted as remote (worth staging inputs from); so is anything fuse
+network_fs = ['nfs', 'nfs4', 'cifs', 'smbfs', 'smb3', 'afs', 'lustre', 'gpfs', 'beegfs',
+              'ceph', 'glusterfs', 'panfs']
+
+
+# Tree written by the eval scripts with --friend (instead of a copy of the input + discValue):
+# just where each event is in the inputs (index of the file in the group, entry in that file,
+# whatever the staging) and the discriminator values, entry for entry with the input tree
+# (see attachFriend)
+friend_tree_name = 'EcalVetoDisc'
+friend_key_info = {
+        'fileIndex': {'rtype': int, 'default': -1},
+        'fileEntry': {'rtype': int, 'default': -1}
+        }
+
+# numpy types BufferedTreeMaker buffers values in
+bulk_dtypes = {'int': np.int32, 'double': np.float64, 'bool': np.uint8}
+
+# C++ side of BufferedTreeMaker:  fills a tree from numpy buffers of many events at once.
+# Vectors come as their elements for all events (content) plus where each event's start
+# (offsets); vectors of vectors/strings have a second level of offsets (inner) in between
+bulkFiller_code = '''
+#include <string>
+#include <vector>
+#include "TTree.h"
+
+namespace pyEcalVeto {
+
+template <typename T, typename S> struct FlatBuffer {
+    T* holder; const S* values;
+};
+template <typename T, typename S> struct VectorBuffer {
+    std::vector<T>* holder; const S* content; const long long* offsets;
+};
+template <typename T, typename S> struct VVBuffer {
+    std::vector<T>* holder; const S* content; const long long* inner; const long long* offsets;
+};
+
+class BulkFiller {
+  public:
+    explicit BulkFiller(TTree* tree) : tree_(tree) {}
+
+    void clear() {
+        flatInt_.clear(); flatDouble_.clear();
+        vectorInt_.clear(); vectorDouble_.clear(); vectorBool_.clear();
+        vvInt_.clear(); vvDouble_.clear(); vectorString_.clear();
+    }
+
+    void flatInt(int* holder, const int* values) { flatInt_.push_back({holder, values}); }
+    void flatDouble(double* holder, const double* values) { flatDouble_.push_back({holder, values}); }
+    void vectorInt(std::vector<int>* holder, const int* content, const long long* offsets) {
+        vectorInt_.push_back({holder, content, offsets});
+    }
+    void vectorDouble(std::vector<double>* holder, const double* content, const long long* offsets) {
+        vectorDouble_.push_back({holder, content, offsets});
+    }
+    void vectorBool(std::vector<bool>* holder, const unsigned char* content, const long long* offsets) {
+        vectorBool_.push_back({holder, content, offsets});
+    }
+    void vvInt(std::vector<std::vector<int> >* holder, const int* content, const long long* inner,
+               const long long* offsets) {
+        vvInt_.push_back({holder, content, inner, offsets});
+    }
+    void vvDouble(std::vector<std::vector<double> >* holder, const double* content, const long long* inner,
+                  const long long* offsets) {
+        vvDouble_.push_back({holder, content, inner, offsets});
+    }
+    void vectorString(std::vector<std::string>* holder, const char* content, const long long* inner,
+                      const long long* offsets) {
+        vectorString_.push_back({holder, content, inner, offsets});
+    }
+
+    // Set every branch to event i of the buffers and fill, for i < nEvents
+    void fill(long long nEvents) {
+        for (long long i = 0; i < nEvents; ++i) {
+            for (auto& b : flatInt_) *b.holder = b.values[i];
+            for (auto& b : flatDouble_) *b.holder = b.values[i];
+            for (auto& b : vectorInt_) b.holder->assign(b.content + b.offsets[i], b.content + b.offsets[i + 1]);
+            for (auto& b : vectorDouble_) b.holder->assign(b.content + b.offsets[i], b.content + b.offsets[i + 1]);
+            for (auto& b : vectorBool_) b.holder->assign(b.content + b.offsets[i], b.content + b.offsets[i + 1]);
+            for (auto& b : vvInt_) fillNested(b, i);
+            for (auto& b : vvDouble_) fillNested(b, i);
+            for (auto& b : vectorString_) fillNested(b, i);
+            tree_->Fill();
+        }
+    }
+
+  private:
+    template <typename B> void fillNested(B& b, long long i) {
+        b.holder->resize(b.offsets[i + 1] - b.offsets[i]);
+        for (long long k = b.offsets[i]; k < b.offsets[i + 1]; ++k) {
+            (*b.holder)[k - b.offsets[i]].assign(b.content + b.inner[k], b.content + b.inner[k + 1]);
+        }
+    }
+
+    TTree* tree_;
+    std::vector<FlatBuffer<int, int> > flatInt_;
+    std::vector<FlatBuffer<double, double> > flatDouble_;
+    std::vector<VectorBuffer<int, int> > vectorInt_;
+    std::vector<VectorBuffer<double, double> > vectorDouble_;
+    std::vector<VectorBuffer<bool, unsigned char> > vectorBool_;
+    std::vector<VVBuffer<std::vector<int>, int> > vvInt_;
+    std::vector<VVBuffer<std::vector<double>, double> > vvDouble_;
+    std::vector<VVBuffer<std::string, char> > vectorString_;
+};
+
+}
+'''
+
 ###################################
 # Classes
 ###################################
@@ -47,7 +200,8 @@ class TreeProcess:
     # For analysing .root samples
 
     def __init__(self, event_process, group=[], tree=None, tree_name = None, ID = '',\
-            color=1, strEvent=0, maxEvents=-1, pfreq=1000, batch=False, extrafs=None):
+            color=1, strEvent=0, maxEvents=-1, pfreq=1000, batch=False, extrafs=None,\
+            staging='copy', prefetch=1, verify='size'):
 
         print('\nPreparing {}'.format(ID))
 
@@ -62,37 +216,40 @@ class TreeProcess:
         self.pfreq = pfreq
         self.batch = batch
         self.extrafs = extrafs
+        self.staging = staging
+        self.stager = None
+        self.branch_addresses = {}
+        self.inputs = None
+        self.probe_events = 0
+        self.bytes_read = 0
+        self.profiler = None
+        self.feature_cache = None
+        self.file_base = 0
+        self.file_index = self.file_entry = 0
         self.cwd = os.getcwd()
         
         # Build tree amd move operations to a scratch directory
         # if providing group_files instead of a tree
+        # staging:  'copy' copies all inputs into it first, 'async' copies them in the background
+        # one file ahead (prefetch) of the one being processed (see FileStager), 'none' reads them in place
 
         self.mvd = False
-        if self.tree == None:
+        if self.tree == None and self.staging == 'async':
             self.mvd = True
+            self.mkTmpDir()
 
-            # Create the scratch directory if it doesn't already exist
-            scratch_dir = self.cwd + '/scratch'
-            print( 'Using scratch path %s' % scratch_dir )
-            if not os.path.exists(scratch_dir):
-                os.makedirs(scratch_dir)
-
-            # Get tmp num
-            num=0; check = True
-            while check:
-                if os.path.exists( scratch_dir+'/tmp_'+str(num) ):
-                    num += 1
-                else:
-                    check = False 
+            # The tree is loaded one file at a time in run(), as files are staged
+            self.stager = FileStager(self.group_files, self.tmp_dir, prefetch=prefetch, verify=verify)
+            self.stager.start()
 
-            # Create and mv into tmp directory that can be used to copy files into
-            if self.batch:
-                self.tmp_dir='%s/%s' % (scratch_dir, os.environ['SLURM_JOBID']) # LSB_JOBID
-            else:
-                self.tmp_dir = '%s/%s' % (scratch_dir, 'tmp_'+str(num))
-            if not os.path.exists(self.tmp_dir):
-                print( 'Creating tmp directory %s' % self.tmp_dir )
-            os.makedirs(self.tmp_dir)
+        elif self.tree == None and self.staging == 'none':
+            self.mvd = True
+            self.mkTmpDir()
+            self.tree = self.loadTree([os.path.abspath(f) for f in self.group_files])
+
+        elif self.tree == None:
+            self.mvd = True
+            self.mkTmpDir()
             os.chdir(self.tmp_dir)
     
             # Copy input files to the tmp directory
@@ -105,19 +262,52 @@ class TreeProcess:
             tmpfiles = [f.split('/')[-1] for f in self.group_files]
     
             # Load'em
-            if self.tree_name != None:
-                self.tree = load(tmpfiles, self.tree_name)
-            else:
-                self.tree = load(tmpfiles)
+            self.tree = self.loadTree(tmpfiles)
 
             # Move back to cwd in case running multiple procs
             os.chdir(self.cwd)
 
+    def mkTmpDir(self):
+
+        # Create (but don't move into) a tmp directory under ./scratch for this process
+
+        # Create the scratch directory if it doesn't already exist
+        scratch_dir = self.cwd + '/scratch'
+        print( 'Using scratch path %s' % scratch_dir )
+        if not os.path.exists(scratch_dir):
+            os.makedirs(scratch_dir)
+
+        # Get tmp num
+        num=0; check = True
+        while check:
+            if os.path.exists( scratch_dir+'/tmp_'+str(num) ):
+                num += 1
+            else:
+                check = False 
+
+        # Create tmp directory that can be used to copy files into
+        if self.batch:
+            self.tmp_dir='%s/%s' % (scratch_dir, os.environ['SLURM_JOBID']) # LSB_JOBID
+        else:
+            self.tmp_dir = '%s/%s' % (scratch_dir, 'tmp_'+str(num))
+        if not os.path.exists(self.tmp_dir):
+            print( 'Creating tmp directory %s' % self.tmp_dir )
+        os.makedirs(self.tmp_dir)
+
+    def loadTree(self, files):
+
+        # Chain the given files with this process's tree name
+
+        if self.tree_name != None:
+            return load(files, self.tree_name)
+        else:
+            return load(files)
+
     def addBranch(self, ldmx_class, branch_name):
 
         # Add a new branch to read from
 
-        if self.tree == None:
+        if self.tree == None and self.stager == None:
             sys.exit('Set tree')
 
         if ldmx_class == 'EventHeader': branch = r.ldmx.EventHeader()
@@ -127,9 +317,107 @@ class TreeProcess:
         elif ldmx_class == 'SimParticle': branch = r.map(int, 'ldmx::'+ldmx_class)()
         else: branch = r.std.vector('ldmx::'+ldmx_class)()
 
-        self.tree.SetBranchAddress(branch_name,r.AddressOf(branch))
+        # Kept to set again for every file when staging asynchronously
+        self.branch_addresses[branch_name] = branch
+        if self.tree != None:
+            self.tree.SetBranchAddress(branch_name,r.AddressOf(branch))
 
         return branch
+
+    def declareInputs(self, inputs={}, probe=100):
+
+        # Declare what event_process uses, so nothing else gets read:  only the branches given
+        # to addBranch plus those in inputs are enabled, and for the ones in inputs only the
+        # listed members ({branch_name: ['energy_', 'xpos_', ...]}, or None for all of them).
+        # The bytes read per event with and without this are compared over the first probe events
+
+        self.inputs = dict(inputs)
+        self.probe_events = probe
+
+    def pruneBranches(self, tree, probe=0):
+
+        # Disable all branches but the ones declared (see declareInputs)
+
+        if probe > 0:
+            before = bytesPerEvent(tree, probe)
+
+        tree.SetBranchStatus('*', 0)
+        for branch_name in set(self.branch_addresses) | set(self.inputs):
+            members = self.inputs.get(branch_name)
+            tree.SetBranchStatus(branch_name, 1)
+            if branch_name in self.branch_addresses or members != None:
+                tree.SetBranchStatus(branch_name + '.*', 1 if members == None else 0)
+            if members != None:
+                for member in members:
+                    tree.SetBranchStatus('{}.{}'.format(branch_name, member), 1)
+
+        if probe > 0:
+            after = bytesPerEvent(tree, probe)
+            print( 'Bytes read per event (first %s events): %.0f with all branches, %.0f with only'\
+                    ' the declared inputs (%.1f%%)' % (probe, before, after,
+                                                       100.*after/before if before > 0 else 0.) )
+    
+    def enableProfiling(self, path=None, hit_count=None):
+
+        # Time every event (see EventProfiler), writing the results to path (in the directory
+        # run from; default <ID>_profile.csv) and a summary next to it when done.
+        # hit_count(self) gives the number of hits in the current event, to see how time scales
+        # with it; event_process marks the end of each part of it to be timed with self.lap(name)
+
+        if path == None:
+            path = '%s_profile.csv' % self.ID
+        self.profiler = EventProfiler(os.path.join(self.cwd, path), hit_count)
+
+    def lap(self, name):
+
+        # Time since the last lap (or the start of the event) goes to section name when profiling
+
+        if self.profiler != None:
+            self.profiler.lap(name)
+
+    def enableFeatureCache(self, cache_dir, groups):
+
+        # Keep the features event_process computes in cache_dir, by input file and group
+        # ({group: {'version': n, 'feats': [names]}}, see FeatureCache), so a rerun only
+        # computes the groups it doesn't have yet for an event.  event_process asks for a group
+        # with cachedFeatures(group) and hands over what it computed with cacheFeatures(group, feats)
+
+        if len(self.group_files) == 0:
+            sys.exit('The feature cache needs the input files, not a tree')
+        self.feature_cache = FeatureCache(os.path.join(self.cwd, cache_dir), groups)
+
+    def cachedFeatures(self, group):
+
+        # Cached values of group's features for the current event, or None
+
+        if self.feature_cache == None:
+            return None
+        return self.feature_cache.get(self.group_files[self.file_index], self.file_entry, group)
+
+    def cacheFeatures(self, group, feats):
+
+        # Save group's features (taken from feats) for the current event
+
+        if self.feature_cache != None:
+            self.feature_cache.put(self.group_files[self.file_index], self.file_entry, group, feats)
+
+    def processEvent(self, entry):
+
+        # Read entry of the tree and run event_process on it
+
+        if self.profiler != None:
+            start = time.perf_counter()
+        self.bytes_read += self.tree.GetEntry(entry)
+        self.file_index = self.file_base + self.tree.GetTreeNumber()
+        # Entry in the file (GetChainOffset() is only set on the loaded sub-tree, not the chain)
+        self.file_entry = self.tree.GetTree().GetReadEntry()
+        if self.event_count%self.pfreq == 0:
+            print('Processing Event: %s'%(self.event_count))
+        if self.profiler != None:
+            self.profiler.startEvent(time.perf_counter() - start)
+        self.event_process(self)
+        if self.profiler != None:
+            self.profiler.endEvent(self)
     
     def task(self, j):
         self.tree.GetEntry(j)
@@ -143,19 +431,77 @@ class TreeProcess:
 
         if strEvent != 0: self.strEvent = strEvent
         if maxEvents != -1: self.maxEvents = maxEvents
+        if pfreq != 1000: self.pfreq = pfreq
+
+        if self.stager != None:
+            self.runStaged()
+            return
+
         if self.maxEvents == -1 or self.strEvent + self.maxEvents > self.tree.GetEntries():
             self.maxEvents = self.tree.GetEntries() - self.strEvent
         maxEvent = self.strEvent + self.maxEvents
-        if pfreq != 1000: self.pfreq = pfreq
+
+        if self.inputs != None:
+            self.pruneBranches(self.tree, self.probe_events)
 
         self.event_count = self.strEvent
         while self.event_count < maxEvent:
-            self.tree.GetEntry(self.event_count)
-            if self.event_count%self.pfreq == 0:
-                print('Processing Event: %s'%(self.event_count))
-            self.event_process(self)
+            self.processEvent(self.event_count)
             self.event_count += 1
 
+        self.close()
+
+    def runStaged(self):
+
+        # Event loop for staging='async':  one file at a time, as the stager makes them available,
+        # handing each back to be deleted once done with.  The total number of events isn't known
+        # up front, so maxEvents is only a cap
+
+        maxEvent = self.strEvent + self.maxEvents if self.maxEvents != -1 else float('inf')
+
+        self.event_count = self.strEvent
+        first = 0
+        for i in range(len(self.group_files)):
+            if first >= maxEvent: break
+
+            self.tree = self.loadTree([self.stager.get(i)])
+            self.file_base = i
+            for branch_name in self.branch_addresses:
+                self.tree.SetBranchAddress(branch_name,r.AddressOf(self.branch_addresses[branch_name]))
+            if self.inputs != None:
+                self.pruneBranches(self.tree, self.probe_events if i == 0 else 0)
+            last = min(maxEvent, first + self.tree.GetEntries())
+
+            self.event_count = max(self.event_count, first)
+            while self.event_count < last:
+                self.processEvent(self.event_count - first)
+                self.event_count += 1
+
+            first += self.tree.GetEntries()
+
+            # Close the file before its staged copy is deleted
+            self.tree = None
+            self.stager.release(i)
+
+        self.maxEvents = max(self.event_count - self.strEvent, 0)
+
+        self.close()
+
+    def close(self):
+
+        # Stop staging and delete any staged files left
+        if self.stager != None:
+            self.stager.stop()
+
+        if self.inputs != None and self.maxEvents > 0:
+            print( 'Read %.0f bytes per event' % (float(self.bytes_read)/self.maxEvents) )
+
+        if self.profiler != None:
+            self.profiler.write()
+
+        if self.feature_cache != None:
+            self.feature_cache.close()
+
         # Execute any closing function(s) (might impliment *args, **kwargs later)
         if self.extrafs != None:
             for extraf in self.extrafs:
@@ -169,6 +515,624 @@ class TreeProcess:
             print( 'Removing tmp directory %s' % self.tmp_dir )
             os.system('rm -rf %s' % self.tmp_dir)
 
+class FileStager:
+
+    # Copies input files into dest_dir in a background thread, at most prefetch files ahead of
+    # the one being processed, so copying overlaps with processing rather than all happening
+    # before it.  get(i) waits for file i and gives the path to read it from; release(i) deletes
+    # the copy once it's been processed.  Copies are checked against the original's size (and
+    # adler32 checksum with verify='checksum').  Files on a local disk (see isLocal) and URLs
+    # (root://...) are read in place.
+
+    def __init__(self, files, dest_dir, prefetch=1, verify='size', skip_local=True, retries=2,\
+            buffer_size=16*1024*1024):
+
+        self.files = list(files)
+        self.dest_dir = dest_dir
+        self.verify = verify
+        self.skip_local = skip_local
+        self.retries = retries
+        self.buffer_size = buffer_size
+
+        self.paths = [None]*len(self.files)
+        self.errors = [None]*len(self.files)
+        self.staged = [False]*len(self.files)
+        self.ready = [threading.Event() for f in self.files]
+
+        # One slot for the file being processed plus prefetch for the ones being copied
+        self.slots = threading.Semaphore(prefetch + 1)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.stage, name='FileStager')
+        self.thread.daemon = True
+
+    def start(self):
+        self.thread.start()
+
+    def stage(self):
+
+        # Runs in the background thread
+
+        for i, rfilename in enumerate(self.files):
+
+            if self.skip_local and (rfilename.find('://') >= 0 or isLocal(rfilename)):
+                self.paths[i] = rfilename
+                self.ready[i].set()
+                continue
+
+            # Wait for a free slot, i.e. for an earlier file to be released
+            while not self.slots.acquire(timeout=1):
+                if self.stopped.is_set(): return
+            if self.stopped.is_set():
+                self.slots.release()
+                return
+
+            staged = '%s/%s' % (self.dest_dir, rfilename.split('/')[-1])
+            for attempt in range(self.retries + 1):
+                try:
+                    self.copy(rfilename, staged)
+                    self.paths[i] = staged
+                    self.staged[i] = True
+                    break
+                except (IOError, OSError) as e:
+                    self.errors[i] = e
+                    print( 'Staging %s failed (%s)%s' % (rfilename, e,
+                                ', retrying' if attempt < self.retries else '') )
+
+            if not self.staged[i]:
+                if os.path.exists(staged): os.remove(staged)
+                self.slots.release()
+            self.ready[i].set()
+
+    def copy(self, src, dst):
+
+        # Copy src to dst, checking the copy
+
+        checksum = adler32(None)
+        with open(src, 'rb') as fin:
+            with open(dst, 'wb') as fout:
+                buf = fin.read(self.buffer_size)
+                while buf:
+                    fout.write(buf)
+                    if self.verify == 'checksum':
+                        checksum = zlib.adler32(buf, checksum)
+                    buf = fin.read(self.buffer_size)
+
+        if os.path.getsize(dst) != os.path.getsize(src):
+            raise IOError('size of copy %s differs from the original' % dst)
+        if self.verify == 'checksum' and adler32(dst) != checksum:
+            raise IOError('checksum of copy %s differs from the original' % dst)
+
+    def get(self, i):
+
+        # Path to read file i from, once staged
+
+        self.ready[i].wait()
+        if self.paths[i] == None:
+            sys.exit('Could not stage %s: %s' % (self.files[i], self.errors[i]))
+
+        return self.paths[i]
+
+    def release(self, i):
+
+        # Done with file i:  delete its copy to make room for the next one
+
+        if self.staged[i]:
+            os.remove(self.paths[i])
+            self.staged[i] = False
+            self.slots.release()
+
+    def stop(self):
+
+        # Stop staging (e.g. after maxEvents) and delete what's left
+
+        self.stopped.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        for i in range(len(self.files)):
+            self.release(i)
+
+class ColumnarTreeProcess(TreeProcess):
+
+    # Alternative to TreeProcess that reads only the branches (and members of them) requested
+    # with addBranch, a chunk of events at a time, as awkward arrays through uproot.
+    # Input files are read in place, or with staging='async' copied into the tmp directory as
+    # they're needed (see FileStager).
+    #
+    # event_process(self) sees the same interface as with TreeProcess:  addBranch returns an
+    # object whose getters (or, for vectors of hits, whose hits' getters) give the values for
+    # the current event, so existing feature code runs unchanged.
+    # Code being migrated to work on whole chunks can use self.chunk instead
+    # ({branch_name: {member: awkward array}}, with self.chunk_entry the current event's index
+    # in it), typically from chunk_process(self), which is called once before each chunk's events.
+
+    def __init__(self, event_process, group=[], tree_name='LDMX_Events', ID='',\
+            color=1, strEvent=0, maxEvents=-1, pfreq=1000, batch=False, extrafs=None,\
+            chunk_size=1000, chunk_process=None, staging='none', prefetch=1, verify='size'):
+
+        print('\nPreparing {} (columnar)'.format(ID))
+
+        self.event_process = event_process
+        self.group_files = [os.path.abspath(f) for f in group]
+        self.tree = None
+        self.tree_name = tree_name if tree_name != None else 'LDMX_Events'
+        self.ID = ID
+        self.color = color
+        self.strEvent = strEvent
+        self.maxEvents = maxEvents
+        self.pfreq = pfreq
+        self.batch = batch
+        self.extrafs = extrafs
+        self.chunk_size = chunk_size
+        self.chunk_process = chunk_process
+        self.staging = staging
+        self.stager = None
+        self.cwd = os.getcwd()
+
+        self.branches = {}
+        self.inputs = None
+        self.bytes_read = 0
+        self.profiler = None
+        self.feature_cache = None
+        self.file_index = self.file_entry = 0
+        self.chunk = {}
+        self.chunk_entry = 0
+
+        # Output is written in a tmp directory like TreeProcess, even if nothing gets copied there
+        self.mvd = True
+        self.mkTmpDir()
+
+        if self.staging == 'async':
+            self.stager = FileStager(self.group_files, self.tmp_dir, prefetch=prefetch, verify=verify)
+            self.stager.start()
+        elif self.staging != 'none':
+            sys.exit('ColumnarTreeProcess staging must be none or async')
+
+    def addBranch(self, ldmx_class, branch_name, members=None):
+
+        # Add a new branch to read from
+        # members: names of the data members to read (e.g. ['energy_', 'xpos_']);
+        # defaults to those in ldmx_members, skipping any the input doesn't have
+
+        if members == None:
+            if not ldmx_class in ldmx_members:
+                sys.exit('Give the members of {} to read for {}'.format(ldmx_class, branch_name))
+            branch = ColumnarBranch(ldmx_class, branch_name, ldmx_members[ldmx_class], False)
+        else:
+            branch = ColumnarBranch(ldmx_class, branch_name, members, True)
+
+        self.branches[branch_name] = branch
+
+        return branch
+
+    def branchPaths(self, tree):
+
+        # uproot paths of the requested members:  vectors of objects are split into
+        # branch_name/branch_name.member_, single objects into branch_name/member_
+        # Members declared with declareInputs take the place of those given to addBranch
+
+        keys = set(tree.keys())
+        paths = {}
+        for branch_name in self.branches:
+            branch = self.branches[branch_name]
+            if self.inputs != None and self.inputs.get(branch_name) != None:
+                branch.members = list(self.inputs[branch_name])
+                branch.explicit = True
+            for member in branch.members:
+                for path in ('{0}/{0}.{1}'.format(branch_name, member),\
+                             '{0}/{1}'.format(branch_name, member)):
+                    if path in keys:
+                        paths[(branch_name, member)] = path
+                        break
+                else:
+                    if branch.explicit:
+                        sys.exit('{} has no member {} in {}'.format(branch_name, member, tree.file.file_path))
+
+        return paths
+
+    def run(self, strEvent=0, maxEvents=-1, pfreq=1000):
+
+        # Process events
+
+        import uproot
+
+        # Event counts per file, to turn the range of events into a range in each file
+        nEntries = []
+        for rfilename in self.group_files:
+            with uproot.open(rfilename) as rfile:
+                nEntries.append(rfile[self.tree_name].num_entries)
+
+        if strEvent != 0: self.strEvent = strEvent
+        if maxEvents != -1: self.maxEvents = maxEvents
+        if self.maxEvents == -1 or self.strEvent + self.maxEvents > sum(nEntries):
+            self.maxEvents = sum(nEntries) - self.strEvent
+        maxEvent = self.strEvent + self.maxEvents
+        if pfreq != 1000: self.pfreq = pfreq
+
+        self.event_count = self.strEvent
+        first = 0
+        for i, (rfilename, n) in enumerate(zip(self.group_files, nEntries)):
+            if first >= maxEvent: break
+            start = max(self.strEvent - first, 0)
+            stop = min(maxEvent - first, n)
+            first += n
+            if start >= stop:
+                # Before strEvent; staged files still have to be handed back in order
+                if self.stager != None:
+                    self.stager.get(i)
+                    self.stager.release(i)
+                continue
+
+            if self.stager != None:
+                rfilename = self.stager.get(i)
+
+            with uproot.open(rfilename) as rfile:
+                tree = rfile[self.tree_name]
+                paths = self.branchPaths(tree)
+
+                for chunk_start in range(start, stop, self.chunk_size):
+                    chunk_stop = min(chunk_start + self.chunk_size, stop)
+                    read_start = time.perf_counter()
+                    arrays = tree.arrays(list(paths.values()),
+                                         entry_start=chunk_start, entry_stop=chunk_stop)
+                    for path in paths.values():
+                        self.bytes_read += basketBytes(tree[path], chunk_start, chunk_stop)
+
+                    self.chunk = dict((branch_name, {}) for branch_name in self.branches)
+                    for (branch_name, member), path in paths.items():
+                        self.chunk[branch_name][member] = arrays[path]
+                    for branch_name in self.branches:
+                        self.branches[branch_name].load(self.chunk[branch_name])
+
+                    if self.chunk_process != None:
+                        self.chunk_process(self)
+
+                    # Reading (and chunk_process) time is shared out evenly over the chunk's events
+                    read_time = (time.perf_counter() - read_start)/(chunk_stop - chunk_start)
+
+                    self.file_index = i
+                    for j in range(chunk_stop - chunk_start):
+                        self.chunk_entry = j
+                        self.file_entry = chunk_start + j
+                        for branch in self.branches.values():
+                            branch.setEntry(j)
+                        if self.event_count%self.pfreq == 0:
+                            print('Processing Event: %s'%(self.event_count))
+                        if self.profiler != None:
+                            self.profiler.startEvent(read_time)
+                        self.event_process(self)
+                        if self.profiler != None:
+                            self.profiler.endEvent(self)
+                        self.event_count += 1
+
+            if self.stager != None:
+                self.stager.release(i)
+
+        if self.maxEvents > 0:
+            print( 'Read %.0f bytes (compressed) per event' % (float(self.bytes_read)/self.maxEvents) )
+
+        self.close()
+
+class ColumnarBranch:
+
+    # Stands in for what TreeProcess.addBranch returns, for a chunk read by ColumnarTreeProcess:
+    # a single object (EcalVetoResult, ...) with its getters, or a vector of hits that can be
+    # iterated over/indexed/size()d.  Values are those of the event set by setEntry
+
+    def __init__(self, ldmx_class, branch_name, members, explicit):
+
+        self.ldmx_class = ldmx_class
+        self.branch_name = branch_name
+        self.members = list(members)
+        self.explicit = explicit
+        self.is_object = ldmx_class in ldmx_objects
+
+        self.values = {}  # member: flat numpy array for the chunk
+        self.offsets = {} # member: where each event starts in values (vector members)
+        self.nested = {}  # member: awkward array (vectors of vectors, read per event)
+        self.entry = 0
+        self.start = self.stop = 0
+
+    def load(self, arrays):
+
+        # Take a new chunk ({member: awkward array}); floats and ints are widened to 64 bits so
+        # values behave like the python floats/ints PyROOT gives
+
+        import awkward as ak
+
+        self.values, self.offsets, self.nested = {}, {}, {}
+        for member in arrays:
+            array = arrays[member]
+            if array.ndim > 2:
+                self.nested[member] = array
+                continue
+            if array.ndim == 2:
+                self.offsets[member] = np.concatenate(([0], np.cumsum(ak.to_numpy(ak.num(array, axis=1)))))
+                array = ak.flatten(array, axis=1)
+            array = ak.to_numpy(array)
+            if array.dtype.kind == 'f': array = array.astype(np.float64)
+            elif array.dtype.kind in 'iu': array = array.astype(np.int64)
+            self.values[member] = array
+
+    def setEntry(self, i):
+
+        # Point at event i of the chunk
+
+        self.entry = i
+        if not self.is_object and len(self.offsets) > 0:
+            offsets = next(iter(self.offsets.values()))
+            self.start, self.stop = offsets[i], offsets[i + 1]
+
+    def value(self, member, k=None):
+
+        # Value of a member for hit k of the chunk, or for the current event if a single object
+
+        if member in self.nested:
+            return self.nested[member][self.entry].tolist()
+        if not member in self.values:
+            raise AttributeError('{} member {} was not read'.format(self.branch_name, member))
+        if k != None:
+            return self.values[member][k]
+        if member in self.offsets:
+            offsets = self.offsets[member]
+            return self.values[member][offsets[self.entry]:offsets[self.entry + 1]].tolist()
+        return self.values[member][self.entry]
+
+    # Single objects
+    def __getattr__(self, name):
+        if name.startswith('__') or self.__dict__.get('is_object') != True:
+            raise AttributeError(name)
+        return columnarGetter(name, self.value)
+
+    # Vectors of hits
+    def size(self):
+        return self.stop - self.start
+
+    def __len__(self):
+        return self.size()
+
+    def __getitem__(self, j):
+        if j < 0: j += self.size()
+        if j < 0 or j >= self.size():
+            raise IndexError('{} index out of range'.format(self.branch_name))
+        return ColumnarHit(self, self.start + j)
+
+    def __iter__(self):
+        for k in range(self.start, self.stop):
+            yield ColumnarHit(self, k)
+
+class ColumnarHit:
+
+    # A hit in a ColumnarBranch, with the usual ldmx getters
+
+    __slots__ = ('branch', 'k')
+
+    def __init__(self, branch, k):
+        self.branch = branch
+        self.k = k
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return columnarGetter(name, lambda member: self.branch.value(member, self.k))
+
+class EventProfiler:
+
+    # Per-event wall time for TreeProcess.run, split into reading the event, the sections
+    # event_process marks with lap(name) and whatever comes after the last lap ('other'),
+    # along with the event's hit count.  write() saves one row per event as a csv file and a
+    # summary (throughput, tail latencies, time per section, time vs. hit count) next to it
+
+    def __init__(self, path, hit_count=None):
+
+        self.path = path
+        self.hit_count = hit_count
+
+        self.events = []
+        self.hits = []
+        self.read = []
+        self.total = []
+        self.sections = {} # name: time in each event (in order of first use)
+        self.section_names = []
+
+        self.current = {}
+        self.read_time = 0.
+        self.t_first = self.t_start = self.t_last = self.t_end = None
+
+    def startEvent(self, read_time):
+        self.current = {}
+        self.read_time = read_time
+        self.t_start = self.t_last = time.perf_counter()
+        if self.t_first == None:
+            self.t_first = self.t_start - read_time
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self.current[name] = self.current.get(name, 0.) + now - self.t_last
+        self.t_last = now
+
+    def endEvent(self, proc):
+
+        now = time.perf_counter()
+        self.current['other'] = self.current.get('other', 0.) + now - self.t_last
+
+        for name in self.current:
+            if not name in self.sections:
+                self.sections[name] = [0.]*len(self.events)
+                self.section_names.append(name)
+        for name in self.section_names:
+            self.sections[name].append(self.current.get(name, 0.))
+
+        self.events.append(proc.event_count)
+        self.hits.append(self.hit_count(proc) if self.hit_count != None else -1)
+        self.read.append(self.read_time)
+        self.total.append(self.read_time + now - self.t_start)
+        self.t_end = now
+
+    def write(self):
+
+        if len(self.events) == 0:
+            return
+
+        # 'other' goes last
+        names = [name for name in self.section_names if name != 'other'] + ['other']
+        columns = [self.events, self.hits, self.total, self.read] + [self.sections[name] for name in names]
+        np.savetxt(self.path, np.transpose(np.array(columns, dtype=float)), delimiter=',',
+                   fmt=['%d', '%d'] + ['%.6g']*(len(columns) - 2),
+                   header=','.join(['event', 'hits', 'total', 'read'] + names), comments='')
+        print( 'Wrote per-event timing to %s' % self.path )
+
+        summary = self.summary(names)
+        print( '\n'.join(summary) )
+        with open(os.path.splitext(self.path)[0] + '_summary.txt', 'w') as f:
+            f.write('\n'.join(summary) + '\n')
+
+    def summary(self, names):
+
+        total = np.array(self.total)*1000. # ms
+        hits = np.array(self.hits)
+        n = len(total)
+        wall = self.t_end - self.t_first
+
+        lines = ['Profile of %d events:' % n,
+                 '  throughput: %.1f events/s (%.1f s wall time, %.1f s in events)' % (n/wall, wall, total.sum()/1000.),
+                 '  time per event [ms]:  mean %.2f, p50 %.2f, p90 %.2f, p99 %.2f, p99.9 %.2f, max %.2f' % (
+                    total.mean(), np.percentile(total, 50), np.percentile(total, 90),
+                    np.percentile(total, 99), np.percentile(total, 99.9), total.max()),
+                 '  time per section [ms/event]:']
+        for name, times in [('read', self.read)] + [(name, self.sections[name]) for name in names]:
+            times = np.array(times)*1000.
+            lines.append('    %-16s mean %8.3f  p99 %8.3f  (%4.1f%%)' % (
+                name, times.mean(), np.percentile(times, 99), 100.*times.sum()/total.sum()))
+
+        # Scaling with hit count:  linear fit, power law exponent and the time in hit count quantiles
+        if self.hit_count != None and len(np.unique(hits)) > 1:
+            slope, intercept = np.polyfit(hits, total, 1)
+            lines.append('  time vs. hits:  %.2f ms + %.4f ms/hit' % (intercept, slope))
+            positive = (hits > 0) & (total > 0)
+            if len(np.unique(hits[positive])) > 1:
+                exponent = np.polyfit(np.log(hits[positive]), np.log(total[positive]), 1)[0]
+                lines.append('                  time ~ hits^%.2f' % exponent)
+            edges = np.unique(np.percentile(hits, np.linspace(0, 100, 11)))
+            lines.append('    %-15s %8s %10s %10s %10s' % ('hits', 'events', 'mean [ms]', 'p99 [ms]', 'ms/hit'))
+            for i in range(len(edges) - 1):
+                inbin = (hits >= edges[i]) & ((hits < edges[i + 1]) if i < len(edges) - 2 else (hits <= edges[i + 1]))
+                if inbin.sum() == 0: continue
+                lines.append('    %-15s %8d %10.2f %10.2f %10.4f' % (
+                    '%d-%d' % (edges[i], edges[i + 1]), inbin.sum(), total[inbin].mean(),
+                    np.percentile(total[inbin], 99), total[inbin].sum()/max(hits[inbin].sum(), 1)))
+
+        return lines
+
+class FeatureCache:
+
+    # Feature values computed for each event, saved by input file (see fileID) and feature group
+    # in cache_dir/<file id>/<group>_v<version>_<feature names hash>_e<entry_version>.npz, with
+    # the entries (in that file) they belong to.  A group's values are only used with the same version and features, so bumping
+    # a group's version (or changing its features) has it recomputed while the others are reused.
+    # Only flat (int/float) features can be cached
+
+    # Bumped when what the entries mean changes:  caches written before 2 could hold entries of
+    # the whole chain rather than of the file, so they're not read
+    entry_version = 2
+
+    def __init__(self, cache_dir, groups):
+
+        self.cache_dir = cache_dir
+        self.groups = groups
+
+        self.path = None
+        self.loaded = {} # group: ({entry: row}, {feat: array}) on disk for the current file
+        self.new = {}    # group: {entry: [values]} computed since it was loaded
+        self.hits = dict((group, 0) for group in groups)
+        self.misses = dict((group, 0) for group in groups)
+
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+    def groupPath(self, path, group):
+        feats = ','.join(self.groups[group]['feats'])
+        return os.path.join(self.cache_dir, fileID(path), '%s_v%s_%s_e%d.npz' % (
+            group, self.groups[group]['version'], hashlib.sha1(feats.encode()).hexdigest()[:8],
+            FeatureCache.entry_version))
+
+    def readGroup(self, path, group):
+
+        # ({entry: row}, {feat: array}) saved for group of file path (empty if nothing is)
+
+        gpath = self.groupPath(path, group)
+        if not os.path.exists(gpath):
+            return {}, {}
+        with np.load(gpath) as saved:
+            values = dict((feat, saved[feat]) for feat in self.groups[group]['feats'])
+            rows = dict((entry, row) for row, entry in enumerate(saved['entries'].tolist()))
+        return rows, values
+
+    def setFile(self, path):
+
+        # Switch to input file path, saving what was computed for the last one
+
+        if path == self.path:
+            return
+        self.save()
+        self.path = path
+        self.loaded = dict((group, self.readGroup(path, group)) for group in self.groups)
+        self.new = dict((group, {}) for group in self.groups)
+
+    def get(self, path, entry, group):
+
+        self.setFile(path)
+        rows, values = self.loaded[group]
+        if not entry in rows:
+            self.misses[group] += 1
+            return None
+        self.hits[group] += 1
+        row = rows[entry]
+        return dict((feat, values[feat][row].item()) for feat in self.groups[group]['feats'])
+
+    def put(self, path, entry, group, feats):
+        self.setFile(path)
+        self.new[group][entry] = [feats[feat] for feat in self.groups[group]['feats']]
+
+    def save(self):
+
+        # Write the current file's groups with new values, merged with what's on disk by then
+        # (another job may have cached other entries of the same file)
+
+        if self.path == None:
+            return
+        for group in self.groups:
+            if len(self.new[group]) == 0:
+                continue
+            rows, values = self.readGroup(self.path, group)
+            feats = self.groups[group]['feats']
+            entries = sorted(set(rows) | set(self.new[group]))
+            columns = dict((feat, []) for feat in feats)
+            for entry in entries:
+                if entry in self.new[group]:
+                    row = self.new[group][entry]
+                    for k, feat in enumerate(feats):
+                        columns[feat].append(row[k])
+                else:
+                    for feat in feats:
+                        columns[feat].append(values[feat][rows[entry]])
+
+            gpath = self.groupPath(self.path, group)
+            if not os.path.exists(os.path.dirname(gpath)):
+                os.makedirs(os.path.dirname(gpath))
+            arrays = dict((feat, np.array(columns[feat])) for feat in feats)
+            arrays['entries'] = np.array(entries, dtype=np.int64)
+            tmp_path = '%s.tmp%d.npz' % (gpath[:-4], os.getpid())
+            np.savez(tmp_path, **arrays)
+            os.replace(tmp_path, gpath)
+            self.new[group] = {}
+
+    def close(self):
+
+        self.save()
+        for group in self.groups:
+            print( 'Feature group %s: %d events from the cache, %d computed' % (
+                group, self.hits[group], self.misses[group]) )
+
 class TreeMaker:
 
     # To write a tree in an analysis process
@@ -268,6 +1232,160 @@ class TreeMaker:
             print( 'cp %s %s' % (self.outfile,self.outdir) )
             os.system('cp %s %s' % (self.outfile,self.outdir))
 
+class BufferedTreeMaker(TreeMaker):
+
+    # TreeMaker that keeps branch values in numpy buffers for flush_every events and then fills
+    # the tree with all of them at once in C++ (see bulkFiller_code), instead of clearing and
+    # push_back-ing every element of every vector through PyROOT each event.
+    # Makes the same branches, with the same types, from the same branches_info.
+    # resetFeats gives a VectorFeat (a list) for each vector branch, so event code written for
+    # TreeMaker's std::vectors (clear(), push_back()) works unchanged; plain lists/arrays work too.
+
+    def __init__(self, outfile, tree_name, branches_info = {}, outdir='', flush_every=1000):
+
+        declareBulkFiller()
+
+        self.flush_every = flush_every
+        self.buffers = {}
+        self.n_buffered = 0
+
+        TreeMaker.__init__(self, outfile, tree_name, branches_info, outdir)
+
+        self.filler = r.pyEcalVeto.BulkFiller(self.tree)
+
+    def addBranch(self, rtype, default_value, branch_name):
+
+        # Add a new branch to write to
+
+        self.branches_info[branch_name] = {'rtype': rtype, 'default': default_value}
+        kind, ctype = branchKind(rtype)
+        if kind == None:
+            return
+        if kind == 'flat':
+            self.branches[branch_name] = np.zeros(1, dtype=bulk_dtypes[ctype])
+            leaf_type = '/D' if ctype == 'double' else '/I'
+            self.tree.Branch(branch_name, self.branches[branch_name], branch_name + leaf_type)
+        else:
+            if kind == 'vv':
+                self.branches[branch_name] = r.std.vector('std::vector<%s>' % ctype)()
+            else:
+                self.branches[branch_name] = r.std.vector(ctype)()
+            self.tree.Branch(branch_name, self.branches[branch_name])
+        self.buffers[branch_name] = BranchBuffer(kind, ctype)
+
+    def resetFeats(self):
+
+        # Defaults for a new event, with a new VectorFeat for every vector branch
+
+        feats = {}
+        for branch_name in self.branches_info:
+            if branch_name in self.buffers and self.buffers[branch_name].kind != 'flat':
+                feats[branch_name] = VectorFeat(self.buffers[branch_name].kind)
+            else:
+                feats[branch_name] = self.branches_info[branch_name]['default']
+
+        return feats
+
+    def fillEvent(self, feats):
+
+        # Buffer this event's values, filling the tree if there are flush_every of them
+
+        for branch_name in self.buffers:
+            self.buffers[branch_name].append(feats[branch_name])
+        self.n_buffered += 1
+
+        if self.n_buffered >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+
+        # Fill the tree with the buffered events
+
+        if self.n_buffered == 0:
+            return
+
+        # The arrays handed to the filler need to stay alive until it's done
+        self.filler.clear()
+        arrays = [self.buffers[branch_name].register(self.filler, self.branches[branch_name])\
+                  for branch_name in self.buffers]
+        self.filler.fill(self.n_buffered)
+        del arrays
+
+        for branch_name in self.buffers:
+            self.buffers[branch_name].reset()
+        self.n_buffered = 0
+
+    def wq(self):
+
+        # Fill whatever is still buffered before writing
+        self.flush()
+        TreeMaker.wq(self)
+
+class BranchBuffer:
+
+    # A BufferedTreeMaker branch's values for the events since the last flush
+
+    def __init__(self, kind, ctype):
+        self.kind = kind
+        self.ctype = ctype
+        self.reset()
+
+    def reset(self):
+        self.values = []   # flat values, or the elements of every event's vector
+        self.offsets = [0] # where each event's elements start in values
+
+    def append(self, value):
+        if self.kind == 'flat':
+            self.values.append(value)
+        else:
+            self.values.extend(value)
+            self.offsets.append(len(self.values))
+
+    def register(self, filler, holder):
+
+        # Hand the buffered values to filler as typed arrays (returned to be kept alive)
+
+        name = self.kind + self.ctype[0].upper() + self.ctype[1:]
+        if self.kind == 'flat':
+            values = np.array(self.values, dtype=bulk_dtypes[self.ctype])
+            getattr(filler, name)(holder, values)
+            return [values]
+
+        offsets = np.array(self.offsets, dtype=np.int64)
+        if self.kind == 'vector' and self.ctype != 'string':
+            content = np.array(self.values, dtype=bulk_dtypes[self.ctype])
+            getattr(filler, name)(holder, content, offsets)
+            return [content, offsets]
+
+        # Vectors of vectors/strings:  flatten the inner ones
+        if self.ctype == 'string':
+            inner_values = [str(v).encode() for v in self.values]
+            content = b''.join(inner_values)
+        else:
+            inner_values = self.values
+            content = np.array([x for v in inner_values for x in v], dtype=bulk_dtypes[self.ctype])
+        inner = np.zeros(len(inner_values) + 1, dtype=np.int64)
+        np.cumsum([len(v) for v in inner_values], out=inner[1:])
+        getattr(filler, name)(holder, content, inner, offsets)
+        return [content, inner, offsets]
+
+class VectorFeat(list):
+
+    # What BufferedTreeMaker.resetFeats gives for vector branches:  a list that also takes the
+    # std::vector calls event code uses with TreeMaker.  push_back copies what it's given
+    # (std::vectors for vv branches, std::strings), like std::vector::push_back
+
+    def __init__(self, kind):
+        list.__init__(self)
+        self.kind = kind
+
+    def push_back(self, value):
+        if self.kind == 'vv':
+            value = list(value)
+        elif hasattr(value, 'c_str'):
+            value = str(value)
+        self.append(value)
+
 class Histogram:
 
     # Just to hold histogram-related stuff and make other py code nicer
@@ -314,6 +1432,26 @@ def parse(nolist = False):
             default=0, help='event to start at')
     parser.add_argument('-m','--max', type=int, action='store', dest='maxEvents',
             default=-1, help='max events to run over for EACH group')
+    parser.add_argument('--columnar', action='store_true', dest='columnar', default=False,
+            help='read inputs with uproot (ColumnarTreeProcess) instead of PyROOT [Default: False]')
+    parser.add_argument('--profile', action='store_true', dest='profile', default=False,
+            help='time every event and write <label>_profile.csv plus a summary [Default: False]')
+    parser.add_argument('--cache', action='store', dest='cache', default='',
+            help='directory to cache features in by input file, so only ones not there yet'\
+                    ' are computed [Default: no cache]')
+    parser.add_argument('--model', action='store', dest='model', default='',
+            help='BDT to score with in eval scripts: pickled xgboost booster or .onnx export'\
+                    ' [Default: the script\'s own]')
+    parser.add_argument('--backend', action='store', dest='backend', default='',
+            choices=['', 'xgboost', 'onnx'],
+            help='backend for --model (see mods/scoring.py) [Default: by file extension]')
+    parser.add_argument('--friend', action='store_true', dest='friend', default=False,
+            help='eval scripts: write only the event key and discValue as a friend tree of the'\
+                    ' input instead of a copy of it (see attachFriend) [Default: False]')
+    parser.add_argument('--staging', action='store', dest='staging', default='copy',
+            choices=['copy', 'async', 'none'],
+            help='copy inputs to scratch first, in the background as needed, or not at all'\
+                    ' (--columnar: async or none) [Default: copy]')
     args = parser.parse_args()
 
     # Input
@@ -343,11 +1481,111 @@ def parse(nolist = False):
             'groupls': args.group_labels,
             'outlist': outlist,
             'startEvent': args.startEvent,
-            'maxEvents': args.maxEvents
+            'maxEvents': args.maxEvents,
+            'columnar': args.columnar,
+            'staging': args.staging,
+            'profile': args.profile,
+            'cache': args.cache,
+            'model': args.model,
+            'backend': args.backend,
+            'friend': args.friend
             }
 
     return pdict
 
+# Member behind an ldmx getter, e.g. getNReadoutHits -> nReadoutHits_
+def getterMember(getter):
+    if getter in ldmx_getters:
+        return ldmx_getters[getter]
+    if getter.startswith('get') and len(getter) > 3:
+        return getter[3].lower() + getter[4:] + '_'
+    return None
+
+# Getter (a function of no arguments, like the PyROOT ones) for the columnar classes,
+# given how to look up a member's value
+def columnarGetter(getter, value):
+    member = getterMember(getter)
+    if member == None:
+        raise AttributeError(getter)
+    if isinstance(member, tuple):
+        result = tuple(value(m) for m in member)
+    else:
+        result = value(member)
+    return lambda: result
+
+# Kind of branch ('flat', 'vector' or 'vv', or None if TreeMaker makes none) and C++ element
+# type for a TreeMaker rtype, following TreeMaker.addBranch
+def branchKind(rtype):
+    rtype = str(rtype)
+    if rtype.find('vector') >= 0: kind = 'vector'
+    elif rtype.find('vv') >= 0: kind = 'vv'
+    elif rtype == "<type 'float'>" or rtype == "<class 'float'>": return 'flat', 'double'
+    elif rtype == "<type 'int'>" or rtype == "<class 'int'>": return 'flat', 'int'
+    else: return None, None
+    for ctype in ['int', 'double', 'string', 'bool']:
+        if rtype.find(ctype) >= 0 and not (kind == 'vv' and ctype in ['string', 'bool']):
+            return kind, ctype
+    return None, None
+
+# Make pyEcalVeto::BulkFiller available (once)
+def declareBulkFiller():
+    if not hasattr(r, 'pyEcalVeto') or not hasattr(r.pyEcalVeto, 'BulkFiller'):
+        r.gInterpreter.Declare(bulkFiller_code)
+
+# Average bytes read by GetEntry over (up to) the first n events of a tree
+def bytesPerEvent(tree, n):
+    n = min(n, tree.GetEntries())
+    if n <= 0:
+        return 0.
+    nbytes = 0
+    for j in range(n):
+        nbytes += tree.GetEntry(j)
+    return float(nbytes)/n
+
+# Bytes in the file (compressed) of the baskets of an uproot TBranch holding entries
+# [entry_start, entry_stop), i.e. what reading them takes from disk
+def basketBytes(branch, entry_start, entry_stop):
+    offsets = branch.entry_offsets
+    first = max(int(np.searchsorted(offsets, entry_start, side='right')) - 1, 0)
+    nbytes = 0
+    for k in range(first, branch.num_baskets):
+        if offsets[k] >= entry_stop:
+            break
+        nbytes += branch.basket_compressed_bytes(k)
+    return nbytes
+
+# Add the discriminator friend tree an eval script wrote with --friend to tree (a TTree or the
+# TChain of the same input files, in the same order), so its branches read like the tree's own
+# (tree.discValue_EcalVeto, tree.Draw('discValue_EcalVeto'), ...)
+def attachFriend(tree, friend_file, friend_tree=friend_tree_name):
+
+    element = tree.AddFriend(friend_tree, friend_file)
+    if element == None or element.GetTree() == None:
+        sys.exit('No {} tree in {}'.format(friend_tree, friend_file))
+
+    # Entries are matched by number, so the friend has to be for all of the tree's events
+    nFriend, nTree = element.GetTree().GetEntries(), tree.GetEntries()
+    if nFriend != nTree:
+        print( 'WARNING: {} has {} entries, the tree it is a friend of {}'.format(friend_file, nFriend, nTree) )
+
+    # and for the same files in the same order:  check the keys where each file starts and ends
+    friend = element.GetTree()
+    if isinstance(tree, r.TChain):
+        offsets = [tree.GetTreeOffset()[k] for k in range(tree.GetNtrees() + 1)]
+    else:
+        offsets = [0, nTree]
+    for k in range(len(offsets) - 1):
+        for entry in sorted(set([offsets[k], offsets[k + 1] - 1])):
+            if entry < offsets[k] or entry >= min(nTree, nFriend):
+                continue
+            friend.GetEntry(entry)
+            if (friend.fileIndex, friend.fileEntry) != (k, entry - offsets[k]):
+                print( 'WARNING: entry {} of {} is file {} entry {}, but {} in the tree it is a friend of'.format(
+                       entry, friend_file, friend.fileIndex, friend.fileEntry,
+                       'file {} entry {}'.format(k, entry - offsets[k])) )
+
+    return element
+
 # Load a tree from a group of input files
 def load(group,treeName='LDMX_Events'):
 
@@ -359,6 +1597,45 @@ def load(group,treeName='LDMX_Events'):
 
     return tree
 
+# Whether path is on a local disk, going by the filesystem type of the mount it's under
+# in /proc/mounts (assume not if that can't be told)
+def isLocal(path):
+    try:
+        with open('/proc/mounts') as mounts:
+            entries = [line.split()[1:3] for line in mounts]
+    except (IOError, OSError):
+        return False
+    path = os.path.realpath(path)
+    mount_point, fstype = '', None
+    for mount, fs in entries:
+        mount = mount.replace('\\040', ' ')
+        if (path == mount or path.startswith(mount.rstrip('/') + '/'))\
+                and len(mount) >= len(mount_point):
+            mount_point, fstype = mount, fs
+    return fstype != None and not fstype in network_fs and not fstype.startswith('fuse')
+
+# adler32 checksum of a file (of nothing if filename is None)
+def adler32(filename, buffer_size=16*1024*1024):
+    checksum = zlib.adler32(b'')
+    if filename == None:
+        return checksum
+    with open(filename, 'rb') as f:
+        buf = f.read(buffer_size)
+        while buf:
+            checksum = zlib.adler32(buf, checksum)
+            buf = f.read(buffer_size)
+    return checksum
+
+# Identity of an input file for FeatureCache:  its name, size and modification time
+# (a URL is taken as is)
+def fileID(path):
+    if path.find('://') >= 0:
+        key = path
+    else:
+        st = os.stat(path)
+        key = '%s:%d:%d' % (os.path.basename(path), st.st_size, st.st_mtime_ns)
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
 # Remove scratch dir
 def rmScratch():
     if os.path.exists('./scratch'):
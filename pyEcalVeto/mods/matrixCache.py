@@ -0,0 +1,83 @@
+import os
+import re
+import glob
+import json
+import inspect
+import hashlib
+import numpy as np
+
+# Cache of the merged, shuffled training and test matrices the bdtMakers build from their
+# input trees, so a rerun with the same inputs (only the booster parameters changed) can skip
+# reading them.  Entries are .npz files in the cache directory, named after a hash of everything
+# that goes into the matrices:  the input files (path, size and modification time), tree name,
+# feature list, event cap (and whether it's a random sample), training fraction and random seed.  Features are stored as float32,
+# which is what xgboost turns them into anyway
+
+# Names of the branches a feature function reads (event.<name> in its code), in order
+def featureNames(function):
+    return re.findall(r'event\.(\w+)', inspect.getsource(function))
+
+# Files a TChain.Add pattern stands for, with their size and modification time
+def fileStamps(pattern):
+    files = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+    stamps = []
+    for f in files:
+        if os.path.exists(f):
+            st = os.stat(f)
+            stamps.append([os.path.abspath(f), st.st_size, st.st_mtime_ns])
+        else:
+            stamps.append([f, -1, -1])
+    return stamps
+
+# Key for a set of inputs and settings
+def cacheKey(sig_file, bkg_file, tree_name, features, max_evt, train_frac, seed, sample=False):
+    key = {
+            'sig': fileStamps(sig_file),
+            'bkg': fileStamps(bkg_file),
+            'tree': tree_name,
+            'features': list(features),
+            'max_evt': int(max_evt),
+            'train_frac': float(train_frac),
+            'seed': int(seed)
+            }
+    if sample:
+        key['sample'] = True
+    return hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()[:16]
+
+def cachePath(cache_dir, key):
+    return os.path.join(cache_dir, 'matrices_{}.npz'.format(key))
+
+# Matrices saved under key, as a cachedContainer, or None
+def load(cache_dir, key):
+    path = cachePath(cache_dir, key)
+    if not os.path.exists(path):
+        return None
+    print( 'Loading training and test matrices from {}'.format(path) )
+    with np.load(path) as saved:
+        return cachedContainer(saved['train_x'], saved['train_y'], saved['test_x'], saved['test_y'])
+
+# Save a mergedContainer's matrices under key
+def save(cache_dir, key, container):
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir)
+    path = cachePath(cache_dir, key)
+    tmp_path = '{}.tmp{}.npz'.format(path[:-4], os.getpid())
+    np.savez(tmp_path, train_x=container.train_x.astype(np.float32), train_y=container.train_y,
+             test_x=container.test_x.astype(np.float32), test_y=container.test_y)
+    os.replace(tmp_path, path)
+    print( 'Saved training and test matrices to {}'.format(path) )
+
+class cachedContainer:
+
+    # Stands in for a mergedContainer
+
+    def __init__(self, train_x, train_y, test_x, test_y):
+        self.train_x = train_x
+        self.train_y = train_y
+        self.test_x  = test_x
+        self.test_y  = test_y
+
+    def makeDMatrices(self):
+        import xgboost as xgb
+        self.dtrain = xgb.DMatrix(self.train_x,self.train_y)
+        self.dtest  = xgb.DMatrix(self.test_x,self.test_y)
@@ -482,6 +482,82 @@ def angle(vec, units, vec2=[0,0,1]):
     elif units=='radians': return math.acos( dot( unit(vec), unit(vec2) ) )
     else: print('\nSpecify valid angle unit ("degrees" or "randians")')
 
+###########################
+# Array versions
+###########################
+# The kernels above for whole sets of points/hits/events at once:  the last axis holds the
+# components, and all leading axes broadcast.  The arithmetic is done in the same order as in
+# the scalar versions so results agree exactly (see check_physTools.py), except where those
+# go through BLAS (np.dot, np.linalg.norm) or libm (acos, ** on python floats), which can
+# differ in the last bits:  mag, unit, distPtToLine, distTwoLines and angle (check_physTools.py
+# allows these a few ulps, --max-ulp)
+
+# projection for arrays of positions/momenta (..., 3) and z_final (broadcast against them)
+def projectionArray(pos_init, mom_init, z_final):
+    pos_init, mom_init = np.asarray(pos_init, dtype=float), np.asarray(mom_init, dtype=float)
+    x_final = pos_init[..., 0] + mom_init[..., 0]/mom_init[..., 2]*(z_final - pos_init[..., 2])
+    y_final = pos_init[..., 1] + mom_init[..., 1]/mom_init[..., 2]*(z_final - pos_init[..., 2])
+    return np.stack((x_final, y_final), axis=-1)
+
+# layerIntercepts for arrays of positions/momenta (..., 3) -> (..., len(layerZs), 2)
+def layerInterceptsArray(pos, mom, layerZs=ecal_layerZs):
+    pos, mom = np.asarray(pos, dtype=float), np.asarray(mom, dtype=float)
+    return projectionArray(pos[..., np.newaxis, :], mom[..., np.newaxis, :], np.asarray(layerZs))
+
+# Sum over the last axis, one component at a time like sum() does
+def sumLastAxis(array):
+    total = 0 + array[..., 0]
+    for i in range(1, array.shape[-1]):
+        total = total + array[..., i]
+    return total
+
+# mag over the last axis
+def magArray(vecs):
+    vecs = np.asarray(vecs, dtype=float)
+    return np.sqrt(sumLastAxis(vecs**2))
+
+# unit over the last axis
+def unitArray(vecs):
+    vecs = np.asarray(vecs, dtype=float)
+    return vecs/magArray(vecs)[..., np.newaxis]
+
+# dot over the last axis
+def dotArray(v1, v2):
+    return sumLastAxis(np.asarray(v1, dtype=float)*np.asarray(v2, dtype=float))
+
+# dist over the last axis
+def distArray(p1, p2):
+    return np.sqrt(sumLastAxis((np.asarray(p1, dtype=float) - np.asarray(p2, dtype=float))**2))
+
+# distPtToLine over the last axis
+def distPtToLineArray(x, y1, y2):
+    x, y1, y2 = [np.asarray(a, dtype=float) for a in (x, y1, y2)]
+    norm = magArray(y1 - y2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = magArray(np.cross(x - y1, y1 - y2))/norm
+    return np.where(norm == 0, magArray(x - y1), result)
+
+# distTwoLines over the last axis
+def distTwoLinesArray(x1, x2, y1, y2):
+    x1, x2, y1, y2 = [np.asarray(a, dtype=float) for a in (x1, x2, y1, y2)]
+    cross = np.cross(x1 - x2, y1 - y2)
+    norm = magArray(cross)
+    xnorm = magArray(x1 - x2)
+    ynorm = magArray(y1 - y2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = np.abs(dotArray(cross, x1 - y1)/norm)
+        parallel = magArray(np.cross(x1 - y1, y1 - y2))/ynorm
+        parallel = np.where(ynorm == 0, magArray(np.cross(x1 - x2, x1 - y1))/xnorm, parallel)
+    parallel = np.where((xnorm == 0) & (ynorm == 0), np.sqrt(sumLastAxis((x1 - y1)**2)), parallel)
+    return np.where(norm == 0, parallel, result)
+
+# angle over the last axis
+def angleArray(vecs, units, vec2=[0,0,1]):
+    cos = dotArray(unitArray(vecs), unitArray(vec2))
+    if units=='degrees': return np.arccos(cos)*180.0/math.pi
+    elif units=='radians': return np.arccos(cos)
+    else: print('\nSpecify valid angle unit ("degrees" or "randians")')
+
 # Get np.ndarray of hit position
 def pos(hit):
     return np.array( ( hit.getXPos(), hit.getYPos(), hit.getZPos() ) )
@@ -658,3 +734,144 @@ def elec_gamma_ecalSPHits(ecalSPHits):
     gSPHit = gammaEcalSPHit(ecalSPHits)
 
     return eSPHit, gSPHit
+
+###########################
+# Get e/g SP hit info for a chunk of events
+###########################
+# The finders above for all events of a chunk at once, on columnar scoring-plane hits:
+# SPHits has .values ({member: flat array of all the chunk's hits}) and .offsets ({member:
+# where each event starts in it}), like the branches ColumnarTreeProcess gives.  Hits are
+# selected with the same cuts, and ties in p go to the first hit as in the loops
+
+# Scoring-plane hits picked in each event of a chunk
+class SPHitArray:
+    def __init__(self,found,pos,mom):
+        self.found = found  # (nEvents,) bool
+        self.pos = pos      # (nEvents, 3), nan where nothing was found
+        self.mom = mom      # (nEvents, 3), nan where nothing was found
+
+    # Hit for event i with getPosition/getMomentum, or None (like the per-event finders)
+    def hit(self, i):
+        if not self.found[i]: return None
+        return SPHitData(self.pos[i], self.mom[i])
+
+# Stands in for the SimTrackerHit the per-event finders return
+class SPHitData:
+    def __init__(self,pos,mom):
+        self.pos = pos
+        self.mom = mom
+
+    def getPosition(self):
+        return self.pos
+
+    def getMomentum(self):
+        return self.mom
+
+# Flat hit arrays of a chunk, with the event of each hit
+def spHitColumns(SPHits):
+    offsets = SPHits.offsets['pz_']
+    nEvents = len(offsets) - 1
+    event = np.repeat(np.arange(nEvents), np.diff(offsets))
+    pos = np.stack([SPHits.values[m] for m in ('x_', 'y_', 'z_')], axis=-1)
+    mom = np.stack([SPHits.values[m] for m in ('px_', 'py_', 'pz_')], axis=-1)
+    return nEvents, event, pos, mom, magArray(mom)
+
+# Hit with max p in each event among those passing sel -> SPHitArray and p_max (0 if none)
+def maxPSPHitArray(nEvents, event, pos, mom, p, sel):
+    idx = np.flatnonzero(sel)
+    order = np.lexsort((idx, -p[idx], event[idx]))
+    idx, ev = idx[order], event[idx][order]
+    first = np.ones(len(ev), dtype=bool)
+    first[1:] = ev[1:] != ev[:-1]
+    idx, ev = idx[first], ev[first]
+
+    found = np.zeros(nEvents, dtype=bool)
+    found[ev] = True
+    hit_pos = np.full((nEvents, 3), np.nan)
+    hit_mom = np.full((nEvents, 3), np.nan)
+    hit_pos[ev], hit_mom[ev] = pos[idx], mom[idx]
+    p_max = np.zeros(nEvents)
+    p_max[ev] = p[idx]
+
+    return SPHitArray(found, hit_pos, hit_mom), p_max
+
+# Hits at plane sp_z going forward (as the per-event finders require)
+def onSPArray(pos, mom, sp_z):
+    return (np.abs(pos[:, 2] - sp_z) <= 0.5*sp_thickness) & (mom[:, 2] > 0)
+
+# Recoil e- at the target (method 1:  electronTargetSPHit, or method 2:
+# electronTargetSPHit_deltaPz with deltaPz=True) and at the ECal face, and the photon at the
+# ECal face, for every event of a chunk, each collection being gone through once
+# -> {'e_target': SPHitArray, 'e_ecal': SPHitArray, 'g_ecal': SPHitArray}
+def truthSPHitsArray(targetSPHits, ecalSPHits, deltaPz=False):
+
+    truth = {}
+
+    # Target
+    columns = spHitColumns(targetSPHits)
+    nEvents, event, pos, mom, p = columns
+    pdgID = targetSPHits.values['pdgID_']
+    if not deltaPz:
+        truth['e_target'], _ = maxPSPHitArray(*columns,
+                sel=onSPArray(pos, mom, sp_target_down_z) & (pdgID == 11))
+    else:
+        dpz_threshold = 2400    # Delta pz threshold
+        electron = (pdgID == 11) & (targetSPHits.values['trackID_'] == 1)
+        down, pmax_down = maxPSPHitArray(*columns,
+                sel=onSPArray(pos, mom, sp_target_down_z) & electron)
+        l1, pmax_l1 = maxPSPHitArray(*columns,
+                sel=onSPArray(pos, mom, sp_trigger_pad_down_l1_z) & electron)
+        l2, pmax_l2 = maxPSPHitArray(*columns,
+                sel=onSPArray(pos, mom, sp_trigger_pad_down_l2_z) & electron)
+
+        # Interact @ Trigger scin l1, else @ Trigger scin l2, else @ Target
+        at_l1 = pmax_down - pmax_l1 > dpz_threshold
+        at_l2 = ~at_l1 & (pmax_l1 - pmax_l2 > dpz_threshold)
+        for hits, pick in ((l1, at_l1), (l2, at_l2)):
+            down.found = np.where(pick, hits.found, down.found)
+            down.pos = np.where(pick[:, np.newaxis], hits.pos, down.pos)
+            down.mom = np.where(pick[:, np.newaxis], hits.mom, down.mom)
+        truth['e_target'] = down
+
+    # ECal face
+    columns = spHitColumns(ecalSPHits)
+    nEvents, event, pos, mom, p = columns
+    pdgID = ecalSPHits.values['pdgID_']
+    front = onSPArray(pos, mom, sp_ecal_front_z)
+    truth['e_ecal'], _ = maxPSPHitArray(*columns, sel=front & (pdgID == 11))
+    truth['g_ecal'], _ = maxPSPHitArray(*columns, sel=front & (np.abs(pdgID) == 22))
+
+    return truth
+
+###########################
+# Rec/sim hit matching
+###########################
+
+# Which rec hits are noise:  those flagged as such, and those without a sim hit of the same ID
+# (a set of the sim hit IDs instead of going through the sorted sim hits for every rec hit)
+# Takes the rec hits' IDs and noise flags and the sim hits' IDs -> list of bools, one per rec hit
+def noiseHits(recIDs, recNoise, simIDs):
+    simIDs = set(simIDs)
+    return [bool(noise) or not ID in simIDs for ID, noise in zip(recIDs, recNoise)]
+
+# noiseHits for every event of a chunk at once:  IDs and flags flat over the chunk, with the
+# offsets where each event's hits start -> bool array, one per rec hit
+def noiseHitsArray(recIDs, recNoise, recOffsets, simIDs, simOffsets):
+    recKeys = hitKeysArray(recIDs, recOffsets)
+    simKeys = hitKeysArray(simIDs, simOffsets)
+    return np.asarray(recNoise, dtype=bool) | ~np.isin(recKeys, simKeys)
+
+# (event, ID) of each hit as one int64, for matching hits of the same event
+def hitKeysArray(IDs, offsets):
+    event = np.repeat(np.arange(len(offsets) - 1, dtype=np.int64), np.diff(offsets))
+    return (event << 32) | (np.asarray(IDs, dtype=np.int64) & 0xFFFFFFFF)
+
+# Noise energy and number of noise hits in each event of a chunk, from noiseHitsArray's labels.
+# Energies are added up in hit ID order, as the analyzers do, so the sums are the same to the bit
+def noiseTotalsArray(recIDs, recEnergy, recOffsets, noise):
+    nEvents = len(recOffsets) - 1
+    event = np.repeat(np.arange(nEvents), np.diff(recOffsets))
+    order = np.lexsort((np.asarray(recIDs, dtype=np.int64), event))
+    order = order[np.asarray(noise, dtype=bool)[order]]
+    energy = np.bincount(event[order], weights=np.asarray(recEnergy, dtype=np.float64)[order], minlength=nEvents)
+    return energy, np.bincount(event[order], minlength=nEvents)
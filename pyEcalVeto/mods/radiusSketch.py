@@ -0,0 +1,144 @@
+import math
+import numpy as np
+
+# Containment radii from distance sketches instead of per-event branches:  the hit-to-trajectory
+# distances of every (recoil bin, layer) are filled a chunk at a time into log-spaced buckets
+# (each bucket gamma = (1 + alpha)/(1 - alpha) times as wide as the one before, over
+# [minDist, maxDist], distances outside going into the end buckets).  Sketches of different files
+# or jobs are added up, and any quantile comes from the cumulative weights to within a relative
+# alpha of the true one (see quantiles).  Memory is nBins*nLayers*nBuckets numbers however many
+# events there are
+
+class RadiusSketch:
+
+    def __init__(self, nBins, nLayers=34, alpha=0.005, minDist=0.1, maxDist=2000.):
+
+        self.nBins = int(nBins)
+        self.nLayers = int(nLayers)
+        self.alpha = float(alpha)
+        self.minDist = float(minDist)
+        self.maxDist = float(maxDist)
+        self.logGamma = math.log((1. + self.alpha)/(1. - self.alpha))
+        self.nBuckets = int(math.ceil(math.log(self.maxDist/self.minDist)/self.logGamma)) + 1
+        shape = (self.nBins, self.nLayers, self.nBuckets)
+        self.counts = np.zeros(shape)                       # Sum of weights in each bucket
+        self.sumw2 = np.zeros((self.nBins, self.nLayers))   # Sum of squared weights
+        self.entries = np.zeros((self.nBins, self.nLayers), dtype=np.int64)
+        self.events = np.zeros(self.nBins, dtype=np.int64)  # Events filled in each bin
+
+    def bucket(self, dists):
+
+        # Bucket of each distance:  0 up to minDist, then k for (minDist*gamma^(k-1), minDist*gamma^k]
+
+        with np.errstate(divide='ignore'):
+            k = np.ceil(np.log(np.maximum(dists, 0.)/self.minDist)/self.logGamma)
+        return np.clip(np.nan_to_num(k, nan=0., neginf=0.), 0, self.nBuckets - 1).astype(np.int64)
+
+    def fill(self, bins, layers, dists, weights=None):
+
+        # Add distances, one per hit, with the recoil bin and layer of each (nan ones are skipped)
+
+        bins, layers = np.asarray(bins, dtype=np.int64), np.asarray(layers, dtype=np.int64)
+        dists = np.asarray(dists, dtype=np.float64)
+        keep = ~np.isnan(dists) & (bins >= 0) & (bins < self.nBins) & (layers >= 0) & (layers < self.nLayers)
+        weights = np.ones(len(dists)) if weights is None else np.asarray(weights, dtype=np.float64)
+        bins, layers, dists, weights = bins[keep], layers[keep], dists[keep], weights[keep]
+
+        cell = bins*self.nLayers + layers
+        flat = cell*self.nBuckets + self.bucket(dists)
+        self.counts += np.bincount(flat, weights=weights, minlength=self.counts.size).reshape(self.counts.shape)
+        nCells = self.nBins*self.nLayers
+        self.sumw2 += np.bincount(cell, weights=weights**2, minlength=nCells).reshape(self.sumw2.shape)
+        self.entries += np.bincount(cell, minlength=nCells).reshape(self.entries.shape)
+
+        return self
+
+    def countEvents(self, bins):
+
+        # Add events (with or without hits) to the recoil bins they're in
+
+        bins = np.asarray(bins, dtype=np.int64)
+        bins = bins[(bins >= 0) & (bins < self.nBins)]
+        self.events += np.bincount(bins, minlength=self.nBins)
+
+        return self
+
+    def add(self, other):
+
+        # Add another sketch of the same buckets and shape (other files or jobs)
+
+        checkBuckets(self, other)
+        self.counts += other.counts
+        self.sumw2 += other.sumw2
+        self.entries += other.entries
+        self.events += other.events
+
+        return self
+
+    def values(self):
+
+        # Distance standing for each bucket, within a relative alpha of any in it
+
+        upper = self.minDist*np.exp(self.logGamma*np.arange(self.nBuckets))
+        values = 2.*upper/(1. + math.exp(self.logGamma))
+        values[0] = self.minDist
+        return values
+
+    def quantiles(self, q):
+
+        # q quantile (a number, or one per (bin, layer)) of the weighted distances of every
+        # (bin, layer), nan where there's none.
+        # Each is within a relative alpha of the true one (or below minDist, or above maxDist)
+
+        # The total is the last cumulative value, not a separate sum, so that q = 1 always lands
+        # on the last non-empty bucket (a sum in another order can come out an ulp higher)
+        cumulative = np.cumsum(self.counts, axis=-1)
+        total = cumulative[..., -1]
+        index = np.argmax(cumulative >= (np.asarray(q)*total)[..., np.newaxis], axis=-1)
+        return np.where(total > 0, self.values()[index], np.nan)
+
+    def quantileErrors(self, q):
+
+        # Statistical error of those quantiles:  half the distance between the q -/+ one sigma
+        # quantiles, sigma being the binomial one for the effective number of hits
+
+        total = np.cumsum(self.counts, axis=-1)[..., -1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            nEff = np.where(self.sumw2 > 0, total**2/self.sumw2, 0.)
+            sigma = np.sqrt(q*(1. - q)/nEff)
+        low = self.quantiles(np.maximum(q - sigma, 0.))
+        high = self.quantiles(np.minimum(q + sigma, 1.))
+        return np.where(nEff > 0, (high - low)/2., np.nan)
+
+    def save(self, path):
+        np.savez(path, counts=self.counts, sumw2=self.sumw2, entries=self.entries, events=self.events,
+                 alpha=self.alpha, minDist=self.minDist, maxDist=self.maxDist)
+
+def loadSketch(path):
+    with np.load(path) as saved:
+        nBins, nLayers = saved['counts'].shape[:2]
+        sketch = RadiusSketch(nBins, nLayers, float(saved['alpha']), float(saved['minDist']), float(saved['maxDist']))
+        checkBuckets(sketch, saved['counts'])
+        sketch.counts = saved['counts'].astype(np.float64)
+        sketch.sumw2 = saved['sumw2'].astype(np.float64)
+        sketch.entries = saved['entries'].astype(np.int64)
+        sketch.events = saved['events'].astype(np.int64)
+    return sketch
+
+# Sum of the sketches saved in paths (e.g. one per job)
+def mergeSketches(paths):
+    sketch = loadSketch(paths[0])
+    for path in paths[1:]:
+        sketch.add(loadSketch(path))
+    return sketch
+
+def checkBuckets(sketch, other):
+    if isinstance(other, np.ndarray):
+        if other.shape != sketch.counts.shape:
+            raise ValueError('Sketch counts have shape {}, expected {}'.format(other.shape, sketch.counts.shape))
+        return
+    if (sketch.counts.shape, sketch.alpha, sketch.minDist, sketch.maxDist) !=\
+       (other.counts.shape, other.alpha, other.minDist, other.maxDist):
+        raise ValueError('Sketches have different buckets: {} alpha {} over [{}, {}] and {} alpha {} over [{}, {}]'.format(
+                         sketch.counts.shape, sketch.alpha, sketch.minDist, sketch.maxDist,
+                         other.counts.shape, other.alpha, other.minDist, other.maxDist))
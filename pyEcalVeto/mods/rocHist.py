@@ -0,0 +1,139 @@
+import numpy as np
+
+# ROC curves from score histograms instead of sorted score arrays:  each sample is filled a chunk
+# at a time into a fine histogram (nBins equal bins over [low, high], scores outside going into
+# the end bins), histograms of the same sample from different files or jobs are added up, and
+# curves, AUC and cuts come from the cumulative counts.  Memory is nBins numbers per sample however
+# many events there are, and every result is exact to within one bin (see rocAUC, cutForEfficiency)
+
+class ScoreHist:
+
+    def __init__(self, nBins=1000000, low=0., high=1.):
+
+        self.nBins = int(nBins)
+        self.low = float(low)
+        self.high = float(high)
+        self.counts = np.zeros(self.nBins) # Sum of weights in each bin
+        self.entries = 0                   # Number of scores filled
+
+    def fill(self, scores, weights=None):
+
+        # Add scores (nan ones are skipped)
+
+        scores = np.asarray(scores, dtype=np.float64).ravel()
+        keep = ~np.isnan(scores)
+        if weights is not None:
+            weights = np.asarray(weights, dtype=np.float64).ravel()[keep]
+        scores = scores[keep]
+
+        bins = np.floor((scores - self.low)*(self.nBins/(self.high - self.low)))
+        bins = np.clip(bins, 0, self.nBins - 1).astype(np.int64)
+        self.counts += np.bincount(bins, weights=weights, minlength=self.nBins)
+        self.entries += len(scores)
+
+        return self
+
+    def fillTree(self, files, branch, treeName='EcalVeto', chunkSize=1000000):
+
+        # Add the scores in a branch of flat trees, chunkSize entries at a time
+
+        import uproot
+
+        for arrays in uproot.iterate(['{}:{}'.format(f, treeName) for f in files], [branch],
+                                     step_size=chunkSize, library='np'):
+            self.fill(arrays[branch])
+
+        return self
+
+    def add(self, other):
+
+        # Add another histogram of the same binning (the same sample from another file or job)
+
+        checkBinning(self, other)
+        self.counts += other.counts
+        self.entries += other.entries
+
+        return self
+
+    def edges(self):
+        return np.linspace(self.low, self.high, self.nBins + 1)
+
+    def total(self):
+        return self.counts.sum()
+
+    def above(self):
+
+        # Sum of weights at or above the lower edge of each bin, plus 0 above the last one
+
+        return np.append(np.cumsum(self.counts[::-1])[::-1], 0.)
+
+    def save(self, path):
+        np.savez(path, counts=self.counts, low=self.low, high=self.high, entries=self.entries)
+
+def loadHist(path):
+    with np.load(path) as saved:
+        hist = ScoreHist(len(saved['counts']), saved['low'], saved['high'])
+        hist.counts = saved['counts'].astype(np.float64)
+        hist.entries = int(saved['entries'])
+    return hist
+
+# Sum of the histograms saved in paths (e.g. one per job)
+def mergeHists(paths):
+    hist = loadHist(paths[0])
+    for path in paths[1:]:
+        hist.add(loadHist(path))
+    return hist
+
+def checkBinning(hist1, hist2):
+    if (hist1.nBins, hist1.low, hist1.high) != (hist2.nBins, hist2.low, hist2.high):
+        raise ValueError('Histograms have different binnings: {} bins over [{}, {}] and {} bins over [{}, {}]'.format(
+                         hist1.nBins, hist1.low, hist1.high, hist2.nBins, hist2.low, hist2.high))
+
+# Efficiency of score >= each bin edge, from the loosest cut to the tightest
+def efficiencies(hist):
+    return hist.above()/hist.total()
+
+# False and true positive rates and the cuts they're for, like sklearn's roc_curve:
+# fpr increasing, cuts decreasing.  Each point is exact; only cuts at bin edges are there
+def rocCurve(sigHist, bkgHist):
+    checkBinning(sigHist, bkgHist)
+    return efficiencies(bkgHist)[::-1], efficiencies(sigHist)[::-1], sigHist.edges()[::-1]
+
+# Area under the curve, and how far off it can be:  the trapezoid rule counts each signal-background
+# pair of events in the same bin as half ordered right, so the exact AUC is within
+# sum(sig*bkg)/2 per bin (normalized) of it
+def rocAUC(sigHist, bkgHist):
+    fpr, tpr, cuts = rocCurve(sigHist, bkgHist)
+    auc = np.sum((fpr[1:] - fpr[:-1])*(tpr[1:] + tpr[:-1]))/2.
+    error = 0.5*np.sum(sigHist.counts*bkgHist.counts)/(sigHist.total()*bkgHist.total())
+    return auc, error
+
+# Cut (score >= cut) at a bin edge with efficiency as close to target as the binning allows:
+# the tightest with at least target, or with atMost the loosest with at most target.
+# Returns the cut, its efficiency and the efficiency in the bin next to it, which the cut
+# that gives exactly target is within
+def cutForEfficiency(hist, target, atMost=False):
+    effs = efficiencies(hist)
+    i = cutIndex(effs, target, atMost)
+    if atMost:
+        binEff = effs[i - 1] - effs[i] if i > 0 else 0.
+    else:
+        binEff = effs[i] - effs[i + 1] if i < hist.nBins else 0.
+    return hist.edges()[i], effs[i], binEff
+
+# Index of that cut's edge, given the efficiencies at the edges
+def cutIndex(effs, target, atMost=False):
+    if atMost:
+        return int(np.argmax(effs <= target))
+    return int(len(effs) - 1 - np.argmax(effs[::-1] >= target))
+
+# Signal efficiency at the cuts for background efficiencies (mistag rates) at most mistags,
+# as (cut, background efficiency, signal efficiency) for each
+def sigEffsAtMistags(sigHist, bkgHist, mistags=[1e-3, 1e-4, 1e-5, 1e-6]):
+    checkBinning(sigHist, bkgHist)
+    sigEffs, bkgEffs, edges = efficiencies(sigHist), efficiencies(bkgHist), sigHist.edges()
+    results = []
+    for mistag in mistags:
+        i = cutIndex(bkgEffs, mistag, atMost=True)
+        results.append((edges[i], bkgEffs[i], sigEffs[i]))
+    return results
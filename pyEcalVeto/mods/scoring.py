@@ -0,0 +1,86 @@
+import os
+import sys
+import numpy as np
+
+# Scoring events with a trained BDT, through either backend:
+#   'xgboost': the pickled xgboost Booster from bdtMaker.py (what the eval scripts always used)
+#   'onnx':    an ONNX export of it (EcalVeto-3.0/pickle_to_onnx.py), run with ONNX Runtime on CPU
+# Both take an (events, features) array and return the signal probability of each event
+
+class XGBoostScorer:
+
+    def __init__(self, model_file, threads=0):
+
+        import pickle as pkl
+        import xgboost as xgb
+
+        self.xgb = xgb
+        with open(model_file, 'rb') as f:
+            self.model = pkl.load(f)
+        self.setThreads(threads)
+
+    def setThreads(self, threads):
+
+        # Threads per predict call (0: xgboost's default, all of them)
+
+        self.threads = threads
+        if threads > 0:
+            self.model.set_param({'nthread': threads})
+
+    def numFeatures(self):
+        return self.model.num_features()
+
+    def score(self, events):
+        dmatrix = self.xgb.DMatrix(np.asarray(events), nthread=self.threads if self.threads > 0 else -1)
+        return self.model.predict(dmatrix).astype(np.float64)
+
+class ONNXScorer:
+
+    def __init__(self, model_file, threads=0):
+
+        import onnxruntime as ort
+
+        self.ort = ort
+        self.model_file = model_file
+        self.setThreads(threads)
+
+    def setThreads(self, threads):
+
+        # A session only takes its thread count when created, so make a new one
+
+        self.threads = threads
+        options = self.ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        self.session = self.ort.InferenceSession(self.model_file, sess_options=options,
+                                                 providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+        # The probabilities output of a converted classifier (label is the other one)
+        outputs = [o.name for o in self.session.get_outputs()]
+        probs = [name for name in outputs if name.find('prob') >= 0]
+        self.output_name = probs[0] if probs else outputs[-1]
+
+    def numFeatures(self):
+        return self.session.get_inputs()[0].shape[1]
+
+    def score(self, events):
+        events = np.asarray(events, dtype=np.float32)
+        probs = self.session.run([self.output_name], {self.input_name: events})[0]
+        probs = np.asarray(probs)
+        if probs.ndim == 2:
+            probs = probs[:, -1]
+        return probs.astype(np.float64)
+
+scorers = {'xgboost': XGBoostScorer, 'onnx': ONNXScorer}
+
+# Scorer for a model file, with the backend given or else going by its extension
+def loadScorer(model_file, backend='', threads=0):
+
+    if backend == '':
+        backend = 'onnx' if os.path.splitext(model_file)[1] == '.onnx' else 'xgboost'
+    if not backend in scorers:
+        sys.exit('Unknown scoring backend {} (use {})'.format(backend, ' or '.join(scorers)))
+    print( 'Scoring with {} ({})'.format(model_file, backend) )
+
+    return scorers[backend](model_file, threads)
@@ -0,0 +1,260 @@
+"""
+radiusCalibration.py
+
+68% containment radius tables (radius68_* in mods/physTools.py) and their per-layer fits
+(roc_fit.py) straight from event files, for a new detector version or beam energy.  Replaces
+making trees of roc68_binning{i}_layer{j} branches and running roc_fit.py over them.
+
+The ECal scoring-plane and rec hit branches are read with uproot a chunk at a time, in parallel
+over the input files (--workers).  For every event of a chunk, the recoil electron at the ECal face
+(physTools.truthSPHitsArray's e_ecal) gives its bin (recoil angle to z in --theta-edges, times
+momentum in --p-edges) and its trajectory, and the distance of each rec hit (energy > 0) to the
+trajectory in its layer goes into that bin and layer's sketch (mods/radiusSketch.py), weighted by
+the hit energy (--unweighted for one per hit).  Events without a recoil electron at the ECal
+face, or outside the bins, are only counted.
+
+The radius of each bin and layer is the 68% quantile (--quantile) of its distances, within a
+relative --alpha of the exact one, with the binomial error of the quantile for the hits it has.
+Each bin's radii are then fit against the layer like roc_fit.py (lmfit, poly2 for the first
+--poly2-bins bins and poly1 for the others, weighted by 1/error), layers with fewer than
+--min-hits hits being left out.
+
+Writes <out>_sketch.npz (the merged sketches; give these back with -i, alone or with more event
+files, to add up jobs run on different files), <out>_radius68.py (tables to paste into
+physTools.py:  measured ones, and ones taking the fit from layer --fit-from on, as the v14 tables
+do from layer 26) and <out>_RoC_binning<i>.png for each bin.
+
+Example:
+    ldmx python3 radiusCalibration.py -i /path/to/signal/*.root --workers 8 -o v14_8gev
+    ldmx python3 radiusCalibration.py -i job*_sketch.npz -o v14_8gev
+"""
+
+import glob
+import time
+import argparse
+import multiprocessing as mp
+import numpy as np
+from mods import physTools
+from mods.radiusSketch import RadiusSketch, loadSketch
+from mods.ROOTmanager import ColumnarBranch
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-i', nargs='+', dest='infiles', required=True,
+                    help='event files (patterns are expanded) and/or saved sketches (.npz)')
+parser.add_argument('-o', dest='out', default='radius68', help='output name')
+parser.add_argument('--tree', default='LDMX_Events')
+parser.add_argument('--pass-name', dest='pass_name', default='v12', help='pass name of the input collections')
+parser.add_argument('--theta-edges', dest='theta_edges', default='0,10,15,25,30,40,50',
+                    help='recoil angle bin edges (degrees)')
+parser.add_argument('--p-edges', dest='p_edges', default='0,inf', help='recoil momentum bin edges (MeV)')
+parser.add_argument('--quantile', type=float, default=0.68)
+parser.add_argument('--alpha', type=float, default=0.005, help='relative accuracy of the sketches')
+parser.add_argument('--unweighted', action='store_true', default=False,
+                    help='count hits instead of weighting them by energy')
+parser.add_argument('--poly2-bins', dest='poly2_bins', type=int, default=3,
+                    help='number of (lowest angle) bins fit with poly2 rather than poly1')
+parser.add_argument('--fit-from', dest='fit_from', type=int, default=26,
+                    help='first layer (from 1) taking the fit in the fitted tables')
+parser.add_argument('--min-hits', dest='min_hits', type=int, default=100,
+                    help='fewest hits for a layer to be fit')
+parser.add_argument('--chunk-size', dest='chunk_size', type=int, default=10000)
+parser.add_argument('--workers', type=int, default=0, help='processes (default: one per core)')
+args = parser.parse_args()
+
+theta_edges = [float(x) for x in args.theta_edges.split(',')]
+p_edges = [float(x) for x in args.p_edges.split(',')]
+n_theta, n_p = len(theta_edges) - 1, len(p_edges) - 1
+n_bins = n_theta*n_p
+n_layers = len(physTools.ecal_layerZs)
+
+inputs = {
+        'EcalScoringPlaneHits_' + args.pass_name: ('SimTrackerHit', ['x_', 'y_', 'z_', 'px_', 'py_', 'pz_', 'pdgID_']),
+        'EcalRecHits_' + args.pass_name: ('EcalHit', ['id_', 'energy_', 'xpos_', 'ypos_'])
+        }
+
+
+def edgeName(var, low, high):
+    # theta10to15, thetalt10, pgt500, ...
+    fmt = lambda x: '{:g}'.format(x)
+    if low <= 0: return '{}lt{}'.format(var, fmt(high))
+    if np.isinf(high): return '{}gt{}'.format(var, fmt(low))
+    return '{}{}to{}'.format(var, fmt(low), fmt(high))
+
+
+def binName(b):
+    # radius68_ name of a bin, as in physTools.py
+    i, j = divmod(b, n_p)
+    name = 'radius68_' + edgeName('theta', theta_edges[i], theta_edges[i + 1])
+    if n_p > 1:
+        name += '_' + edgeName('p', p_edges[j], p_edges[j + 1])
+    return name
+
+
+def recoilBins(theta, p, found):
+    # Bin of each event, -1 if it has no recoil electron or is outside the bins
+    i = np.searchsorted(theta_edges, theta, side='right') - 1
+    j = np.searchsorted(p_edges, p, side='right') - 1
+    inside = found & (i >= 0) & (i < n_theta) & (j >= 0) & (j < n_p)
+    return np.where(inside, i*n_p + j, -1)
+
+
+def fillChunk(sketch, spHits, recHits):
+
+    # Recoil electron at the ECal face, its bin and its trajectory (the ECal face part of truthSPHitsArray)
+    columns = physTools.spHitColumns(spHits)
+    nEvents, event, pos, mom, p = columns
+    front = physTools.onSPArray(pos, mom, physTools.sp_ecal_front_z)
+    e_ecal, _ = physTools.maxPSPHitArray(*columns, sel=front & (spHits.values['pdgID_'] == 11))
+    with np.errstate(invalid='ignore'):
+        bins = recoilBins(physTools.angleArray(e_ecal.mom, units='degrees'),
+                          physTools.magArray(e_ecal.mom), e_ecal.found)
+        e_traj = physTools.layerInterceptsArray(e_ecal.pos, e_ecal.mom)  # (nEvents, nLayers, 2)
+    sketch.countEvents(bins)
+
+    # Distance of each hit to the trajectory in its layer
+    offsets = recHits.offsets['energy_']
+    hitEvent = np.repeat(np.arange(nEvents), np.diff(offsets))
+    energy = recHits.values['energy_']
+    layer = (recHits.values['id_'] >> physTools.ecal_LAYER_SHIFT) & physTools.ecal_LAYER_MASK
+    keep = (energy > 0) & (bins[hitEvent] >= 0) & (layer < n_layers)
+    hitEvent, layer, energy = hitEvent[keep], layer[keep], energy[keep]
+    traj = e_traj[hitEvent, layer]
+    dists = np.hypot(recHits.values['xpos_'][keep] - traj[:, 0], recHits.values['ypos_'][keep] - traj[:, 1])
+
+    sketch.fill(bins[hitEvent], layer, dists, None if args.unweighted else energy)
+
+
+def fillFile(rfilename):
+
+    # Sketch of one event file
+
+    import uproot
+
+    sketch = RadiusSketch(n_bins, n_layers, args.alpha)
+    branches = dict((name, ColumnarBranch(ldmx_class, name, members, True))
+                    for name, (ldmx_class, members) in inputs.items())
+
+    with uproot.open(rfilename) as rfile:
+        tree = rfile[args.tree]
+        keys = set(tree.keys())
+        paths = {}
+        for name, branch in branches.items():
+            for member in branch.members:
+                for path in ('{0}/{0}.{1}'.format(name, member), '{0}/{1}'.format(name, member)):
+                    if path in keys:
+                        paths[(name, member)] = path
+                        break
+                else:
+                    raise KeyError('{} has no member {} in {}'.format(name, member, rfilename))
+
+        for arrays in tree.iterate(list(paths.values()), step_size=args.chunk_size):
+            for name, branch in branches.items():
+                branch.load(dict((member, arrays[paths[(name, member)]]) for member in branch.members))
+            fillChunk(sketch, *branches.values())
+
+    return sketch
+
+
+def poly2(x, a0, a1, a2):
+    return a2 * x * x + a1 * x + a0
+
+
+def poly1(x, a0, a1):
+    return a1 * x + a0
+
+
+def fitBin(b, radii, errors, entries):
+
+    # lmfit of a bin's radii against the layer, like roc_fit.py; None if too few layers to fit
+    from lmfit import Model
+
+    layers = np.arange(1, n_layers + 1, dtype=float)
+    good = (entries >= args.min_hits) & np.isfinite(radii) & np.isfinite(errors) & (errors > 0)
+    deg = 2 if b < args.poly2_bins else 1
+    if np.count_nonzero(good) <= deg + 1:
+        return None, deg
+
+    model = Model(poly2 if deg == 2 else poly1)
+    params = model.make_params(a0=8, a1=0.2, a2=0.1) if deg == 2 else model.make_params(a0=8, a1=0.2)
+    result = model.fit(radii[good], params, x=layers[good], weights=1./errors[good])
+    return result, deg
+
+
+def formatTable(name, values):
+    # As the tables in physTools.py, five values a line
+    lines = [', '.join('{:.8g}'.format(v) for v in values[k:k + 5]) for k in range(0, len(values), 5)]
+    return '{} = [{}]\n'.format(name, (',\n' + ' '*(len(name) + 4)).join(lines))
+
+
+def main():
+
+    start = time.time()
+
+    # Saved sketches and event files
+    sketch = None
+    files = []
+    for spec in args.infiles:
+        if spec.endswith('.npz'):
+            saved = loadSketch(spec)
+            sketch = saved if sketch == None else sketch.add(saved)
+        else:
+            files += sorted(glob.glob(spec)) if glob.has_magic(spec) else [spec]
+
+    if sketch == None:
+        sketch = RadiusSketch(n_bins, n_layers, args.alpha)
+    if len(files) > 0:
+        workers = args.workers if args.workers > 0 else mp.cpu_count()
+        workers = min(workers, len(files))
+        print('Reading {} files with {} workers'.format(len(files), workers))
+        with mp.get_context('fork').Pool(workers) as pool:
+            for k, fileSketch in enumerate(pool.imap_unordered(fillFile, files)):
+                sketch.add(fileSketch)
+                print('{}/{} files done'.format(k + 1, len(files)))
+
+    sketch.save(args.out + '_sketch.npz')
+    print('Filled in {:.1f} s'.format(time.time() - start))
+
+    radii = sketch.quantiles(args.quantile)
+    errors = sketch.quantileErrors(args.quantile)
+
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    measured, fitted = [], []
+    layers = np.arange(1, n_layers + 1, dtype=float)
+    for b in range(n_bins):
+        print('{}: {} events, {} hits'.format(binName(b), sketch.events[b], sketch.entries[b].sum()))
+        measured.append(formatTable(binName(b), radii[b]))
+
+        result, deg = fitBin(b, radii[b], errors[b], sketch.entries[b])
+        if result == None:
+            print('  Too few layers with {} hits to fit'.format(args.min_hits))
+            continue
+        print('================ lmfit {} ================'.format(binName(b)))
+        print(result.fit_report())
+        fit = result.eval(x=layers)
+        table = np.where(layers < args.fit_from, radii[b], fit)
+        table = np.where(np.isfinite(table), table, fit)
+        fitted.append(formatTable(binName(b), table))
+
+        plt.figure(b)
+        plt.errorbar(layers, radii[b], yerr=errors[b], fmt='ko', label='data')
+        plt.plot(layers, fit, 'r-', label='poly fit deg = {}'.format(deg))
+        plt.xlabel('Layer')
+        plt.ylabel('RoC')
+        plt.title(binName(b))
+        plt.legend()
+        plt.savefig('{}_RoC_binning{}.png'.format(args.out, b + 1))
+        plt.close(b)
+
+    with open(args.out + '_radius68.py', 'w') as f:
+        f.write('## {:g}% containment radii in {} bins (radiusCalibration.py, {} hits)\n'.format(
+                100*args.quantile, n_bins, sketch.entries.sum()))
+        f.write("'''\n## Measured\n" + '\n'.join(measured) + "'''\n")
+        f.write('## Layer {}-{} from fitting\n'.format(args.fit_from, n_layers) + '\n'.join(fitted))
+    print('Tables written to {}_radius68.py'.format(args.out))
+
+
+if __name__ == '__main__':
+    main()
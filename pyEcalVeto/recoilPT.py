@@ -0,0 +1,183 @@
+"""
+recoilPT.py
+
+Recoil electron pT distributions and BDT pT bias for any number of samples (signal masses,
+PN, ...) in one go.  Replaces PT_bias.py and pT_distribution.py, which loop over each sample's
+eval output in PyROOT and are copied out once per mass:  here the scoring-plane and discriminator
+branches are read with uproot a chunk at a time, the recoil pT and BDT pass/fail of every event
+of the chunk are found with array operations, and each sample's histograms are filled as its
+files are read (each file once).
+
+The recoil electron of an event is its target scoring-plane hit downstream of the target
+(z >= --z-min) with pdgID 11, pz >= 0 and the largest momentum; its pT is sqrt(p^2 - pz^2), as in
+PT_bias.py (pT_distribution.py takes pz > 0, which only differs for hits with pz exactly 0).
+Events without one get pT -1 and are only counted.  Only events with summedDet <
+--max-summed-det are used.
+
+Writes <out>.root with the histograms of every sample (all events, passing --cut and their
+ratio), <out>_pT_distribution.png (pT of all samples, normalized) and <out>_<label>_pT_bias.png
+for each sample (all vs. passing events and their ratio).
+
+Example:
+    python3 recoilPT.py -i 0.001=bdt_test_0/0.001_PT_evalout.root 0.01=bdt_test_0/0.01_PT_evalout.root \\
+        0.1=bdt_test_0/0.1_PT_evalout.root 1.0=bdt_test_0/1_PT_evalout.root pn=bdt_test_0/pn_PT_evalout.root
+"""
+
+import glob
+import argparse
+import uproot
+import numpy as np
+import ROOT
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-i', nargs='+', dest='samples', required=True,
+                    help='samples as label=file (a pattern for more than one file)')
+parser.add_argument('-o', dest='out', default='recoilPT', help='output name')
+parser.add_argument('--tree', default='EcalVeto')
+parser.add_argument('--cut', type=float, default=0.991946, help='BDT cut (pass: discValue_EcalVeto > cut)')
+parser.add_argument('--disc', default='discValue_EcalVeto', help='discriminator branch')
+parser.add_argument('--max-summed-det', type=float, default=3000.)
+parser.add_argument('--z-min', type=float, default=0.17669999, help='min z of the recoil electron SP hit')
+parser.add_argument('--pt-max', type=float, default=500., help='upper edge of the pT histograms (higher pT goes in the last bin)')
+parser.add_argument('--bin-width', type=float, default=5.)
+parser.add_argument('--chunk-size', type=int, default=100000)
+args = parser.parse_args()
+
+sp_branches = ['TargetScoringPlaneHits_' + v for v in ['z', 'px', 'py', 'pz', 'pdgID']]
+branches = ['summedDet', args.disc] + sp_branches
+
+n_bins = int(round(args.pt_max/args.bin_width))
+colors = [ROOT.kAzure+2, ROOT.kOrange-3, ROOT.kViolet+2, ROOT.kGreen+3, ROOT.kRed+2, ROOT.kBlack, ROOT.kCyan+2, ROOT.kMagenta+1]
+
+
+def recoilPT(arrays):
+    # pT of the recoil electron of each event of a chunk (-1 if there's none)
+    import awkward as ak
+    z, px, py, pz, pdgID = [arrays[b] for b in sp_branches]
+    p = np.sqrt(px**2 + py**2 + pz**2)
+    p = ak.where((z >= args.z_min) & (pdgID == 11) & (pz >= 0), p, 0.)
+    best = ak.argmax(p, axis=1, keepdims=True)
+    p_max = ak.fill_none(ak.firsts(p[best]), 0.)
+    pz_max = ak.fill_none(ak.firsts(pz[best]), 0.)
+    pt = np.sqrt(ak.to_numpy(p_max)**2 - ak.to_numpy(pz_max)**2)
+    return np.where(ak.to_numpy(p_max) > 0, pt, -1.)
+
+
+def binCounts(pt):
+    # Counts in the pT bins, higher pT in the last one; pT -1 (no recoil electron) isn't counted
+    bins = np.minimum(np.floor(pt[pt >= 0]/args.bin_width), n_bins - 1).astype(np.int64)
+    return np.bincount(bins, minlength=n_bins).astype(np.float64)
+
+
+# Fill
+results = {}
+for spec in args.samples:
+    label, pattern = spec.split('=', 1)
+    files = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+    counts = {'all': np.zeros(n_bins), 'pass': np.zeros(n_bins)}
+    n_events = n_pass = n_none = 0
+
+    for rfilename in files:
+        with uproot.open(rfilename) as rfile:
+            for arrays in rfile[args.tree].iterate(branches, step_size=args.chunk_size):
+                arrays = arrays[arrays['summedDet'] < args.max_summed_det]
+                pt = recoilPT(arrays)
+                passes = np.asarray(arrays[args.disc]) > args.cut
+                counts['all'] += binCounts(pt)
+                counts['pass'] += binCounts(pt[passes])
+                n_events += len(pt)
+                n_pass += np.count_nonzero(passes)
+                n_none += np.count_nonzero(pt < 0)
+
+    print('{}: {} events, {} pass the cut, {} without a recoil electron'.format(label, n_events, n_pass, n_none))
+    results[label] = counts
+
+
+# Histograms and plots
+ROOT.gROOT.SetBatch(True)
+tfout = ROOT.TFile(args.out + '.root', 'RECREATE')
+
+hists = {}
+for label in results:
+    hists[label] = {}
+    for kind in ['all', 'pass']:
+        hist = ROOT.TH1F('hist_p_{}_{}'.format(kind, label), 'Number of Events vs. Transverse Momentum',
+                         n_bins, 0., n_bins*args.bin_width)
+        for i, count in enumerate(results[label][kind]):
+            hist.SetBinContent(i + 1, count)
+        hist.SetEntries(results[label][kind].sum())
+        hist.Write()
+        hists[label][kind] = hist
+    ratio = hists[label]['pass'].Clone('hist_ratio_{}'.format(label))
+    ratio.Divide(hists[label]['all'])
+    ratio.Write()
+    hists[label]['ratio'] = ratio
+
+# pT of every sample, normalized (pT_distribution.py)
+canvas = ROOT.TCanvas('canvas', 'Histogram', 800, 600)
+canvas.SetLeftMargin(0.13)
+canvas.SetRightMargin(0.18)
+canvas.SetLogy()
+legend = ROOT.TLegend(0.67, 0.6, 0.77, 0.8)
+legend.SetTextSize(0.04)
+legend.SetBorderSize(0)
+legend.SetFillStyle(0)
+normed = []
+for i, label in enumerate(results):
+    hist = hists[label]['all'].Clone('hist_norm_{}'.format(label))
+    if hist.Integral('width') > 0:
+        hist.Scale(1.0/hist.Integral('width'))
+    hist.SetLineColor(colors[i % len(colors)])
+    hist.SetLineWidth(2)
+    hist.SetStats(0)
+    hist.Draw('HIST' if i == 0 else 'HIST SAME')
+    legend.AddEntry(hist, label, 'L')
+    normed.append(hist)
+normed[0].GetXaxis().SetTitle('Recoil pT (MeV)')
+normed[0].GetXaxis().SetTitleSize(0.05)
+normed[0].GetYaxis().SetRangeUser(1e-5, 1e0)
+legend.Draw()
+canvas.Update()
+canvas.SaveAs(args.out + '_pT_distribution.png')
+
+# All vs. passing events and their ratio for each sample (PT_bias.py)
+for label in results:
+    canvas = ROOT.TCanvas('canvas_' + label, 'Histogram', 800, 800)
+    canvas.Divide(1, 2)
+    canvas.cd(1)
+    ROOT.gPad.SetPad(0, 0.3, 1, 1)
+    ROOT.gPad.SetBottomMargin(0)
+    ROOT.gPad.SetLogy()
+    hist_all, hist_pass, hist_ratio = hists[label]['all'], hists[label]['pass'], hists[label]['ratio']
+    hist_all.SetLineColor(ROOT.kRed)
+    hist_all.SetLineWidth(2)
+    hist_all.SetStats(0)
+    hist_pass.SetLineColor(ROOT.kOrange + 1)
+    hist_pass.SetLineWidth(2)
+    hist_pass.SetStats(0)
+    hist_all.GetYaxis().SetTitle('Number of Events')
+    hist_all.Draw('HIST')
+    hist_pass.Draw('HIST SAME')
+    legend = ROOT.TLegend(0.15, 0.82, 0.725, 0.90)
+    legend.SetTextSize(0.04)
+    legend.AddEntry(hist_all, 'All events ({})'.format(label))
+    legend.AddEntry(hist_pass, 'BDT > {}'.format(args.cut))
+    legend.Draw()
+
+    canvas.cd(2)
+    ROOT.gPad.SetPad(0, 0, 1, 0.3)
+    ROOT.gPad.SetTopMargin(0)
+    ROOT.gPad.SetBottomMargin(0.25)
+    hist_ratio.SetStats(0)
+    hist_ratio.Draw('HIST')
+    hist_ratio.GetXaxis().SetTitle('Recoil pT')
+    hist_ratio.GetYaxis().SetTitle('Ratio')
+    hist_ratio.GetXaxis().SetTitleSize(0.08)
+    hist_ratio.GetYaxis().SetTitleSize(0.06)
+    hist_ratio.GetXaxis().SetLabelSize(0.08)
+    hist_ratio.GetYaxis().SetLabelSize(0.08)
+    hist_ratio.GetYaxis().SetRangeUser(0, 1.2)
+    canvas.Update()
+    canvas.SaveAs('{}_{}_pT_bias.png'.format(args.out, label))
+
+tfout.Close()
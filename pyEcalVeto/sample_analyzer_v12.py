@@ -937,32 +937,18 @@ def event_process(self):
 #    feats['totalSimEDep'] = sum([simHit.getEdep() for simHit in self.ecalSimHits])
 #    feats['nSimHits'    ] = len([simHit for simHit in self.ecalSimHits])
 
-    # Sort the ECal rec hits and sim hits by hit ID
+    # Sort the ECal rec hits by hit ID
     ecalRecHitsSorted = [hit for hit in self.ecalRecHits]
     ecalRecHitsSorted.sort(key = lambda hit : hit.getID())
-    ecalSimHitsSorted = [hit for hit in self.ecalSimHits]
-    ecalSimHitsSorted.sort(key = lambda hit : hit.getID())
 
-    # ECal noise information
-    for recHit in ecalRecHitsSorted:
+    # ECal noise information: a rec hit is a noise hit if its noise flag is set,
+    # or if no sim hit's hitID matches
+    isNoise = physTools.noiseHits([recHit.getID() for recHit in ecalRecHitsSorted],
+                                  [recHit.isNoise() for recHit in ecalRecHitsSorted],
+                                  [simHit.getID() for simHit in self.ecalSimHits])
+    for recHit, noise in zip(ecalRecHitsSorted, isNoise):
 
-        # If the noise flag is set, count the hit as a noise hit
-        if recHit.isNoise():
-            feats['totalNoiseEnergy'] += recHit.getEnergy()
-            feats['nNoiseHits'      ] += 1
-
-        # Otherwise, check for a sim hit whose hitID matches
-        nSimHitMatch = 0
-        for simHit in ecalSimHitsSorted:
-
-            if simHit.getID() == recHit.getID():
-                nSimHitMatch += 1
-
-            elif simHit.getID() > recHit.getID():
-                break
-
-        # If no matching sim hit exists, count the hit as a noise hit
-        if (not recHit.isNoise()) and (nSimHitMatch == 0):
+        if noise:
             feats['totalNoiseEnergy'] += recHit.getEnergy()
             feats['nNoiseHits'      ] += 1
 
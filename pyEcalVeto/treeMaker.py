@@ -80,6 +80,36 @@ for i in range(1, physTools.nSegments + 1):
         branches_info['oContYStd_x{}_s{}'.format(j,i)]      = {'rtype': float, 'default': 0.}
         branches_info['oContLayerStd_x{}_s{}'.format(j,i)]  = {'rtype': float, 'default': 0.}
 
+# Groups of features computed together by event_process, in order.  Bump a group's version
+# whenever the code computing it changes, so values cached with --cache get recomputed
+feature_groups = {
+        'base':         {'version': 1, 'feats': ['nReadoutHits', 'summedDet', 'summedTightIso',
+                                                 'maxCellDep', 'showerRMS', 'xStd', 'yStd',
+                                                 'avgLayerHit', 'stdLayerHit', 'deepestLayerHit',
+                                                 'ecalBackEnergy']},
+        'trajectories': {'version': 1, 'feats': ['epSep', 'epDot', 'epAng']},
+        'containment':  {'version': 1, 'feats': []},
+        'tracking':     {'version': 1, 'feats': ['straight4', 'firstNearPhLayer', 'nNearPhHits',
+                                                 'fullElectronTerritoryHits', 'fullPhotonTerritoryHits',
+                                                 'fullTerritoryRatio', 'electronTerritoryHits',
+                                                 'photonTerritoryHits', 'TerritoryRatio']}
+        }
+
+# Longitudinal segment and RoC variables:  everything else
+feature_groups['containment']['feats'] = [feat for feat in branches_info
+        if not any(feat in feature_groups[group]['feats'] for group in feature_groups)]
+
+# Members of each collection event_process uses; nothing else is read (see TreeProcess.declareInputs)
+spHit_members = ['x_', 'y_', 'z_', 'px_', 'py_', 'pz_', 'trackID_', 'pdgID_']
+feature_inputs = {
+        'EcalVeto_v12': ['nReadoutHits_', 'summedDet_', 'summedTightIso_', 'maxCellDep_', 'showerRMS_',
+                         'xStd_', 'yStd_', 'avgLayerHit_', 'stdLayerHit_', 'deepestLayerHit_',
+                         'ecalBackEnergy_'],
+        'TargetScoringPlaneHits_v12': spHit_members,
+        'EcalScoringPlaneHits_v12': spHit_members,
+        'EcalRecHits_v12': ['id_', 'energy_', 'xpos_', 'ypos_', 'zpos_']
+        }
+
 def main():
 
     # Inputs and their trees and stuff
@@ -91,13 +121,23 @@ def main():
     group_labels = pdict['groupls']
     startEvent = pdict['startEvent']
     maxEvents = pdict['maxEvents']
+    columnar = pdict['columnar']
+    staging = pdict['staging']
+    profile = pdict['profile']
+    cache = pdict['cache']
     # Should maybe put in parsing eventually and make event_process *arg
 
     # Construct tree processes
     procs = []
     for gl, group in zip(group_labels,inlist):
-        procs.append( manager.TreeProcess(event_process, group,
-                                          ID=gl, batch=batch_mode, pfreq=100) )
+        if columnar:
+            procs.append( manager.ColumnarTreeProcess(event_process, group,
+                                                      ID=gl, batch=batch_mode, pfreq=100,
+                                                      chunk_process=chunk_process,
+                                                      staging='async' if staging == 'async' else 'none') )
+        else:
+            procs.append( manager.TreeProcess(event_process, group,
+                                              ID=gl, batch=batch_mode, pfreq=100, staging=staging) )
 
     # Process jobs
     for proc in procs:
@@ -110,6 +150,18 @@ def main():
         proc.targetSPHits = proc.addBranch('SimTrackerHit', 'TargetScoringPlaneHits_v12')
         proc.ecalSPHits   = proc.addBranch('SimTrackerHit', 'EcalScoringPlaneHits_v12')
         proc.ecalRecHits  = proc.addBranch('EcalHit', 'EcalRecHits_v12')
+        proc.declareInputs(feature_inputs)
+
+        # Truth SP hits, found a chunk at a time by chunk_process with --columnar
+        proc.spTruth = None
+
+        # Time each event (sections marked with self.lap in event_process)
+        if profile:
+            proc.enableProfiling(hit_count=lambda proc: proc.ecalRecHits.size())
+
+        # Only compute the feature groups not cached yet for each event
+        if cache:
+            proc.enableFeatureCache(cache, feature_groups)
 
         # Tree/Files(s) to make
         print('\nRunning %s'%(proc.ID))
@@ -146,36 +198,30 @@ def main():
     print('\nDone!\n')
 
 
-# Process an event
-def event_process(self):
+# Find the truth e/g SP hits of a whole chunk (--columnar)
+def chunk_process(self):
+    self.spTruth = physTools.truthSPHitsArray(self.targetSPHits, self.ecalSPHits)
 
-    # Initialize BDT input variables w/ defaults
-    feats = next(iter(self.tfMakers.values())).resetFeats()
+# Truth info and trajectories of an event, for any feature group to use
+def eventInfo(self):
 
-    # Assign pre-computed variables
-    feats['nReadoutHits']       = self.ecalVeto.getNReadoutHits()
-    feats['summedDet']          = self.ecalVeto.getSummedDet()
-    feats['summedTightIso']     = self.ecalVeto.getSummedTightIso()
-    feats['maxCellDep']         = self.ecalVeto.getMaxCellDep()
-    feats['showerRMS']          = self.ecalVeto.getShowerRMS()
-    feats['xStd']               = self.ecalVeto.getXStd()
-    feats['yStd']               = self.ecalVeto.getYStd()
-    feats['avgLayerHit']        = self.ecalVeto.getAvgLayerHit()
-    feats['stdLayerHit']        = self.ecalVeto.getStdLayerHit()
-    feats['deepestLayerHit']    = self.ecalVeto.getDeepestLayerHit() 
-    feats['ecalBackEnergy']     = self.ecalVeto.getEcalBackEnergy()
-    
     ###################################
     # Determine event type
     ###################################
 
     # Get e position and momentum from EcalSP
-    e_ecalHit = physTools.electronEcalSPHit(self.ecalSPHits)
+    if self.spTruth != None:
+        e_ecalHit = self.spTruth['e_ecal'].hit(self.chunk_entry)
+    else:
+        e_ecalHit = physTools.electronEcalSPHit(self.ecalSPHits)
     if e_ecalHit != None:
         e_ecalPos, e_ecalP = e_ecalHit.getPosition(), e_ecalHit.getMomentum()
 
     # Photon Info from targetSP
-    e_targetHit = physTools.electronTargetSPHit(self.targetSPHits)
+    if self.spTruth != None:
+        e_targetHit = self.spTruth['e_target'].hit(self.chunk_entry)
+    else:
+        e_targetHit = physTools.electronTargetSPHit(self.targetSPHits)
     if e_targetHit != None:
         g_targPos, g_targP = physTools.gammaTargetInfo(e_targetHit)
     else:  # Should about never happen -> division by 0 in g_traj
@@ -192,8 +238,8 @@ def event_process(self):
         g_traj = physTools.layerIntercepts(g_targPos, g_targP)
 
     # Fiducial categories (filtered into different output trees)
+    e_fid = g_fid = False
     if self.separate:
-        e_fid = g_fid = False
 
         if e_traj != None:
             for cell in cellMap:
@@ -207,11 +253,7 @@ def event_process(self):
                     g_fid = True
                     break
 
-    ###################################
-    # Compute extra BDT input variables
-    ###################################
-
-    # Find epSep and epDot, and prepare electron and photon trajectory vectors
+    # Prepare electron and photon trajectory vectors
     if e_traj != None and g_traj != None:
 
         # Create arrays marking start and end of each trajectory
@@ -222,10 +264,6 @@ def event_process(self):
 
         e_norm  = physTools.unit( e_traj_ends[1] - e_traj_ends[0] )
         g_norm  = physTools.unit( g_traj_ends[1] - g_traj_ends[0] )
-        feats['epSep'] = physTools.dist( e_traj_ends[0], g_traj_ends[0] )
-        feats['epDot'] = physTools.dot(e_norm,g_norm)
-        # Add epAng
-        feats['epAng'] = math.acos(physTools.dot(e_norm,g_norm)) * 180.0 / math.pi
 
     else:
 
@@ -234,10 +272,7 @@ def event_process(self):
 
         e_traj_ends   = [np.array([999 ,999 ,0   ]), np.array([999 ,999 ,999 ]) ]
         g_traj_ends   = [np.array([1000,1000,0   ]), np.array([1000,1000,1000]) ]
-
-        feats['epSep'] = 10.0 + 1.0 # Don't cut on these in this case
-        feats['epDot'] = 3.0 + 1.0 # ? This default value should be assigned to an angle
-        feats['epAng'] = 3.0 + 1.0
+        e_norm = g_norm = None
 
     # Territory setup (consider missing case)
     gToe    = physTools.unit( e_traj_ends[0] - g_traj_ends[0] )
@@ -256,33 +291,86 @@ def event_process(self):
     # Always use default binning for photon RoC
     g_radii = physTools.radius68_thetalt10_plt500
 
-    # Big data
-    trackingHitList = []
+    return {'e_traj': e_traj, 'g_traj': g_traj, 'e_fid': e_fid, 'g_fid': g_fid, 'e_traj_ends': e_traj_ends, 'g_traj_ends': g_traj_ends,
+            'e_norm': e_norm, 'g_norm': g_norm, 'gToe': gToe, 'origin': origin,
+            'e_radii': e_radii, 'g_radii': g_radii, 'hits': None}
 
-    # Major ECal loop
+# Layer, position and distances to the e/g trajectories of every ECal rec hit, as
+# (hit, energy, layer, xy_pair, distance_e_traj, distance_g_traj).  Found once per event, by
+# the first feature group that needs them (so not at all if every group is cached)
+def hitInfo(self, ev):
+
+    if ev['hits'] != None:
+        return ev['hits']
+
+    e_traj, g_traj = ev['e_traj'], ev['g_traj']
+
+    hits = []
     for hit in self.ecalRecHits:
-        
-        if hit.getEnergy() > 0:
 
-            layer = physTools.ecal_layer(hit)
-            xy_pair = ( hit.getXPos(), hit.getYPos() )
+        layer = physTools.ecal_layer(hit)
+        xy_pair = ( hit.getXPos(), hit.getYPos() )
 
-            # Territory selections
-            hitPrime = physTools.pos(hit) - origin
-            if np.dot(hitPrime, gToe) > 0: feats['fullElectronTerritoryHits'] += 1
-            else: feats['fullPhotonTerritoryHits'] += 1
+        # Distance to electron trajectory
+        if e_traj != None:
+            xy_e_traj = ( e_traj[layer][0], e_traj[layer][1] )
+            distance_e_traj = physTools.dist(xy_pair, xy_e_traj)
+        else: distance_e_traj = -1.0
 
-            # Distance to electron trajectory
-            if e_traj != None:
-                xy_e_traj = ( e_traj[layer][0], e_traj[layer][1] )
-                distance_e_traj = physTools.dist(xy_pair, xy_e_traj)
-            else: distance_e_traj = -1.0
+        # Distance to photon trajectory
+        if g_traj != None:
+            xy_g_traj = ( g_traj[layer][0], g_traj[layer][1] )
+            distance_g_traj = physTools.dist(xy_pair, xy_g_traj)
+        else: distance_g_traj = -1.0
+
+        hits.append( (hit, hit.getEnergy(), layer, xy_pair, distance_e_traj, distance_g_traj) )
 
-            # Distance to photon trajectory
-            if g_traj != None:
-                xy_g_traj = ( g_traj[layer][0], g_traj[layer][1] )
-                distance_g_traj = physTools.dist(xy_pair, xy_g_traj)
-            else: distance_g_traj = -1.0
+    ev['hits'] = hits
+
+    return hits
+
+# Assign pre-computed variables
+def baseFeatures(self, feats, ev):
+
+    feats['nReadoutHits']       = self.ecalVeto.getNReadoutHits()
+    feats['summedDet']          = self.ecalVeto.getSummedDet()
+    feats['summedTightIso']     = self.ecalVeto.getSummedTightIso()
+    feats['maxCellDep']         = self.ecalVeto.getMaxCellDep()
+    feats['showerRMS']          = self.ecalVeto.getShowerRMS()
+    feats['xStd']               = self.ecalVeto.getXStd()
+    feats['yStd']               = self.ecalVeto.getYStd()
+    feats['avgLayerHit']        = self.ecalVeto.getAvgLayerHit()
+    feats['stdLayerHit']        = self.ecalVeto.getStdLayerHit()
+    feats['deepestLayerHit']    = self.ecalVeto.getDeepestLayerHit() 
+    feats['ecalBackEnergy']     = self.ecalVeto.getEcalBackEnergy()
+
+# Find epSep, epDot and epAng
+def trajectoryFeatures(self, feats, ev):
+
+    e_traj_ends, g_traj_ends = ev['e_traj_ends'], ev['g_traj_ends']
+    e_norm, g_norm = ev['e_norm'], ev['g_norm']
+
+    if e_norm is not None:
+        feats['epSep'] = physTools.dist( e_traj_ends[0], g_traj_ends[0] )
+        feats['epDot'] = physTools.dot(e_norm,g_norm)
+        # Add epAng
+        feats['epAng'] = math.acos(physTools.dot(e_norm,g_norm)) * 180.0 / math.pi
+
+    else:
+        feats['epSep'] = 10.0 + 1.0 # Don't cut on these in this case
+        feats['epDot'] = 3.0 + 1.0 # ? This default value should be assigned to an angle
+        feats['epAng'] = 3.0 + 1.0
+
+# Longitudinal segment and RoC variables
+def containmentFeatures(self, feats, ev):
+
+    e_radii, g_radii = ev['e_radii'], ev['g_radii']
+    hits = hitInfo(self, ev)
+
+    # Major ECal loop
+    for hit, energy, layer, xy_pair, distance_e_traj, distance_g_traj in hits:
+        
+        if energy > 0:
 
             # Decide which longitudinal segment the hit is in and add to sums
             for i in range(1, physTools.nSegments + 1):
@@ -331,10 +419,6 @@ def event_process(self):
                             feats['oContLayerMean_x{}_s{}'.format(j,i)] +=\
                                                                 layer*hit.getEnergy()
 
-            # Build MIP tracking hit list; (outside electron region or electron missing)
-            if distance_e_traj >= e_radii[layer] or distance_e_traj == -1.0:
-                trackingHitList.append(hit) 
-
     # If possible, quotient out the total energy from the means
     for i in range(1, physTools.nSegments + 1):
 
@@ -370,24 +454,7 @@ def event_process(self):
                                                     feats['oContEnergy_x{}_s{}'.format(j,i)]
 
     # Loop over hits again to calculate the standard deviations
-    for hit in self.ecalRecHits:
-
-        layer = physTools.ecal_layer(hit)
-        xy_pair = (hit.getXPos(), hit.getYPos())
-
-        # Distance to electron trajectory
-        if e_traj != None:
-            xy_e_traj = (e_traj[layer][0], e_traj[layer][1])
-            distance_e_traj = physTools.dist(xy_pair, xy_e_traj)
-        else:
-            distance_e_traj = -1.0
-
-        # Distance to photon trajectory
-        if g_traj != None:
-            xy_g_traj = (g_traj[layer][0], g_traj[layer][1])
-            distance_g_traj = physTools.dist(xy_pair, xy_g_traj)
-        else:
-            distance_g_traj = -1.0
+    for hit, energy, layer, xy_pair, distance_e_traj, distance_g_traj in hits:
 
         # Decide which longitudinal segment the hit is in and add to sums
         for i in range(1, physTools.nSegments + 1):
@@ -477,6 +544,31 @@ def event_process(self):
                         math.sqrt(feats['oContLayerStd_x{}_s{}'.format(j,i)]/\
                         feats['oContEnergy_x{}_s{}'.format(j,i)])
 
+# MIP tracking variables
+def trackingFeatures(self, feats, ev):
+
+    e_traj, g_traj = ev['e_traj'], ev['g_traj']
+    e_traj_ends, g_traj_ends = ev['e_traj_ends'], ev['g_traj_ends']
+    gToe, origin, e_radii = ev['gToe'], ev['origin'], ev['e_radii']
+
+    # Big data
+    trackingHitList = []
+    trackingInElectronTerritory = [] # Territory of each hit in trackingHitList
+
+    for hit, energy, layer, xy_pair, distance_e_traj, distance_g_traj in hitInfo(self, ev):
+        
+        if energy > 0:
+
+            # Territory selections
+            hitPrime = physTools.pos(hit) - origin
+            inElectronTerritory = np.dot(hitPrime, gToe) > 0
+            if inElectronTerritory: feats['fullElectronTerritoryHits'] += 1
+            else: feats['fullPhotonTerritoryHits'] += 1
+
+            # Build MIP tracking hit list; (outside electron region or electron missing)
+            if distance_e_traj >= e_radii[layer] or distance_e_traj == -1.0:
+                trackingHitList.append(hit) 
+                trackingInElectronTerritory.append(inElectronTerritory)
 
     # Find the first layer of the ECal where a hit near the projected photon trajectory
     # AND the total number of hits around the photon trajectory
@@ -491,9 +583,8 @@ def event_process(self):
 
     # Territories limited to trackingHitList
     if e_traj != None:
-        for hit in trackingHitList:
-            hitPrime = physTools.pos(hit) - origin
-            if np.dot(hitPrime, gToe) > 0: feats['electronTerritoryHits'] += 1
+        for inElectronTerritory in trackingInElectronTerritory:
+            if inElectronTerritory: feats['electronTerritoryHits'] += 1
             else: feats['photonTerritoryHits'] += 1
     else:
         feats['photonTerritoryHits'] = feats['nReadoutHits']
@@ -511,14 +602,45 @@ def event_process(self):
                                 trackingHitList, e_traj_ends, g_traj_ends,
                                 mst = 4, returnHitList = True)
 
+# Process an event
+def event_process(self):
+
+    # Initialize BDT input variables w/ defaults
+    feats = next(iter(self.tfMakers.values())).resetFeats()
+
+    ev = eventInfo(self)
+
+    self.lap('truth')
+
+    # Compute each group of BDT input variables, unless cached (--cache)
+    for group in feature_groups:
+        cached = self.cachedFeatures(group)
+        if cached != None:
+            feats.update(cached)
+        else:
+            feature_process[group](self, feats, ev)
+            self.cacheFeatures(group, feats)
+
+        self.lap(group)
+
     # Fill the tree (according to fiducial category) with values for this event
     if not self.separate:
         self.tfMakers['unsorted'].fillEvent(feats)
     else:
-        if e_fid and g_fid: self.tfMakers['egin'].fillEvent(feats)
-        elif e_fid and not g_fid: self.tfMakers['ein'].fillEvent(feats)
-        elif not e_fid and g_fid: self.tfMakers['gin'].fillEvent(feats)
+        if ev['e_fid'] and ev['g_fid']: self.tfMakers['egin'].fillEvent(feats)
+        elif ev['e_fid'] and not ev['g_fid']: self.tfMakers['ein'].fillEvent(feats)
+        elif not ev['e_fid'] and ev['g_fid']: self.tfMakers['gin'].fillEvent(feats)
         else: self.tfMakers['none'].fillEvent(feats)
 
+    self.lap('filling')
+
+# What computes each feature group
+feature_process = {
+        'base':         baseFeatures,
+        'trajectories': trajectoryFeatures,
+        'containment':  containmentFeatures,
+        'tracking':     trackingFeatures
+        }
+
 if __name__ == "__main__":
     main()
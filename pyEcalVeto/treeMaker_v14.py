@@ -306,6 +306,9 @@ def main():
         proc.hcalRecHits = proc.addBranch('HcalHit', 'HcalRecHits_{}'.format(tag))
         proc.hcalVeto = proc.addBranch('HcalVetoResult', 'HcalVeto_{}'.format(tag))
 
+        # Whole collections get flattened, but nothing else is read
+        proc.declareInputs()
+
         # Tree/Files(s) to make
         print('\nRunning %s'%(proc.ID))
 
@@ -321,7 +324,7 @@ def main():
                 }
 
         for tfMaker in proc.tfMakers:
-            proc.tfMakers[tfMaker] = manager.TreeMaker(group_labels[procs.index(proc)]+\
+            proc.tfMakers[tfMaker] = manager.BufferedTreeMaker(group_labels[procs.index(proc)]+\
                                         '.root',\
                                         "EcalVeto_flatten",\
                                         branches_info,\
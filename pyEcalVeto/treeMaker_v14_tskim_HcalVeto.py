@@ -294,6 +294,10 @@ def main():
         proc.ecalSimHits = proc.addBranch('SimCalorimeterHit', 'EcalSimHits_{}'.format(tag))
         proc.targetSimHits = proc.addBranch('SimCalorimeterHit', 'TargetSimHits_{}'.format(tag))
         proc.hcalRecHits = proc.addBranch('HcalHit', 'HcalRecHits_{}'.format(tag))
+
+        # Whole collections get flattened, but nothing else is read (the trigger decision
+        # is read straight from the tree)
+        proc.declareInputs({'TriggerSums20Layers_signal': ['pass_']})
         #proc.trigger = proc.addBranch('Trigger', 'TriggerSums20Layers_signal_{}'.format(tag))
 
         # Tree/Files(s) to make
@@ -311,7 +315,7 @@ def main():
                 }
 
         for tfMaker in proc.tfMakers:
-            proc.tfMakers[tfMaker] = manager.TreeMaker(group_labels[procs.index(proc)]+\
+            proc.tfMakers[tfMaker] = manager.BufferedTreeMaker(group_labels[procs.index(proc)]+\
                                         '.root',\
                                         "EcalVeto_flatten",\
                                         branches_info,\